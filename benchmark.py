@@ -0,0 +1,232 @@
+# ============================================================================
+# BENCHMARK DES OPÉRATIONS CHROMADB (INGESTION, QUERY, GET, COUNT)
+# ============================================================================
+#
+# Construit des collections à partir de diamonds.csv (1k, 10k, 54k lignes ou
+# davantage en répétant le fichier) et mesure, pour Client() et
+# PersistentClient :
+# - le débit d'upsert (lignes/s)
+# - la latence de query (p50/p95/p99) sans filtre, avec where et avec
+#   where_document
+# - la latence de get avec limit/offset selon la profondeur de la page
+# - la latence de count
+# Les résultats sont écrits en JSON et peuvent être comparés d'une exécution
+# à l'autre pour détecter les régressions.
+#
+# Exemple :
+#     python benchmark.py --tailles 1000 10000 --sortie avant.json
+#     python benchmark.py --tailles 1000 10000 --comparer avant.json
+# ============================================================================
+
+import json
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from itertools import cycle, islice
+
+import chromadb
+import numpy as np
+
+from ingestion_csv import MODELE_DIAMANTS, ingerer_lots, lire_csv, preparer_lots
+
+DIMENSION = 384
+TAILLE_LOT = 1000
+COLONNES_METADONNEES = ["cut", "color", "clarity"]
+
+# Métriques où une valeur plus grande est meilleure (les autres sont des latences)
+METRIQUES_DEBIT = ("lignes_par_seconde",)
+
+
+def percentiles(durees):
+    """
+    p50/p95/p99 en millisecondes
+    """
+    millis = np.asarray(durees) * 1000
+    return {f"p{p}": float(np.percentile(millis, p)) for p in (50, 95, 99)}
+
+
+def chronometrer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return percentiles(durees)
+
+
+def lignes_diamants(chemin, nb_lignes):
+    """
+    Les `nb_lignes` premières lignes, en répétant le fichier si nécessaire
+    """
+    def en_boucle():
+        while True:
+            yield from lire_csv(chemin)
+
+    return islice(en_boucle(), nb_lignes)
+
+
+def lots_avec_embeddings(lots, generateur, fonction_embedding=None):
+    """
+    Ajoute les embeddings aux lots : modèle réel ou vecteurs aléatoires
+    """
+    for lot in lots:
+        if fonction_embedding is not None:
+            lot["embeddings"] = fonction_embedding(lot["documents"])
+        else:
+            lot["embeddings"] = generateur.standard_normal(
+                (len(lot["ids"]), DIMENSION), dtype=np.float32
+            )
+        yield lot
+
+
+# ============================================================================
+# MESURES SUR UNE COLLECTION
+# ============================================================================
+
+def mesurer(client, chemin, taille, nb_requetes, fonction_embedding=None, graine=0):
+    generateur = np.random.default_rng(graine)
+    nom = f"bench_{taille}"
+    try:
+        client.delete_collection(nom)
+    except Exception:
+        pass
+    collection = client.create_collection(nom)
+
+    lots = preparer_lots(lignes_diamants(chemin, taille), MODELE_DIAMANTS, TAILLE_LOT,
+                         colonnes_metadonnees=COLONNES_METADONNEES)
+    ingestion = ingerer_lots(
+        collection, lots_avec_embeddings(lots, generateur, fonction_embedding), afficher=False
+    )
+
+    if fonction_embedding is not None:
+        requetes = fonction_embedding([f"Diamant {i}" for i in range(nb_requetes)])
+    else:
+        requetes = generateur.standard_normal((nb_requetes, DIMENSION), dtype=np.float32)
+    iterateur = cycle(requetes)
+
+    def requete(**filtres):
+        return lambda: collection.query(query_embeddings=[next(iterateur)], n_results=5,
+                                        **filtres)
+
+    resultats = {
+        "lignes": taille,
+        "upsert": {"lignes_par_seconde": ingestion["lignes_par_seconde"]},
+        "query": chronometrer(requete(), nb_requetes),
+        "query_where": chronometrer(requete(where={"cut": "Ideal"}), nb_requetes),
+        "query_where_document": chronometrer(
+            requete(where_document={"$contains": "Premium"}), nb_requetes
+        ),
+        "count": chronometrer(collection.count, nb_requetes),
+    }
+
+    # Pagination : coût d'une page selon sa profondeur dans la collection
+    for profondeur in (0.0, 0.5, 0.99):
+        offset = int(taille * profondeur)
+        resultats[f"get_offset_{int(profondeur * 100)}pc"] = chronometrer(
+            lambda: collection.get(limit=100, offset=offset, include=["documents"]),
+            max(1, nb_requetes // 10),
+        )
+
+    client.delete_collection(nom)
+    return resultats
+
+
+def executer(chemin="diamonds.csv", tailles=(1000, 10000, 53940),
+             backends=("memoire", "persistant"), nb_requetes=200, avec_modele=False):
+    fonction_embedding = None
+    if avec_modele:
+        from chromadb.utils import embedding_functions
+        fonction_embedding = embedding_functions.DefaultEmbeddingFunction()
+
+    rapport = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "chromadb": chromadb.__version__,
+        "embeddings": "modele" if avec_modele else "aleatoires",
+        "resultats": {},
+    }
+    for backend in backends:
+        dossier = None
+        if backend == "persistant":
+            dossier = tempfile.mkdtemp(prefix="bench_chroma_")
+            client = chromadb.PersistentClient(path=dossier)
+        else:
+            client = chromadb.Client()
+        try:
+            for taille in tailles:
+                print(f"# {backend}, {taille} lignes...")
+                rapport["resultats"].setdefault(backend, {})[str(taille)] = mesurer(
+                    client, chemin, taille, nb_requetes, fonction_embedding
+                )
+        finally:
+            if dossier:
+                shutil.rmtree(dossier, ignore_errors=True)
+    return rapport
+
+
+# ============================================================================
+# COMPARAISON ENTRE DEUX EXÉCUTIONS
+# ============================================================================
+
+def _metriques(rapport):
+    for backend, par_taille in rapport["resultats"].items():
+        for taille, mesures in par_taille.items():
+            for operation, valeurs in mesures.items():
+                if isinstance(valeurs, dict):
+                    for nom, valeur in valeurs.items():
+                        yield (backend, taille, operation, nom), valeur
+
+
+def comparer(ancien, nouveau, seuil=0.2):
+    """
+    Liste les métriques dégradées de plus de `seuil` (20 % par défaut)
+    """
+    reference = dict(_metriques(ancien))
+    regressions = []
+    for cle, valeur in _metriques(nouveau):
+        avant = reference.get(cle)
+        if not avant:
+            continue
+        if cle[3] in METRIQUES_DEBIT:
+            variation = (avant - valeur) / avant
+        else:
+            variation = (valeur - avant) / avant
+        if variation > seuil:
+            regressions.append({"metrique": "/".join(cle), "avant": avant,
+                                "apres": valeur, "degradation": variation})
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark des opérations ChromaDB")
+    parser.add_argument("--csv", default="diamonds.csv")
+    parser.add_argument("--tailles", type=int, nargs="+", default=[1000, 10000, 53940])
+    parser.add_argument("--backends", nargs="+", choices=["memoire", "persistant"],
+                        default=["memoire", "persistant"])
+    parser.add_argument("--requetes", type=int, default=200)
+    parser.add_argument("--modele", action="store_true",
+                        help="utiliser le vrai modèle d'embedding (plus lent)")
+    parser.add_argument("--sortie", default="resultats_benchmark.json")
+    parser.add_argument("--comparer", help="rapport JSON d'une exécution précédente")
+    parser.add_argument("--seuil", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rapport = executer(args.csv, args.tailles, args.backends, args.requetes, args.modele)
+    with open(args.sortie, "w", encoding="utf-8") as fichier:
+        json.dump(rapport, fichier, indent=2)
+    print(f"# Résultats écrits dans {args.sortie}")
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as fichier:
+            regressions = comparer(json.load(fichier), rapport, args.seuil)
+        for regression in regressions:
+            print(f"# RÉGRESSION {regression['metrique']}: {regression['avant']:.3f} -> "
+                  f"{regression['apres']:.3f} (+{regression['degradation']:.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print("# Aucune régression détectée")
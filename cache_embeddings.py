@@ -0,0 +1,258 @@
+# ============================================================================
+# CACHE D'EMBEDDINGS PERSISTANT (CLÉ = HASH DU MODÈLE + TEXTE)
+# ============================================================================
+#
+# Enveloppe n'importe quelle embedding_functions.*EmbeddingFunction :
+# - un cache LRU borné en mémoire pour les textes récents
+# - un stockage float32 sur disque, lu par memory-mapping (np.memmap)
+# Les textes déjà vus ne repassent plus par le modèle, même après un
+# redémarrage du script.
+# ============================================================================
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+
+
+def nom_du_modele(fonction):
+    """
+    Devine le nom du modèle utilisé par une fonction d'embedding
+    """
+    for attribut in ("MODEL_NAME", "model_name", "_model_name"):
+        nom = getattr(fonction, attribut, None)
+        if isinstance(nom, str):
+            return nom
+    return type(fonction).__name__
+
+
+def cle_embedding(nom_modele, texte):
+    """
+    Clé de cache : SHA-256 du nom du modèle et du texte
+    """
+    return hashlib.sha256(f"{nom_modele}\0{texte}".encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# STOCKAGE SUR DISQUE
+# ============================================================================
+
+class StockageVecteurs:
+    """
+    Fichier float32 en ajout seul + index des clés ("clé numéro_de_ligne")
+
+    Les vecteurs sont écrits avant les clés : après un arrêt brutal, une clé
+    présente dans l'index a toujours son vecteur complet sur le disque. Le
+    numéro de ligne est celui où le vecteur a réellement été écrit (ajout
+    atomique O_APPEND), même si un autre processus partage le dossier.
+    """
+
+    def __init__(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        self.chemin_vecteurs = os.path.join(dossier, "vecteurs.f32")
+        self.chemin_index = os.path.join(dossier, "index.txt")
+        self.chemin_meta = os.path.join(dossier, "meta.json")
+        self.dimension = None
+        self.lignes = {}
+        self._memmap = None
+
+        if os.path.exists(self.chemin_meta):
+            with open(self.chemin_meta, encoding="utf-8") as fichier:
+                self.dimension = json.load(fichier)["dimension"]
+        if self.dimension and os.path.exists(self.chemin_index):
+            nb_complets = self._nb_lignes_fichier()
+            with open(self.chemin_index, encoding="utf-8") as fichier:
+                for numero, ligne in enumerate(fichier):
+                    champs = ligne.split()
+                    if not champs:
+                        continue
+                    # Ancien format : une clé par ligne, numéro implicite
+                    numero = int(champs[1]) if len(champs) > 1 else numero
+                    if numero < nb_complets:
+                        self.lignes.setdefault(champs[0], numero)
+
+    def _nb_lignes_fichier(self):
+        if not os.path.exists(self.chemin_vecteurs):
+            return 0
+        return os.path.getsize(self.chemin_vecteurs) // (4 * self.dimension)
+
+    def lire(self, cle):
+        numero = self.lignes.get(cle)
+        if numero is None:
+            return None
+        if self._memmap is None or numero >= self._memmap.shape[0]:
+            # Le fichier a grandi depuis la dernière ouverture
+            self._memmap = np.memmap(
+                self.chemin_vecteurs, dtype=np.float32, mode="r",
+                shape=(self._nb_lignes_fichier(), self.dimension),
+            )
+        return np.array(self._memmap[numero])
+
+    def ecrire(self, cles, vecteurs):
+        vecteurs = np.asarray(vecteurs, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = int(vecteurs.shape[1])
+            with open(self.chemin_meta, "w", encoding="utf-8") as fichier:
+                json.dump({"dimension": self.dimension}, fichier)
+        # Clés déjà stockées (ou répétées dans le lot) : écrites une seule fois
+        vues = set()
+        positions = []
+        for position, cle in enumerate(cles):
+            if cle not in self.lignes and cle not in vues:
+                vues.add(cle)
+                positions.append(position)
+        if not positions:
+            return
+        cles = [cles[p] for p in positions]
+        donnees = vecteurs[positions].tobytes()
+
+        taille_ligne = 4 * self.dimension
+        descripteur = os.open(self.chemin_vecteurs, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            taille = os.fstat(descripteur).st_size
+            if taille % taille_ligne:
+                # Reste d'un ajout interrompu : on repart d'une ligne entière
+                os.ftruncate(descripteur, taille - taille % taille_ligne)
+            os.write(descripteur, donnees)
+            premiere = (os.lseek(descripteur, 0, os.SEEK_CUR) - len(donnees)) // taille_ligne
+        finally:
+            os.close(descripteur)
+        with open(self.chemin_index, "a", encoding="utf-8") as fichier:
+            fichier.writelines(f"{cle} {premiere + i}\n" for i, cle in enumerate(cles))
+        for i, cle in enumerate(cles):
+            self.lignes[cle] = premiere + i
+
+
+# ============================================================================
+# FONCTION D'EMBEDDING AVEC CACHE
+# ============================================================================
+
+class EmbeddingFunctionEnCache(EmbeddingFunction):
+    """
+    Fonction d'embedding qui ne calcule que les textes jamais vus
+
+    - fonction : fonction d'embedding à envelopper (par défaut all-MiniLM-L6-v2)
+    - dossier : emplacement du cache sur disque
+    - taille_lru : nombre maximal de vecteurs gardés en mémoire
+    """
+
+    def __init__(self, fonction=None, dossier="./cache_embeddings", nom_modele=None,
+                 taille_lru=10000):
+        self.fonction = fonction or embedding_functions.DefaultEmbeddingFunction()
+        self.nom_modele = nom_modele or nom_du_modele(self.fonction)
+        self.taille_lru = taille_lru
+        self.dossier = dossier
+        # Un sous-dossier par modèle : les dimensions peuvent différer
+        self.stockage = StockageVecteurs(
+            os.path.join(dossier, re.sub(r"[^\w.-]", "_", self.nom_modele))
+        )
+        self._lru = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits_memoire = 0
+        self.hits_disque = 0
+        self.miss = 0
+
+    # ------------------------------------------------------------------------
+    # Identité : celle de la fonction enveloppée, pour que ChromaDB accepte le
+    # cache sur une collection déjà créée avec cette fonction (une collection
+    # créée avec le cache reste enregistrée en "legacy", comme avant)
+    # ------------------------------------------------------------------------
+
+    def _deleguer(self, methode, *arguments, defaut=NotImplemented):
+        fonction = getattr(self.fonction, methode, None)
+        return fonction(*arguments) if fonction is not None else defaut
+
+    def name(self):
+        return self._deleguer("name")
+
+    def get_config(self):
+        return self._deleguer("get_config")
+
+    def build_from_config(self, config):
+        return EmbeddingFunctionEnCache(type(self.fonction).build_from_config(config),
+                                        dossier=self.dossier, nom_modele=self.nom_modele,
+                                        taille_lru=self.taille_lru)
+
+    def is_legacy(self):
+        # Fonction sans name()/get_config() : ChromaDB n'enregistre rien
+        return self._deleguer("is_legacy", defaut=True)
+
+    def default_space(self):
+        return self._deleguer("default_space", defaut="l2")
+
+    def supported_spaces(self):
+        return self._deleguer("supported_spaces", defaut=["cosine", "l2", "ip"])
+
+    def _memoriser(self, cle, vecteur):
+        self._lru[cle] = vecteur
+        self._lru.move_to_end(cle)
+        if len(self._lru) > self.taille_lru:
+            self._lru.popitem(last=False)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        cles = [cle_embedding(self.nom_modele, texte) for texte in input]
+        resultats = [None] * len(input)
+        manquants = OrderedDict()
+
+        with self._verrou:
+            for i, cle in enumerate(cles):
+                vecteur = self._lru.get(cle)
+                if vecteur is not None:
+                    self._lru.move_to_end(cle)
+                    self.hits_memoire += 1
+                else:
+                    vecteur = self.stockage.lire(cle)
+                    if vecteur is not None:
+                        self._memoriser(cle, vecteur)
+                        self.hits_disque += 1
+                if vecteur is not None:
+                    resultats[i] = vecteur
+                else:
+                    manquants.setdefault(cle, []).append(i)
+
+        if manquants:
+            # Un seul appel au modèle pour tous les textes inconnus
+            textes = [input[positions[0]] for positions in manquants.values()]
+            vecteurs = np.asarray(self.fonction(textes), dtype=np.float32)
+            with self._verrou:
+                nouvelles = [cle for cle in manquants if cle not in self.stockage.lignes]
+                a_ecrire = [vecteurs[j] for j, cle in enumerate(manquants)
+                            if cle not in self.stockage.lignes]
+                if nouvelles:
+                    self.stockage.ecrire(nouvelles, a_ecrire)
+                for vecteur, (cle, positions) in zip(vecteurs, manquants.items()):
+                    self._memoriser(cle, vecteur)
+                    self.miss += len(positions)
+                    for i in positions:
+                        resultats[i] = vecteur
+
+        return [vecteur.tolist() for vecteur in resultats]
+
+    def stats(self):
+        """
+        Compteurs de hits/miss pour mesurer les économies du cache
+        """
+        total = self.hits_memoire + self.hits_disque + self.miss
+        return {
+            "hits_memoire": self.hits_memoire,
+            "hits_disque": self.hits_disque,
+            "miss": self.miss,
+            "taux_hit": (self.hits_memoire + self.hits_disque) / total if total else 0.0,
+        }
+
+
+def cache_pour_client(chemin_client="./chroma", fonction=None, taille_lru=10000):
+    """
+    Cache d'embeddings placé à côté des données d'un PersistentClient
+    """
+    return EmbeddingFunctionEnCache(
+        fonction,
+        dossier=os.path.join(chemin_client, "cache_embeddings"),
+        taille_lru=taille_lru,
+    )
@@ -0,0 +1,181 @@
+# ============================================================================
+# CACHE DES RÉSULTATS DE REQUÊTES (TTL + LRU) AVEC INVALIDATION
+# ============================================================================
+#
+# Les questions fréquentes ("Qu'est-ce qu'une base de données vectorielle?")
+# sont servies depuis la mémoire au lieu d'être ré-embeddées et recherchées.
+# La clé du cache contient le texte normalisé, n_results, where,
+# where_document et include. Toute écriture (add, upsert, update, delete)
+# faite à travers l'enveloppe vide le cache de la collection.
+# ============================================================================
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from recherche_par_lots import (
+    INCLUDE_DEFAUT,
+    decouper_resultats,
+    fusionner_resultats,
+    rechercher_contextes,
+)
+
+
+def normaliser(texte):
+    """
+    Normalise une question : espaces superflus et casse ignorés
+    """
+    return " ".join(texte.split()).casefold()
+
+
+class CollectionAvecCache:
+    """
+    Enveloppe une collection ChromaDB avec un cache de résultats de query()
+
+    - ttl : durée de vie d'une entrée, en secondes
+    - taille_max : nombre maximal d'entrées (les moins récentes sont évincées)
+
+    Les écritures doivent passer par l'enveloppe pour invalider le cache.
+    Les résultats servis depuis le cache sont partagés : ne pas les modifier.
+    """
+
+    def __init__(self, collection, ttl=300, taille_max=1024):
+        self.collection = collection
+        self.ttl = ttl
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        # Incrémenté à chaque écriture : un résultat calculé avant une
+        # écriture n'est jamais mis en cache après elle
+        self._generation = 0
+        self.hits = 0
+        self.miss = 0
+        self.secondes_economisees = 0.0
+
+    def __getattr__(self, nom):
+        # count(), get(), name, metadata... passent directement
+        return getattr(self.collection, nom)
+
+    # ------------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------------
+
+    def query(self, query_texts=None, n_results=10, where=None, where_document=None,
+              include=None, **autres):
+        if query_texts is None or autres:
+            # Requête par embeddings ou options avancées : pas de cache
+            return self.collection.query(
+                query_texts=query_texts, n_results=n_results, where=where,
+                where_document=where_document,
+                include=list(include or INCLUDE_DEFAUT), **autres,
+            )
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        include = tuple(include or INCLUDE_DEFAUT)
+        parametres = (n_results, json.dumps(where, sort_keys=True),
+                      json.dumps(where_document, sort_keys=True), include)
+        cles = [(normaliser(texte),) + parametres for texte in query_texts]
+
+        par_requete = [None] * len(cles)
+        manquants = OrderedDict()
+        maintenant = time.monotonic()
+        with self._verrou:
+            generation = self._generation
+            for i, cle in enumerate(cles):
+                entree = self._entrees.get(cle)
+                if entree is not None and entree[0] > maintenant:
+                    self._entrees.move_to_end(cle)
+                    par_requete[i] = entree[1]
+                    self.hits += 1
+                    self.secondes_economisees += entree[2]
+                else:
+                    manquants.setdefault(cle, []).append(i)
+
+        if manquants:
+            debut = time.perf_counter()
+            textes = [query_texts[positions[0]] for positions in manquants.values()]
+            resultats = rechercher_contextes(
+                self.collection, textes, n_results, where=where,
+                where_document=where_document, include=include,
+            )
+            cout = (time.perf_counter() - debut) / len(textes)
+            with self._verrou:
+                for (cle, positions), resultat in zip(manquants.items(), resultats):
+                    self.miss += len(positions)
+                    for i in positions:
+                        par_requete[i] = resultat
+                    if generation == self._generation:
+                        self._entrees[cle] = (time.monotonic() + self.ttl, resultat, cout)
+                        self._entrees.move_to_end(cle)
+                while len(self._entrees) > self.taille_max:
+                    self._entrees.popitem(last=False)
+
+        return fusionner_resultats(par_requete)
+
+    # ------------------------------------------------------------------------
+    # Écritures : invalidation automatique
+    # ------------------------------------------------------------------------
+
+    def invalider(self):
+        with self._verrou:
+            self._generation += 1
+            self._entrees.clear()
+
+    def add(self, *args, **kwargs):
+        try:
+            return self.collection.add(*args, **kwargs)
+        finally:
+            self.invalider()
+
+    def upsert(self, *args, **kwargs):
+        try:
+            return self.collection.upsert(*args, **kwargs)
+        finally:
+            self.invalider()
+
+    def update(self, *args, **kwargs):
+        try:
+            return self.collection.update(*args, **kwargs)
+        finally:
+            self.invalider()
+
+    def delete(self, *args, **kwargs):
+        try:
+            return self.collection.delete(*args, **kwargs)
+        finally:
+            self.invalider()
+
+    # ------------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------------
+
+    def stats(self):
+        total = self.hits + self.miss
+        return {
+            "hits": self.hits,
+            "miss": self.miss,
+            "taux_hit": self.hits / total if total else 0.0,
+            "entrees": len(self._entrees),
+            "secondes_economisees": self.secondes_economisees,
+        }
+
+
+# ============================================================================
+# EXEMPLE
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    collection = CollectionAvecCache(client.get_or_create_collection(name="books"))
+    collection.upsert(
+        documents=["Livre Python à 50 €", "Livre R à 15 €", "Livre Java 49 €"],
+        ids=["id1", "id2", "id3"],
+    )
+
+    for _ in range(3):
+        resultats = collection.query(query_texts=["livre  python"], n_results=1)
+        print(resultats["documents"][0][0])
+    print(collection.stats())
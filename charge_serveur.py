@@ -0,0 +1,105 @@
+# ============================================================================
+# GÉNÉRATEUR DE CHARGE POUR serveur_requetes.py
+# ============================================================================
+#
+# `concurrence` clients envoient des questions en boucle pendant `duree`
+# secondes, chacun sur sa propre connexion HTTP keep-alive. Le rapport
+# donne le débit (requêtes par seconde), les latences p50/p95/p99 et le
+# nombre d'erreurs.
+#
+#   python serveur_requetes.py &
+#   python charge_serveur.py --collection books --concurrence 32 --duree 10
+# ============================================================================
+
+import http.client
+import itertools
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from benchmark import percentiles
+
+QUESTIONS_DEFAUT = [
+    "livre pas cher",
+    "apprendre Python",
+    "programmation web",
+    "statistiques",
+    "voiture allemande",
+    "SUV japonais",
+]
+
+
+def generer_charge(url, collection, questions=QUESTIONS_DEFAUT, concurrence=16, duree=10.0,
+                   n_results=1):
+    """
+    Envoie des requêtes en continu et renvoie débit et latences
+    """
+    cible = urlparse(url)
+    fin = time.perf_counter() + duree
+    durees, erreurs = [], []
+    verrou = threading.Lock()
+
+    def client(numero):
+        connexion = http.client.HTTPConnection(cible.hostname, cible.port, timeout=30)
+        mesures, echecs = [], 0
+        # Chaque client commence à un endroit différent de la liste
+        for question in itertools.islice(itertools.cycle(questions), numero, None):
+            if time.perf_counter() >= fin:
+                break
+            # En bytes : http.client envoie en-têtes et corps en un seul paquet
+            corps = json.dumps({"collection": collection, "question": question,
+                                "n_results": n_results}).encode("utf-8")
+            debut = time.perf_counter()
+            try:
+                connexion.request("POST", "/query", corps,
+                                  {"Content-Type": "application/json"})
+                reponse = connexion.getresponse()
+                reponse.read()
+                if reponse.will_close:
+                    connexion.close()
+                if reponse.status != 200:
+                    echecs += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                echecs += 1
+                connexion.close()
+                connexion = http.client.HTTPConnection(cible.hostname, cible.port, timeout=30)
+                continue
+            mesures.append(time.perf_counter() - debut)
+        connexion.close()
+        with verrou:
+            durees.extend(mesures)
+            erreurs.append(echecs)
+
+    debut = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrence)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    secondes = time.perf_counter() - debut
+
+    rapport = {"requetes": len(durees), "erreurs": sum(erreurs), "secondes": secondes,
+               "qps": len(durees) / secondes}
+    if durees:
+        rapport.update(percentiles(durees))
+    return rapport
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Charge sur le serveur de recherche")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--collection", default="books")
+    parser.add_argument("--concurrence", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duree", type=float, default=10.0)
+    args = parser.parse_args()
+
+    for concurrence in args.concurrence:
+        rapport = generer_charge(args.url, args.collection, concurrence=concurrence,
+                                 duree=args.duree)
+        print(f"# {concurrence:>3} clients: {rapport['qps']:8.1f} req/s  "
+              f"p50 {rapport.get('p50', 0):7.1f} ms  p95 {rapport.get('p95', 0):7.1f} ms  "
+              f"p99 {rapport.get('p99', 0):7.1f} ms  ({rapport['erreurs']} erreurs)")
@@ -153,6 +153,13 @@ documents_pagines = collection.get(
     include=["documents", "metadatas"]
 )
 
+# Parcourir toute une collection par lots avec un curseur
+# (coût constant par lot, alors qu'un offset élevé coûte de plus en plus cher)
+from parcours_collection import iterer_collection
+
+for lot in iterer_collection(collection, taille_lot=100, include=["documents", "metadatas"]):
+    print(f"# Lot de {len(lot['ids'])} documents")
+
 # ============================================================================
 # 6. MISE À JOUR DE DOCUMENTS (UPDATE)
 # ============================================================================
@@ -200,6 +207,9 @@ collection.upsert(
     ]
 )
 
+# Beaucoup de petites écritures ? EcrivainTamponne (ecriture_tamponnee.py)
+# les regroupe en quelques gros upsert/update/delete en arrière-plan
+
 # ============================================================================
 # 8. SUPPRESSION DE DOCUMENTS (DELETE)
 # ============================================================================
@@ -272,18 +282,31 @@ collection_custom = client_persistant.get_or_create_collection(
 # 11. EXEMPLE COMPLET DE SYSTÈME RAG
 # ============================================================================
 
-def systeme_rag_complet():
+def systeme_rag_complet(reclasseur=None):
     """
     Exemple d'un système RAG complet avec ChromaDB
+
+    `reclasseur` (reclassement.Reclasseur, optionnel) reclasse un ensemble
+    plus large de candidats avec un cross-encoder, dans un budget en ms.
     """
     # Étape 1: Initialiser le client avec persistance
     client = chromadb.PersistentClient(path="./rag_database")
     
     # Étape 2: Créer ou récupérer la collection
+    # Le cache d'embeddings évite de recalculer les documents déjà connus
+    from cache_embeddings import cache_pour_client
+
     collection = client.get_or_create_collection(
         name="base_connaissances",
-        metadata={"type": "RAG", "domaine": "informatique"}
+        metadata={"type": "RAG", "domaine": "informatique"},
+        embedding_function=cache_pour_client("./rag_database")
     )
+
+    # Chaque appel est chronométré par étape (embedding, ChromaDB...) ;
+    # les appels de plus de 200 ms sont journalisés avec leur filtre where
+    from instrumentation import CollectionInstrumentee
+
+    collection = CollectionInstrumentee(collection, seuil_lent_ms=200)
     
     # Étape 3: Charger les documents dans la base de connaissances
     documents_base = [
@@ -306,17 +329,18 @@ def systeme_rag_complet():
         ids=[f"kb_{i}" for i in range(len(documents_base))]
     )
     
-    # Étape 4: Fonction de recherche RAG
+    # Étape 4: Fonctions de recherche RAG
+    # Plusieurs questions peuvent être traitées en un seul query()
+    # (un seul appel au modèle d'embedding pour toutes les questions)
+    from recherche_par_lots import rechercher_contextes
+
     def rechercher_contexte(question, n_results=3):
         """
         Recherche les documents les plus pertinents pour la question
         """
-        resultats = collection.query(
-            query_texts=[question],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
-        )
-        return resultats
+        if reclasseur is not None:
+            return reclasseur.rechercher(collection, [question], n_results)[0]
+        return rechercher_contextes(collection, [question], n_results)[0]
     
     # Étape 5: Utiliser le système RAG
     question_utilisateur = "Qu'est-ce qu'une base de données vectorielle?"
@@ -334,6 +358,11 @@ def systeme_rag_complet():
     # Étape 6: Le contexte serait ensuite envoyé à un LLM pour générer la réponse
     print(f"\n# Le contexte ci-dessus serait maintenant envoyé à un LLM")
     print(f"# (comme GPT-4, Claude, etc.) pour générer une réponse complète")
+
+    # Durée moyenne de chaque étape (export complet: exporter_prometheus())
+    for operation, etapes in collection.exporter_json().items():
+        print(f"# {operation}: " + ", ".join(
+            f"{etape} {mesures['moyenne_ms']:.1f} ms" for etape, mesures in etapes.items()))
     
     return collection
 
@@ -352,7 +381,8 @@ BONNES PRATIQUES:
 
 1. PERSISTANCE:
    - Toujours utiliser PersistentClient en production
-   - Faire des sauvegardes régulières du dossier de données
+   - Faire des sauvegardes régulières des collections (sauvegarde.py :
+     archive compacte, restaurée sans recalculer les embeddings)
 
 2. GESTION DES COLLECTIONS:
    - Utiliser get_or_create_collection pour éviter les erreurs
@@ -378,6 +408,7 @@ BONNES PRATIQUES:
 6. RECHERCHE:
    - Ajuster n_results selon le besoin (3-5 généralement)
    - Utiliser where pour filtrer par métadonnées
+   - Clés de filtre fréquentes : index secondaires (voir index_secondaires.py)
    - Vérifier les distances pour évaluer la pertinence
 
 7. MISE À JOUR:
@@ -387,7 +418,7 @@ BONNES PRATIQUES:
 
 8. PERFORMANCE:
    - Limiter la taille des collections (< 1M documents)
-   - Indexer par thématique si nécessaire
+   - Indexer par thématique si nécessaire (voir collection_partitionnee.py)
    - Utiliser offset/limit pour la pagination
 
 9. SÉCURITÉ:
@@ -396,7 +427,7 @@ BONNES PRATIQUES:
    - Contrôler l'accès aux collections
 
 10. MONITORING:
-    - Logger les requêtes et performances
+    - Logger les requêtes et performances (voir instrumentation.py)
     - Surveiller la pertinence des résultats
     - Ajuster les paramètres selon les retours
 """
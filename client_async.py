@@ -0,0 +1,212 @@
+# ============================================================================
+# FAÇADE ASYNCIO POUR LE DÉPLOIEMENT HttpClient AVEC POOL DE CONNEXIONS
+# ============================================================================
+#
+# chromadb.HttpClient est bloquant : chaque appel immobilise le thread
+# appelant. Cette façade s'appuie sur chromadb.AsyncHttpClient et ajoute :
+# - un pool borné de connexions keep-alive vers le serveur (taille_pool)
+# - une limite de requêtes admises en même temps (concurrence_max)
+# - de la contre-pression : au-delà de file_max requêtes en attente (1024
+#   par défaut), FileSaturee est levée immédiatement au lieu de laisser la
+#   file grossir
+# - le calcul des embeddings dans un thread, pour ne pas bloquer la boucle
+# Un seul worker web peut ainsi garder des centaines de recherches en vol.
+# ============================================================================
+
+import asyncio
+import time
+
+import chromadb
+from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+
+
+class FileSaturee(Exception):
+    """
+    Trop de requêtes en attente : le serveur est saturé
+    """
+
+
+class ClientChromaAsync:
+    """
+    Client asynchrone vers un serveur ChromaDB (chroma run)
+
+    S'utilise avec `async with ClientChromaAsync(...) as client:` (ou
+    connecter() puis fermer()). file_max compte les requêtes en cours et en
+    attente ; None supprime la limite.
+    """
+
+    def __init__(self, host="localhost", port=8000, taille_pool=32,
+                 concurrence_max=256, file_max=1024, keepalive_secs=40):
+        self.host = host
+        self.port = port
+        self.taille_pool = taille_pool
+        self.file_max = file_max
+        self.settings = Settings(
+            chroma_http_max_connections=taille_pool,
+            chroma_http_max_keepalive_connections=taille_pool,
+            chroma_http_keepalive_secs=keepalive_secs,
+        )
+        self._semaphore = asyncio.Semaphore(concurrence_max)
+        self._en_attente = 0
+        self._client = None
+
+    async def connecter(self):
+        if self._client is None:
+            self._client = await chromadb.AsyncHttpClient(
+                host=self.host, port=self.port, settings=self.settings
+            )
+        return self
+
+    async def __aenter__(self):
+        return await self.connecter()
+
+    async def fermer(self):
+        """
+        Ferme les connexions keep-alive du pool httpx
+        """
+        client, self._client = self._client, None
+        if client is None:
+            return
+        # AsyncHttpClient n'a pas de close() : le pool httpx appartient à son
+        # AsyncFastAPI, qui le ferme dans __aexit__ (les pools de tous les
+        # clients asynchrones du processus, partagés par ChromaDB)
+        serveur = getattr(client, "_server", None)
+        if serveur is not None and hasattr(serveur, "__aexit__"):
+            await serveur.__aexit__(None, None, None)
+
+    async def __aexit__(self, *exc):
+        await self.fermer()
+
+    async def executer(self, coroutine):
+        """
+        Attend une place libre puis exécute la coroutine (contre-pression)
+        """
+        if self.file_max is not None and self._en_attente >= self.file_max:
+            coroutine.close()
+            raise FileSaturee(f"{self._en_attente} requêtes déjà en attente")
+        self._en_attente += 1
+        try:
+            async with self._semaphore:
+                return await coroutine
+        finally:
+            self._en_attente -= 1
+
+    async def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        await self.connecter()
+        fonction = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        collection = await self.executer(
+            self._client.get_or_create_collection(
+                name, metadata=metadata, embedding_function=fonction
+            )
+        )
+        return CollectionAsync(self, collection, fonction)
+
+
+class CollectionAsync:
+    """
+    Opérations asynchrones sur une collection (mêmes paramètres que Collection)
+    """
+
+    def __init__(self, client, collection, fonction_embedding):
+        self.client = client
+        self.collection = collection
+        self.fonction_embedding = fonction_embedding
+        self.name = collection.name
+
+    async def _embedder(self, textes):
+        if isinstance(textes, str):
+            textes = [textes]
+        # Le modèle est bloquant : il tourne dans un thread
+        return await asyncio.to_thread(self.fonction_embedding, list(textes))
+
+    async def upsert(self, **kwargs):
+        if kwargs.get("documents") is not None and kwargs.get("embeddings") is None:
+            kwargs["embeddings"] = await self._embedder(kwargs["documents"])
+        return await self.client.executer(self.collection.upsert(**kwargs))
+
+    async def query(self, **kwargs):
+        if kwargs.get("query_texts") is not None and kwargs.get("query_embeddings") is None:
+            kwargs["query_embeddings"] = await self._embedder(kwargs.pop("query_texts"))
+        return await self.client.executer(self.collection.query(**kwargs))
+
+    async def get(self, **kwargs):
+        return await self.client.executer(self.collection.get(**kwargs))
+
+    async def count(self):
+        return await self.client.executer(self.collection.count())
+
+    async def delete(self, **kwargs):
+        return await self.client.executer(self.collection.delete(**kwargs))
+
+
+# ============================================================================
+# BENCHMARK DE DÉBIT CONTRE UN SERVEUR LOCAL
+# ============================================================================
+#
+# Démarrer d'abord un serveur local :
+#     chroma run --path ./bench_chroma --port 8000
+# Les embeddings sont aléatoires pour mesurer le serveur et non le modèle.
+# ============================================================================
+
+def _percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(p / 100 * len(valeurs)))]
+
+
+async def benchmark(host="localhost", port=8000, nb_documents=2000, nb_requetes=1000,
+                    taille_pool=32, concurrence=256, dimension=384):
+    import random
+
+    def vecteur():
+        return [random.random() for _ in range(dimension)]
+
+    # Toutes les requêtes sont lancées d'un coup : la file n'est pas bornée ici
+    async with ClientChromaAsync(host, port, taille_pool=taille_pool,
+                                 concurrence_max=concurrence, file_max=None) as client:
+        collection = await client.get_or_create_collection("bench_async")
+        for debut in range(0, nb_documents, 500):
+            ids = [f"doc_{i}" for i in range(debut, min(debut + 500, nb_documents))]
+            await collection.upsert(ids=ids, embeddings=[vecteur() for _ in ids])
+        requetes = [vecteur() for _ in range(nb_requetes)]
+
+        # Référence : HttpClient bloquant, une requête après l'autre
+        synchrone = chromadb.HttpClient(host=host, port=port).get_collection("bench_async")
+        debut = time.perf_counter()
+        for requete in requetes:
+            synchrone.query(query_embeddings=[requete], n_results=5)
+        duree_sync = time.perf_counter() - debut
+
+        # Façade asynchrone : toutes les requêtes en vol en même temps
+        latences = []
+
+        async def une_requete(requete):
+            debut_requete = time.perf_counter()
+            await collection.query(query_embeddings=[requete], n_results=5)
+            latences.append(time.perf_counter() - debut_requete)
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(une_requete(requete) for requete in requetes))
+        duree_async = time.perf_counter() - debut
+
+    print(f"# Synchrone : {nb_requetes / duree_sync:.0f} requêtes/s")
+    print(f"# Asynchrone: {nb_requetes / duree_async:.0f} requêtes/s "
+          f"(pool {taille_pool}, concurrence {concurrence})")
+    print(f"# Latence async p50={_percentile(latences, 50) * 1000:.1f} ms "
+          f"p99={_percentile(latences, 99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de la façade asynchrone")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--requetes", type=int, default=1000)
+    parser.add_argument("--pool", type=int, default=32)
+    parser.add_argument("--concurrence", type=int, default=256)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.host, args.port, args.documents, args.requetes,
+                          args.pool, args.concurrence))
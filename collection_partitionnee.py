@@ -0,0 +1,324 @@
+# ============================================================================
+# COLLECTION PARTITIONNÉE: N COLLECTIONS, RECHERCHE EN PARALLÈLE
+# ============================================================================
+#
+# Les bonnes pratiques conseillent de limiter une collection (< 1M
+# documents) et de découper par thématique ; il faut alors interroger
+# plusieurs collections à la main. CollectionPartitionnee s'utilise comme
+# une seule collection :
+# - les écritures sont routées vers N collections (nom_00, nom_01, ...)
+#   selon un hash stable de l'id, ou de la valeur d'une clé de métadonnées
+# - un document existant reste dans sa partition ; upsert() ou update() de
+#   la clé de partition le déplace dans sa nouvelle partition
+# - query() calcule l'embedding de la question une seule fois, interroge
+#   toutes les partitions en parallèle (pool de threads), puis garde les
+#   k meilleurs résultats globaux par distance
+# ============================================================================
+
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+from outils_vecteurs import fonction_embedding_de
+from recherche_par_lots import INCLUDE_DEFAUT
+
+
+def hash_stable(valeur):
+    """
+    Hash indépendant du processus (hash() de Python change à chaque lancement)
+    """
+    return int.from_bytes(hashlib.md5(str(valeur).encode("utf-8")).digest()[:8], "big")
+
+
+class CollectionPartitionnee:
+    """
+    Une collection logique répartie sur `nb_partitions` collections
+
+    - cle_partition : None pour router par id, ou une clé de métadonnées
+      (ex. "topic") pour regrouper les documents d'une même valeur ; un
+      nouveau document doit alors avoir cette clé
+    - options : passées à get_or_create_collection (embedding_function...)
+    """
+
+    def __init__(self, client, nom, nb_partitions=4, cle_partition=None, nb_workers=None,
+                 **options):
+        self.nom = nom
+        self.cle_partition = cle_partition
+        self.partitions = [
+            client.get_or_create_collection(name=f"{nom}_{i:02d}", **options)
+            for i in range(nb_partitions)
+        ]
+        self.pool = ThreadPoolExecutor(max_workers=nb_workers or nb_partitions)
+        self._fonction_embedding = None
+
+    @property
+    def name(self):
+        return self.nom
+
+    def __getattr__(self, nom):
+        # metadata, configuration... : ceux de la première partition
+        if nom == "partitions":
+            raise AttributeError(nom)
+        return getattr(self.partitions[0], nom)
+
+    def fermer(self):
+        self.pool.shutdown(wait=True)
+
+    close = fermer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def partition_de(self, id_document, metadonnees=None):
+        if self.cle_partition is None:
+            cle = id_document
+        else:
+            cle = (metadonnees or {}).get(self.cle_partition)
+        return hash_stable(cle) % len(self.partitions)
+
+    def _sur_partitions(self, fonction, numeros=None):
+        """
+        Appelle fonction(partition) sur chaque partition, en parallèle
+        """
+        numeros = range(len(self.partitions)) if numeros is None else numeros
+        return list(self.pool.map(lambda i: fonction(self.partitions[i]), numeros))
+
+    # ------------------------------------------------------------------------
+    # Écritures
+    # ------------------------------------------------------------------------
+
+    def _ecrire(self, methode, ids, documents=None, embeddings=None, metadatas=None,
+                positions=None):
+        positions = range(len(ids)) if positions is None else positions
+        groupes = {}
+        for position in positions:
+            metadonnees = metadatas[position] if metadatas is not None else None
+            groupes.setdefault(self.partition_de(ids[position], metadonnees), []).append(position)
+
+        def ecrire(numero):
+            positions = groupes[numero]
+            parametres = {"ids": [ids[p] for p in positions]}
+            for cle, valeurs in (("documents", documents), ("embeddings", embeddings),
+                                 ("metadatas", metadatas)):
+                if valeurs is not None:
+                    parametres[cle] = [valeurs[p] for p in positions]
+            getattr(self.partitions[numero], methode)(**parametres)
+
+        list(self.pool.map(ecrire, groupes))
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._ecrire_par_cle("add", ids, documents, embeddings, metadatas)
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._ecrire_par_cle("upsert", ids, documents, embeddings, metadatas)
+
+    def update(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._ecrire_par_cle("update", ids, documents, embeddings, metadatas)
+
+    def _localiser(self, ids):
+        """
+        {id: (partition actuelle, métadonnées enregistrées)} des ids existants
+        """
+        actuelles = {}
+        trouves = self._sur_partitions(lambda p: p.get(ids=ids, include=["metadatas"]))
+        for numero, trouve in enumerate(trouves):
+            for id_document, metadonnees in zip(trouve["ids"], trouve["metadatas"]):
+                actuelles[id_document] = (numero, metadonnees or {})
+        return actuelles
+
+    def _ecrire_par_cle(self, methode, ids, documents, embeddings, metadatas):
+        if self.cle_partition is None:
+            self._ecrire(methode, ids, documents, embeddings, metadatas)
+            return
+        # La partition actuelle d'un id dépend de la valeur enregistrée de la clé
+        actuelles = self._localiser(ids)
+        nouveaux = [p for p, id_document in enumerate(ids) if id_document not in actuelles]
+        if methode != "update" and nouveaux:
+            sans_cle = [ids[p] for p in nouveaux
+                        if metadatas is None or self.cle_partition not in (metadatas[p] or {})]
+            if sans_cle:
+                raise ValueError(f"Clé de partition {self.cle_partition!r} absente des "
+                                 f"métadonnées des nouveaux documents : {sans_cle[:5]}")
+            self._ecrire(methode, ids, documents, embeddings, metadatas, nouveaux)
+        if methode == "add":
+            # ChromaDB ignore l'add d'un id existant
+            return
+
+        sur_place, deplaces = {}, {}
+        for position, id_document in enumerate(ids):
+            if id_document not in actuelles:
+                # ChromaDB ignore l'update d'un id inexistant
+                continue
+            numero, anciennes = actuelles[id_document]
+            cible = numero
+            if metadatas is not None and self.cle_partition in (metadatas[position] or {}):
+                cible = self.partition_de(id_document, {**anciennes, **metadatas[position]})
+            if cible == numero:
+                sur_place.setdefault(numero, []).append(position)
+            else:
+                deplaces.setdefault(numero, []).append((position, cible))
+
+        def extraire(valeurs, positions):
+            return None if valeurs is None else [valeurs[p] for p in positions]
+
+        def mettre_a_jour(numero):
+            positions = sur_place[numero]
+            getattr(self.partitions[numero], methode)(
+                ids=[ids[p] for p in positions], documents=extraire(documents, positions),
+                embeddings=extraire(embeddings, positions),
+                metadatas=extraire(metadatas, positions))
+
+        list(self.pool.map(mettre_a_jour, sur_place))
+        for numero, elements in deplaces.items():
+            self._deplacer(numero, elements, ids, documents, embeddings, metadatas)
+
+    def _deplacer(self, numero, elements, ids, documents, embeddings, metadatas):
+        """
+        La clé de partition change : le document complet passe dans sa nouvelle partition
+        """
+        anciens_ids = [ids[p] for p, _ in elements]
+        anciens = self.partitions[numero].get(ids=anciens_ids,
+                                              include=["documents", "embeddings", "metadatas"])
+        par_id = {i: position for position, i in enumerate(anciens["ids"])}
+        a_calculer = [p for p, _ in elements if documents is not None and embeddings is None]
+        if a_calculer:
+            # Nouveau document sans embedding : calculé une fois, ici
+            if self._fonction_embedding is None:
+                self._fonction_embedding = fonction_embedding_de(self.partitions[0])
+            calcules = dict(zip(a_calculer, self._fonction_embedding(
+                [documents[p] for p in a_calculer])))
+
+        cibles = {}
+        for position, cible in elements:
+            ancien = par_id[ids[position]]
+            metadonnees = {**(anciens["metadatas"][ancien] or {}), **metadatas[position]}
+            if embeddings is not None:
+                vecteur = embeddings[position]
+            elif documents is not None:
+                vecteur = calcules[position]
+            else:
+                vecteur = anciens["embeddings"][ancien]
+            element = cibles.setdefault(cible, {"ids": [], "documents": [], "embeddings": [],
+                                                "metadatas": []})
+            element["ids"].append(ids[position])
+            element["documents"].append(documents[position] if documents is not None
+                                        else anciens["documents"][ancien])
+            element["embeddings"].append(vecteur)
+            # Une valeur None supprime la clé, comme dans update()
+            element["metadatas"].append({c: v for c, v in metadonnees.items() if v is not None}
+                                        or None)
+        for cible, element in cibles.items():
+            self.partitions[cible].upsert(**element)
+        self.partitions[numero].delete(ids=anciens_ids)
+
+    def delete(self, ids=None, where=None, where_document=None):
+        if ids is not None and self.cle_partition is None and not where and not where_document:
+            groupes = {}
+            for id_document in ids:
+                groupes.setdefault(self.partition_de(id_document), []).append(id_document)
+            list(self.pool.map(lambda n: self.partitions[n].delete(ids=groupes[n]), groupes))
+        else:
+            self._sur_partitions(lambda p: p.delete(ids=ids, where=where,
+                                                    where_document=where_document))
+
+    # ------------------------------------------------------------------------
+    # Lectures
+    # ------------------------------------------------------------------------
+
+    def _partitions_ciblees(self, where):
+        """
+        Un filtre d'égalité sur la clé de partition ne concerne qu'une partition
+        """
+        if self.cle_partition is None or not where or len(where) != 1:
+            return None
+        condition = where.get(self.cle_partition)
+        if isinstance(condition, dict):
+            condition = condition.get("$eq") if list(condition) == ["$eq"] else None
+        if condition is None:
+            return None
+        return [self.partition_de(None, {self.cle_partition: condition})]
+
+    def count(self):
+        return sum(self._sur_partitions(lambda p: p.count()))
+
+    def get(self, ids=None, where=None, where_document=None, include=("documents", "metadatas")):
+        morceaux = self._sur_partitions(
+            lambda p: p.get(ids=ids, where=where, where_document=where_document,
+                            include=list(include)),
+            self._partitions_ciblees(where),
+        )
+        resultat = {"ids": []}
+        for cle in include:
+            resultat[cle] = []
+        for morceau in morceaux:
+            resultat["ids"].extend(morceau["ids"])
+            for cle in include:
+                resultat[cle].extend(morceau[cle])
+        return resultat
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None,
+              where_document=None, include=INCLUDE_DEFAUT):
+        if query_embeddings is None:
+            if isinstance(query_texts, str):
+                query_texts = [query_texts]
+            if self._fonction_embedding is None:
+                self._fonction_embedding = fonction_embedding_de(self.partitions[0])
+            # Un seul calcul d'embedding, partagé par toutes les partitions
+            query_embeddings = self._fonction_embedding(query_texts)
+        include = list(dict.fromkeys([*include, "distances"]))
+
+        def interroger(partition):
+            nb_documents = partition.count()
+            if nb_documents == 0:
+                return None
+            return partition.query(query_embeddings=query_embeddings,
+                                   n_results=min(n_results, nb_documents), where=where,
+                                   where_document=where_document, include=include)
+
+        morceaux = [m for m in self._sur_partitions(interroger, self._partitions_ciblees(where))
+                    if m is not None]
+
+        resultat = {cle: [] for cle in ["ids", *include]}
+        for numero_requete in range(len(query_embeddings)):
+            candidats = (
+                (morceau["distances"][numero_requete][rang], numero_morceau, rang)
+                for numero_morceau, morceau in enumerate(morceaux)
+                for rang in range(len(morceau["ids"][numero_requete]))
+            )
+            meilleurs = heapq.nsmallest(n_results, candidats)
+            for cle in resultat:
+                resultat[cle].append([morceaux[m][cle][numero_requete][rang]
+                                      for _, m, rang in meilleurs])
+        return resultat
+
+
+# ============================================================================
+# EXEMPLE: BASE DE CONNAISSANCES PARTITIONNÉE PAR THÈME
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    with CollectionPartitionnee(client, "base_connaissances", nb_partitions=3,
+                                cle_partition="topic") as collection:
+        collection.upsert(
+            documents=[
+                "RAG combine la recherche et la génération pour créer des réponses précises",
+                "ChromaDB est une base de données vectorielle open-source",
+                "Les embeddings transforment le texte en vecteurs numériques",
+                "La recherche sémantique permet de trouver des documents similaires par le sens",
+            ],
+            metadatas=[{"topic": "RAG"}, {"topic": "Database"}, {"topic": "NLP"},
+                       {"topic": "Search"}],
+            ids=["kb_0", "kb_1", "kb_2", "kb_3"],
+        )
+        print(f"# {collection.count()} documents sur {len(collection.partitions)} partitions")
+
+        resultats = collection.query(query_texts=["Qu'est-ce qu'une base vectorielle?"],
+                                     n_results=2)
+        for document, distance in zip(resultats["documents"][0], resultats["distances"][0]):
+            print(f"  - {document} ({distance:.3f})")
@@ -0,0 +1,186 @@
+# ============================================================================
+# DÉCOUPAGE (CHUNKING) DES LONGS DOCUMENTS AVANT INSERTION
+# ============================================================================
+#
+# Bonne pratique n°5 du guide RAG : découper les longs documents en morceaux
+# de 200-500 mots, avec un chevauchement pour ne pas perdre le contexte.
+# - découpage par mots ou par phrases, avec chevauchement
+# - découpage en parallèle dans un pool de processus
+# - métadonnées du document parent et position (offsets) de chaque morceau
+# - morceaux regroupés en lots de taille fixe pour upsert
+# ============================================================================
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ingestion_csv import lire_csv, par_lots
+
+MOTIF_MOT = re.compile(r"\S+")
+MOTIF_PHRASE = re.compile(r"[^\s.!?][^.!?]*(?:[.!?]+|$)")
+
+
+# ============================================================================
+# DÉCOUPAGE D'UN TEXTE
+# ============================================================================
+
+def _fenetres_mots(texte, taille, chevauchement):
+    mots = [m.span() for m in MOTIF_MOT.finditer(texte)]
+    pas = max(1, taille - chevauchement)
+    for debut in range(0, len(mots), pas):
+        fenetre = mots[debut:debut + taille]
+        yield fenetre[0][0], fenetre[-1][1]
+        if debut + taille >= len(mots):
+            return
+
+
+def _fenetres_phrases(texte, taille, chevauchement):
+    courant = []
+    nouveau = False
+    for m in MOTIF_PHRASE.finditer(texte):
+        nb_mots = len(MOTIF_MOT.findall(m.group()))
+        if not nb_mots:
+            continue
+        courant.append((m.start(), m.end(), nb_mots))
+        nouveau = True
+        if sum(phrase[2] for phrase in courant) >= taille:
+            yield courant[0][0], courant[-1][1]
+            # Les dernières phrases sont reprises au début du morceau suivant
+            garde = []
+            while courant and sum(p[2] for p in garde) + courant[-1][2] <= chevauchement:
+                garde.insert(0, courant.pop())
+            courant = garde
+            nouveau = False
+    if nouveau:
+        yield courant[0][0], courant[-1][1]
+
+
+def decouper_texte(texte, taille=300, chevauchement=50, mode="mots"):
+    """
+    Découpe un texte en morceaux de `taille` mots environ
+
+    Renvoie une liste de tuples (morceau, debut, fin) où debut et fin sont
+    les positions des caractères dans le texte d'origine.
+    """
+    if chevauchement >= taille:
+        raise ValueError("Le chevauchement doit être plus petit que la taille")
+    if mode == "mots":
+        fenetres = _fenetres_mots(texte, taille, chevauchement)
+    elif mode == "phrases":
+        fenetres = _fenetres_phrases(texte, taille, chevauchement)
+    else:
+        raise ValueError(f"Mode inconnu: {mode!r} (attendu: 'mots' ou 'phrases')")
+    return [(texte[debut:fin], debut, fin) for debut, fin in fenetres]
+
+
+def decouper_document(id_parent, texte, taille=300, chevauchement=50, mode="mots"):
+    """
+    Découpe un document et prépare (id, document, métadonnées) par morceau
+    """
+    return [
+        (
+            f"{id_parent}#{numero}",
+            morceau,
+            {"parent": id_parent, "numero": numero, "debut": debut, "fin": fin},
+        )
+        for numero, (morceau, debut, fin) in enumerate(
+            decouper_texte(texte, taille, chevauchement, mode)
+        )
+    ]
+
+
+def _decouper_source(arguments):
+    # Point d'entrée des processus workers
+    return decouper_document(*arguments)
+
+
+# ============================================================================
+# SOURCES DE DOCUMENTS
+# ============================================================================
+
+def sources_fichiers(chemins, encodage="utf-8", racine=None):
+    """
+    Générateur de (id_parent, texte) pour des fichiers texte
+
+    L'id est le chemin relatif à `racine` (par défaut le dossier courant),
+    avec des "/" : deux fichiers de même nom dans des dossiers différents
+    gardent des morceaux distincts.
+    """
+    racine = os.path.abspath(racine or os.getcwd())
+    for chemin in chemins:
+        id_parent = os.path.relpath(os.path.abspath(chemin), racine).replace(os.sep, "/")
+        with open(chemin, encoding=encodage) as fichier:
+            yield id_parent, fichier.read()
+
+
+def sources_csv(chemin, colonne_texte, colonne_id, encodage="ISO-8859-1"):
+    """
+    Générateur de (id_parent, texte) pour une colonne texte d'un CSV
+    """
+    for ligne in lire_csv(chemin, encodage=encodage):
+        yield ligne[colonne_id], ligne[colonne_texte]
+
+
+# ============================================================================
+# DÉCOUPAGE PARALLÈLE EN LOTS DE TAILLE FIXE
+# ============================================================================
+
+def lots_de_chunks(sources, taille_lot=100, taille=300, chevauchement=50,
+                   mode="mots", nb_workers=None):
+    """
+    Découpe les documents dans un pool de processus et renvoie des lots
+
+    Les lots ont le format de ingestion_csv : {"ids", "documents",
+    "metadatas"} et contiennent tous `taille_lot` morceaux (sauf le dernier).
+    Au plus quelques documents par worker sont en vol : la mémoire reste
+    bornée même pour un très gros corpus.
+    """
+    nb_workers = nb_workers or os.cpu_count() or 1
+
+    def morceaux():
+        with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+            en_vol = deque()
+            for id_parent, texte in sources:
+                en_vol.append(executor.submit(
+                    _decouper_source, (id_parent, texte, taille, chevauchement, mode)
+                ))
+                # Les résultats sont rendus dans l'ordre des documents
+                while len(en_vol) > 4 * nb_workers:
+                    yield from en_vol.popleft().result()
+            while en_vol:
+                yield from en_vol.popleft().result()
+
+    for lot in par_lots(morceaux(), taille_lot):
+        ids, documents, metadatas = zip(*lot)
+        yield {"ids": list(ids), "documents": list(documents), "metadatas": list(metadatas)}
+
+
+# ============================================================================
+# EXEMPLE: INDEXER DES FICHIERS TEXTE PAR MORCEAUX
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    from ingestion_csv import ingerer_lots
+
+    parser = argparse.ArgumentParser(description="Découpe et indexe des fichiers texte")
+    parser.add_argument("fichiers", nargs="+")
+    parser.add_argument("--collection", default="documents_decoupes")
+    parser.add_argument("--taille", type=int, default=300)
+    parser.add_argument("--chevauchement", type=int, default=50)
+    parser.add_argument("--mode", choices=["mots", "phrases"], default="mots")
+    parser.add_argument("--taille-lot", type=int, default=100)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path="./rag_database")
+    collection = client.get_or_create_collection(name=args.collection)
+    lots = lots_de_chunks(
+        sources_fichiers(args.fichiers), taille_lot=args.taille_lot,
+        taille=args.taille, chevauchement=args.chevauchement, mode=args.mode,
+    )
+    stats = ingerer_lots(collection, lots)
+    print(f"# {stats['lignes']} morceaux indexés dans {args.collection}")
@@ -0,0 +1,232 @@
+# ============================================================================
+# DÉDUPLICATION SÉMANTIQUE PENDANT L'INGESTION
+# ============================================================================
+#
+# Beaucoup de lignes de diamonds.csv ne diffèrent que par leur index : elles
+# donnent le même document, occupent l'index et encombrent le top-k. Cette
+# étape (optionnelle) se place entre preparer_lots et l'écriture :
+# 1. les embeddings du lot sont calculés une fois (et réutilisés par upsert)
+# 2. chaque document est comparé à la collection existante : un seul
+#    query() pour tout le lot, plus proche voisin d'un autre id
+# 3. puis aux documents déjà gardés pendant cette ingestion (lot compris) :
+#    un LSH par hyperplans aléatoires (plusieurs tables) ne propose que
+#    quelques candidats, comparés ensuite en NumPy (similarité cosinus)
+# Au-dessus de `seuil`, le document est écarté ("ignorer") ou écarté et
+# compté dans les métadonnées du document gardé ("fusionner").
+# ============================================================================
+
+import numpy as np
+
+from outils_vecteurs import espace_de, fonction_embedding_de
+
+# Métadonnées ajoutées au document gardé en mode "fusionner"
+CLE_NB_DOUBLONS = "nb_doublons"
+CLE_IDS_DOUBLONS = "ids_doublons"
+
+
+def similarites_depuis_distances(distances, espace):
+    """
+    Similarité cosinus à partir des distances de query() (vecteurs normalisés)
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if espace == "l2":
+        return 1 - distances / 2
+    return 1 - distances
+
+
+class Deduplicateur:
+    """
+    Étape de déduplication sémantique des lots d'ingestion
+
+    - seuil : similarité cosinus à partir de laquelle deux documents sont
+      considérés comme des doublons
+    - mode : "ignorer" ou "fusionner"
+    - nb_tables, nb_bits : LSH ; plus de tables = moins de doublons manqués,
+      plus de bits = moins de candidats à comparer
+    - contre_collection : comparer aussi aux documents déjà dans la collection
+    """
+
+    def __init__(self, seuil=0.97, mode="ignorer", nb_tables=8, nb_bits=8,
+                 contre_collection=True, graine=0):
+        if mode not in ("ignorer", "fusionner"):
+            raise ValueError(f"Mode inconnu: {mode!r} (attendu: 'ignorer' ou 'fusionner')")
+        self.seuil = seuil
+        self.mode = mode
+        self.nb_tables = nb_tables
+        self.nb_bits = nb_bits
+        self.contre_collection = contre_collection
+        self.generateur = np.random.default_rng(graine)
+        self.plans = None
+        self.seaux = [{} for _ in range(nb_tables)]
+        self.gardes = np.empty((0, 0), dtype=np.float32)
+        self.ids_gardes = []
+        self.nb_gardes = 0
+        self.stats = {"lus": 0, "gardes": 0, "doublons_lot": 0, "doublons_collection": 0}
+
+    # ------------------------------------------------------------------------
+    # LSH par hyperplans aléatoires
+    # ------------------------------------------------------------------------
+
+    def _signatures(self, vecteurs):
+        if self.plans is None:
+            self.plans = self.generateur.standard_normal(
+                (vecteurs.shape[1], self.nb_tables * self.nb_bits)).astype(np.float32)
+        bits = (vecteurs @ self.plans > 0).reshape(len(vecteurs), self.nb_tables, self.nb_bits)
+        return bits @ (1 << np.arange(self.nb_bits))
+
+    def _garder(self, id_document, vecteur, signature):
+        if self.nb_gardes == len(self.gardes):
+            # Capacité doublée : ajout en O(1) amorti
+            agrandi = np.empty((max(1024, 2 * len(self.gardes)), len(vecteur)), dtype=np.float32)
+            if self.nb_gardes:
+                agrandi[:self.nb_gardes] = self.gardes[:self.nb_gardes]
+            self.gardes = agrandi
+        self.gardes[self.nb_gardes] = vecteur
+        for table, seau in zip(self.seaux, signature):
+            table.setdefault(int(seau), []).append(self.nb_gardes)
+        self.ids_gardes.append(id_document)
+        self.nb_gardes += 1
+
+    def _doublon_session(self, vecteur, signature):
+        candidats = set()
+        for table, seau in zip(self.seaux, signature):
+            candidats.update(table.get(int(seau), ()))
+        if not candidats:
+            return None
+        candidats = np.fromiter(candidats, dtype=np.int64)
+        similarites = self.gardes[candidats] @ vecteur
+        meilleur = int(similarites.argmax())
+        if similarites[meilleur] >= self.seuil:
+            return self.ids_gardes[candidats[meilleur]]
+        return None
+
+    # ------------------------------------------------------------------------
+    # Comparaison à la collection existante
+    # ------------------------------------------------------------------------
+
+    def _doublons_collection(self, collection, ids, embeddings):
+        """
+        Pour chaque document, l'id d'un document existant trop similaire (ou None)
+        """
+        resultat = [None] * len(ids)
+        if not self.contre_collection or collection.count() == 0:
+            return resultat
+        voisins = collection.query(query_embeddings=embeddings, n_results=2,
+                                   include=["distances"])
+        espace = espace_de(collection)
+        for i, (id_document, ids_voisins, distances) in enumerate(
+                zip(ids, voisins["ids"], voisins["distances"])):
+            for id_voisin, similarite in zip(ids_voisins,
+                                             similarites_depuis_distances(distances, espace)):
+                # Le document lui-même (ré-ingestion) n'est pas un doublon
+                if id_voisin != id_document:
+                    if similarite >= self.seuil:
+                        resultat[i] = id_voisin
+                    break
+        return resultat
+
+    # ------------------------------------------------------------------------
+    # Étape d'ingestion
+    # ------------------------------------------------------------------------
+
+    def filtrer(self, collection, lots, pipeline=None):
+        """
+        Générateur : les lots sans leurs doublons, avec leurs embeddings
+
+        Si `pipeline` (PipelineEmbeddings) est fourni, il calcule les embeddings.
+        """
+        fonction = None if pipeline is not None else fonction_embedding_de(collection)
+        for lot in lots:
+            documents = lot["documents"]
+            if lot.get("embeddings") is not None:
+                embeddings = lot["embeddings"]
+            elif pipeline is not None:
+                embeddings = [v for future in pipeline.soumettre(documents) for v in future.result()]
+            else:
+                embeddings = fonction(documents)
+            vecteurs = np.asarray(embeddings, dtype=np.float32)
+            normalises = vecteurs / np.maximum(
+                np.linalg.norm(vecteurs, axis=1, keepdims=True), 1e-12)
+            signatures = self._signatures(normalises)
+            existants = self._doublons_collection(collection, lot["ids"], vecteurs)
+
+            metadatas = lot.get("metadatas")
+            gardes, fusions = [], {}
+            for i, id_document in enumerate(lot["ids"]):
+                self.stats["lus"] += 1
+                original = existants[i]
+                if original is not None:
+                    self.stats["doublons_collection"] += 1
+                else:
+                    original = self._doublon_session(normalises[i], signatures[i])
+                    if original is not None:
+                        self.stats["doublons_lot"] += 1
+                if original is None:
+                    self._garder(id_document, normalises[i], signatures[i])
+                    gardes.append(i)
+                else:
+                    fusions.setdefault(original, []).append(id_document)
+            self.stats["gardes"] += len(gardes)
+
+            sortie = {
+                "ids": [lot["ids"][i] for i in gardes],
+                "documents": [documents[i] for i in gardes],
+                "embeddings": [vecteurs[i] for i in gardes],
+                "metadatas": [dict(metadatas[i] or {}) for i in gardes] if metadatas else None,
+            }
+            if self.mode == "fusionner" and fusions:
+                self._fusionner(collection, sortie, fusions)
+            if sortie["ids"]:
+                yield sortie
+
+    def _fusionner(self, collection, sortie, fusions):
+        """
+        Compte les doublons écartés dans les métadonnées du document gardé
+        """
+        def annoter(metadonnees, doublons):
+            metadonnees = dict(metadonnees or {})
+            connus = [i for i in metadonnees.get(CLE_IDS_DOUBLONS, "").split(",") if i]
+            connus.extend(doublons)
+            metadonnees[CLE_NB_DOUBLONS] = len(connus)
+            metadonnees[CLE_IDS_DOUBLONS] = ",".join(connus)
+            return metadonnees
+
+        if sortie["metadatas"] is None:
+            sortie["metadatas"] = [{} for _ in sortie["ids"]]
+        positions = {id_document: i for i, id_document in enumerate(sortie["ids"])}
+        for original in [o for o in fusions if o in positions]:
+            i = positions[original]
+            sortie["metadatas"][i] = annoter(sortie["metadatas"][i], fusions.pop(original))
+        if fusions:
+            # Documents gardés dans un lot précédent ou déjà dans la collection
+            existants = collection.get(ids=list(fusions), include=["metadatas"])
+            if existants["ids"]:
+                collection.update(
+                    ids=existants["ids"],
+                    metadatas=[annoter(m, fusions[i])
+                               for i, m in zip(existants["ids"], existants["metadatas"])],
+                )
+
+    def resume(self):
+        doublons = self.stats["doublons_lot"] + self.stats["doublons_collection"]
+        return (f"# Déduplication: {doublons} doublons écartés sur {self.stats['lus']} "
+                f"documents ({self.stats['doublons_lot']} dans l'ingestion, "
+                f"{self.stats['doublons_collection']} déjà dans la collection)")
+
+
+# ============================================================================
+# EXEMPLE: diamonds.csv SANS LES LIGNES IDENTIQUES
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    from ingestion_csv import COLONNES_DIAMANTS, MODELE_DIAMANTS, ingerer_csv
+
+    client = chromadb.PersistentClient()
+    collection = client.get_or_create_collection(name="diamonds_dedupliques")
+
+    deduplication = Deduplicateur(seuil=0.99, mode="fusionner")
+    ingerer_csv(collection, "diamonds.csv", MODELE_DIAMANTS, client=client,
+                colonnes_metadonnees=COLONNES_DIAMANTS, deduplication=deduplication)
+    print(deduplication.resume())
@@ -0,0 +1,213 @@
+# ============================================================================
+# DÉMARRAGE RAPIDE D'UN PERSISTENTCLIENT (CHARGEMENT PARESSEUX)
+# ============================================================================
+#
+# Un script court (main3.py, population.py) paie à chaque lancement :
+# l'import de chromadb (~1 s), la création du client, le chargement du
+# modèle d'embedding et celui de l'index HNSW à la première requête.
+# DemarrageRapide :
+# - n'importe chromadb et ne crée le client qu'au premier accès
+# - renvoie des collections paresseuses, résolues à la première utilisation
+# - peut précharger en arrière-plan une liste de collections (client,
+#   modèle et index), pendant que le script fait autre chose (ex. input())
+# - note la durée de chaque étape, pour savoir où passent les secondes
+#
+# L'index HNSW est chargé par ChromaDB lui-même : le préchargement se
+# contente de le déclencher (une petite requête) avant la vraie question.
+# ============================================================================
+
+import importlib
+import threading
+import time
+
+from outils_vecteurs import fonction_embedding_de
+
+
+class CollectionParesseuse:
+    """
+    Collection résolue au premier accès (get_or_create_collection)
+    """
+
+    def __init__(self, demarrage, nom):
+        self._demarrage = demarrage
+        self._nom = nom
+
+    def __getattr__(self, nom):
+        return getattr(self._demarrage.obtenir(self._nom), nom)
+
+
+class DemarrageRapide:
+    """
+    PersistentClient ouvert à la demande, avec préchargement optionnel
+
+    - chemin : dossier du PersistentClient
+    - precharger : noms des collections à préparer en arrière-plan, ou
+      dictionnaire {nom: fabrique} où fabrique() renvoie la fonction
+      d'embedding (appelée dans le thread, donc importée paresseusement)
+    """
+
+    def __init__(self, chemin="./chroma", precharger=None):
+        self.chemin = chemin
+        self.etapes = {}
+        self.debut = time.perf_counter()
+        self._verrou = threading.RLock()
+        self._client = None
+        self._collections = {}
+        self._fabriques = {}
+        self._prets = {}
+        self._thread = None
+        if precharger:
+            if not isinstance(precharger, dict):
+                precharger = dict.fromkeys(precharger)
+            self._fabriques.update(precharger)
+            self._prets = {nom: threading.Event() for nom in precharger}
+            self._thread = threading.Thread(target=self._precharger, args=(list(precharger),),
+                                            daemon=True)
+            self._thread.start()
+
+    def _mesurer(self, etape, fonction, *args, **kwargs):
+        debut = time.perf_counter()
+        resultat = fonction(*args, **kwargs)
+        self.etapes[etape] = self.etapes.get(etape, 0.0) + time.perf_counter() - debut
+        return resultat
+
+    @property
+    def client(self):
+        with self._verrou:
+            if self._client is None:
+                chromadb = self._mesurer("import chromadb", importlib.import_module, "chromadb")
+                self._client = self._mesurer("client", chromadb.PersistentClient, path=self.chemin)
+            return self._client
+
+    def collection(self, nom, fabrique_embedding=None):
+        """
+        Collection paresseuse : rien n'est chargé avant le premier appel
+        """
+        if fabrique_embedding is not None:
+            self._fabriques.setdefault(nom, fabrique_embedding)
+        return CollectionParesseuse(self, nom)
+
+    def obtenir(self, nom):
+        """
+        La vraie collection (attend la fin de son préchargement s'il est en cours)
+        """
+        if nom in self._prets and threading.current_thread() is not self._thread:
+            self._prets[nom].wait()
+        with self._verrou:
+            if nom not in self._collections:
+                client = self.client
+                parametres = {}
+                fabrique = self._fabriques.get(nom)
+                if fabrique is not None:
+                    parametres["embedding_function"] = self._mesurer(f"embedding:{nom}", fabrique)
+                self._collections[nom] = self._mesurer(
+                    f"collection:{nom}", client.get_or_create_collection, name=nom, **parametres)
+            return self._collections[nom]
+
+    # ------------------------------------------------------------------------
+    # Préchargement en arrière-plan
+    # ------------------------------------------------------------------------
+
+    def prechauffer(self, nom):
+        """
+        Charge la collection, son modèle d'embedding et son index HNSW
+        """
+        collection = self.obtenir(nom)
+        self._mesurer(f"modele:{nom}", fonction_embedding_de(collection), ["préchauffage"])
+        exemple = collection.get(limit=1, include=["embeddings"])
+        if exemple["ids"]:
+            self._mesurer(f"index:{nom}", collection.query,
+                          query_embeddings=exemple["embeddings"], n_results=1, include=[])
+
+    def _precharger(self, noms):
+        for nom in noms:
+            try:
+                self.prechauffer(nom)
+            finally:
+                self._prets[nom].set()
+
+    def attendre(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def resume(self):
+        """
+        Durée de chaque étape, et temps écoulé depuis la création
+        """
+        lignes = [f"  {etape:<28} {secondes * 1000:8.1f} ms"
+                  for etape, secondes in self.etapes.items()]
+        lignes.append(f"  {'total écoulé':<28} {(time.perf_counter() - self.debut) * 1000:8.1f} ms")
+        return "\n".join(lignes)
+
+
+# ============================================================================
+# BENCHMARK: TEMPS JUSQU'AU PREMIER RÉSULTAT, DÉMARRAGE CLASSIQUE OU RAPIDE
+# ============================================================================
+
+def profil_classique(chemin, nom, question, pause=0.0):
+    """
+    Étapes d'un démarrage classique (tout est chargé avant la question)
+    """
+    etapes = {}
+    debut = time.perf_counter()
+
+    def mesurer(etape, fonction, *args, **kwargs):
+        depart = time.perf_counter()
+        resultat = fonction(*args, **kwargs)
+        etapes[etape] = time.perf_counter() - depart
+        return resultat
+
+    chromadb = mesurer("import chromadb", importlib.import_module, "chromadb")
+    client = mesurer("client", chromadb.PersistentClient, path=chemin)
+    collection = mesurer(f"collection:{nom}", client.get_or_create_collection, name=nom)
+    time.sleep(pause)  # l'utilisateur tape sa question
+    mesurer("premiere requete", collection.query, query_texts=[question], n_results=1)
+    etapes["premier resultat"] = time.perf_counter() - debut
+    return etapes
+
+
+def profil_rapide(chemin, nom, question, pause=0.0):
+    """
+    Mêmes étapes avec DemarrageRapide et préchargement pendant la pause
+    """
+    demarrage = DemarrageRapide(chemin, precharger=[nom])
+    collection = demarrage.collection(nom)
+    time.sleep(pause)
+    demarrage._mesurer("premiere requete", collection.query, query_texts=[question], n_results=1)
+    demarrage.etapes["premier resultat"] = time.perf_counter() - demarrage.debut
+    return demarrage.etapes
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import subprocess
+    import sys
+
+    parser = argparse.ArgumentParser(description="Temps de démarrage d'un PersistentClient")
+    parser.add_argument("--chemin", default="./chroma")
+    parser.add_argument("--collection", default="voitures")
+    parser.add_argument("--question", default="BMW")
+    parser.add_argument("--pause", type=float, default=1.0,
+                        help="secondes de 'saisie' avant la question (ex. input())")
+    parser.add_argument("--mode", choices=["classique", "rapide"])
+    args = parser.parse_args()
+
+    if args.mode:
+        # Un seul profil, dans ce processus (appelé par la comparaison ci-dessous)
+        profil = profil_classique if args.mode == "classique" else profil_rapide
+        print(json.dumps(profil(args.chemin, args.collection, args.question, args.pause)))
+        sys.exit(0)
+
+    # Chaque mode dans un processus neuf : les imports et chargements sont à froid
+    for mode in ("classique", "rapide"):
+        sortie = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--chemin", args.chemin,
+             "--collection", args.collection, "--question", args.question,
+             "--pause", str(args.pause)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        etapes = json.loads(sortie.strip().splitlines()[-1])
+        print(f"# Démarrage {mode}")
+        for etape, secondes in etapes.items():
+            print(f"  {etape:<28} {secondes * 1000:8.1f} ms")
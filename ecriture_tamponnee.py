@@ -0,0 +1,294 @@
+# ============================================================================
+# ÉCRITURES TAMPONNÉES: REGROUPER LES PETITS ADD / UPDATE / UPSERT
+# ============================================================================
+#
+# Les sections 3, 6 et 7 de chromadb_rag_complet.py écrivent un à trois
+# documents par appel : chaque appel paie son embedding, sa mise à jour de
+# l'index et son écriture sur disque. EcrivainTamponne :
+# - garde les opérations en mémoire, une seule par id : un upsert ou un
+#   update après un upsert est fusionné dans le premier (comme le ferait
+#   ChromaDB), un upsert après un delete devient "remplacer" (delete puis
+#   upsert), un delete efface ce qui était en attente
+# - les envoie en quelques gros upsert / update / delete quand `taille_max`
+#   opérations sont en attente ou que la plus ancienne a `delai_max` secondes
+# - fait ces écritures dans un thread d'arrière-plan
+# - vide le tampon avant chaque lecture (query, get, count) : on relit
+#   toujours ses propres écritures
+# - garde en attente les opérations d'un lot refusé par ChromaDB : elles
+#   sont retentées à l'écriture suivante (abandonner() les retire), et
+#   l'erreur est levée au prochain appel
+#
+# add() est traité comme un upsert : l'erreur "id déjà existant" de add()
+# ne peut pas être signalée au moment de l'appel.
+# ============================================================================
+
+import threading
+import time
+
+from ingestion_csv import par_lots
+
+# Champs d'un document, au pluriel comme dans l'API des collections
+CHAMPS = ("documents", "embeddings", "metadatas")
+
+
+class EcrivainTamponne:
+    """
+    Enveloppe une collection et regroupe ses écritures
+
+    - taille_max : opérations en attente déclenchant une écriture
+    - delai_max : âge maximal (secondes) d'une opération en attente
+    - taille_lot : nombre maximal d'ids par appel à ChromaDB
+    """
+
+    def __init__(self, collection, taille_max=1000, delai_max=1.0, taille_lot=5000):
+        self.collection = collection
+        self.taille_max = taille_max
+        self.delai_max = delai_max
+        self.taille_lot = taille_lot
+        # id -> ("upsert" | "update" | "delete" | "remplacer", {champ: valeur})
+        self._en_attente = {}
+        self._plus_ancienne = None
+        self._condition = threading.Condition()
+        self._verrou_ecriture = threading.Lock()
+        self._erreur = None
+        self._actif = True
+        self.stats = {"operations_recues": 0, "operations_ecrites": 0, "appels_chroma": 0}
+        self._thread = threading.Thread(target=self._boucle, daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    # ------------------------------------------------------------------------
+    # Écritures mises en attente
+    # ------------------------------------------------------------------------
+
+    def _verifier_ouvert(self):
+        if not self._actif:
+            raise RuntimeError("EcrivainTamponne fermé : écrire directement dans la collection")
+
+    def _enregistrer(self, operation, ids, champs):
+        self._verifier_ouvert()
+        self._lever_erreur()
+        with self._condition:
+            for position, id_document in enumerate(ids):
+                valeurs = {cle: liste[position] for cle, liste in champs.items()
+                           if liste is not None}
+                self._en_attente[id_document] = self._combiner(
+                    self._en_attente.get(id_document), operation, valeurs)
+            self.stats["operations_recues"] += len(ids)
+            if self._plus_ancienne is None:
+                # Le thread d'écriture démarre le décompte de delai_max
+                self._plus_ancienne = time.monotonic()
+                self._condition.notify()
+            if len(self._en_attente) >= self.taille_max:
+                self._condition.notify()
+
+    @classmethod
+    def _combiner(cls, precedente, operation, valeurs):
+        """
+        L'opération en attente pour un id, après une nouvelle opération
+        """
+        if precedente is None or operation in ("delete", "remplacer"):
+            return operation, valeurs
+        if precedente[0] == "delete":
+            if operation == "update":
+                # ChromaDB ignore l'update d'un id supprimé
+                return precedente
+            # Le document est recréé : rien de l'ancienne version ne reste
+            return "remplacer", valeurs
+        return cls._fusionner(precedente, operation, valeurs)
+
+    @staticmethod
+    def _fusionner(precedente, operation, valeurs):
+        """
+        Une opération upsert/update sur un id qui a déjà un upsert/update en attente
+        """
+        operation_precedente, fusion = precedente[0], dict(precedente[1])
+        if operation_precedente == "update" and operation == "upsert":
+            # Approximation : si l'id n'existe pas, ChromaDB aurait ignoré l'update
+            operation_precedente = "upsert"
+        if "documents" in valeurs and "embeddings" not in valeurs:
+            # Le document change : l'ancien embedding n'est plus valable
+            fusion.pop("embeddings", None)
+        if "metadatas" in valeurs and fusion.get("metadatas") is not None:
+            # upsert et update complètent les métadonnées existantes
+            valeurs = dict(valeurs, metadatas={**fusion["metadatas"], **valeurs["metadatas"]})
+        fusion.update(valeurs)
+        return operation_precedente, fusion
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._enregistrer("upsert", ids, {"documents": documents, "embeddings": embeddings,
+                                          "metadatas": metadatas})
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._enregistrer("upsert", ids, {"documents": documents, "embeddings": embeddings,
+                                          "metadatas": metadatas})
+
+    def update(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._enregistrer("update", ids, {"documents": documents, "embeddings": embeddings,
+                                          "metadatas": metadatas})
+
+    def delete(self, ids=None, where=None, where_document=None):
+        if where or where_document:
+            # Un filtre ne se regroupe pas : les écritures en attente passent avant
+            self._verifier_ouvert()
+            self.vider()
+            self.collection.delete(ids=ids, where=where, where_document=where_document)
+            return
+        self._enregistrer("delete", ids, {})
+
+    # ------------------------------------------------------------------------
+    # Écriture vers ChromaDB
+    # ------------------------------------------------------------------------
+
+    def _ecrire(self, operations):
+        """
+        Une opération par id : regroupées par type et par champs présents
+
+        Les opérations écrites sont retirées de `operations` ; un lot refusé
+        n'empêche pas l'écriture des autres, et la première erreur est levée
+        à la fin.
+        """
+        groupes = {}
+        for id_document, (operation, valeurs) in operations.items():
+            cle = (operation, tuple(c for c in CHAMPS if c in valeurs))
+            groupes.setdefault(cle, []).append((id_document, valeurs))
+
+        premiere_erreur = None
+        for (operation, champs), elements in groupes.items():
+            for lot in par_lots(elements, self.taille_lot):
+                parametres = {"ids": [id_document for id_document, _ in lot]}
+                for champ in champs:
+                    parametres[champ] = [valeurs[champ] for _, valeurs in lot]
+                try:
+                    if operation == "remplacer":
+                        self.collection.delete(ids=parametres["ids"])
+                        self.collection.upsert(**parametres)
+                        self.stats["appels_chroma"] += 2
+                    else:
+                        getattr(self.collection, operation)(**parametres)
+                        self.stats["appels_chroma"] += 1
+                except Exception as erreur:
+                    premiere_erreur = premiere_erreur or erreur
+                    continue
+                for id_document in parametres["ids"]:
+                    del operations[id_document]
+                self.stats["operations_ecrites"] += len(lot)
+        if premiere_erreur is not None:
+            raise premiere_erreur
+
+    def vider(self):
+        """
+        Écrit tout ce qui est en attente (et attend une écriture en cours)
+        """
+        self._vider()
+        self._lever_erreur()
+
+    def _vider(self):
+        # Une erreur est conservée pour être levée dans le thread de l'utilisateur
+        with self._verrou_ecriture:
+            with self._condition:
+                operations, self._en_attente = self._en_attente, {}
+                self._plus_ancienne = None
+            if operations:
+                try:
+                    self._ecrire(operations)
+                except Exception as erreur:
+                    self._erreur = erreur
+                    self._remettre(operations)
+
+    def _remettre(self, operations):
+        """
+        Remet en attente les opérations non écrites, avant celles reçues depuis
+        """
+        with self._condition:
+            recues, self._en_attente = self._en_attente, dict(operations)
+            for id_document, (operation, valeurs) in recues.items():
+                self._en_attente[id_document] = self._combiner(
+                    self._en_attente.get(id_document), operation, valeurs)
+            # Nouvel essai après delai_max, pas en boucle
+            self._plus_ancienne = time.monotonic()
+
+    def abandonner(self):
+        """
+        Retire et renvoie les opérations en attente ({id: (opération, valeurs)})
+        """
+        with self._verrou_ecriture, self._condition:
+            operations, self._en_attente = self._en_attente, {}
+            self._plus_ancienne = None
+            self._erreur = None
+        return operations
+
+    def _lever_erreur(self):
+        if self._erreur is not None:
+            erreur, self._erreur = self._erreur, None
+            raise erreur
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                # Après une erreur, le nouvel essai attend delai_max même si le
+                # tampon est plein
+                while self._actif and (len(self._en_attente) < self.taille_max
+                                       or self._erreur is not None):
+                    if self._plus_ancienne is None:
+                        self._condition.wait()
+                        continue
+                    reste = self._plus_ancienne + self.delai_max - time.monotonic()
+                    if reste <= 0:
+                        break
+                    self._condition.wait(reste)
+                if not self._actif:
+                    return
+            self._vider()
+
+    def fermer(self):
+        with self._condition:
+            self._actif = False
+            self._condition.notify()
+        self._thread.join()
+        self.vider()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    # ------------------------------------------------------------------------
+    # Lectures : le tampon est vidé avant
+    # ------------------------------------------------------------------------
+
+    def query(self, **parametres):
+        self.vider()
+        return self.collection.query(**parametres)
+
+    def get(self, **parametres):
+        self.vider()
+        return self.collection.get(**parametres)
+
+    def count(self):
+        self.vider()
+        return self.collection.count()
+
+
+# ============================================================================
+# EXEMPLE: 1000 PETITES ÉCRITURES REGROUPÉES
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    collection = client.get_or_create_collection(name="ma_collection_rag")
+
+    debut = time.perf_counter()
+    with EcrivainTamponne(collection, taille_max=500, delai_max=0.5) as ecrivain:
+        for i in range(1000):
+            ecrivain.upsert(ids=[f"doc{i % 300}"], documents=[f"Document numéro {i}"],
+                            metadatas=[{"version": i}])
+            if i % 100 == 0:
+                ecrivain.update(ids=[f"doc{i % 300}"], metadatas=[{"relu": True}])
+        print(f"# {ecrivain.count()} documents, {ecrivain.stats}")
+    print(f"# {time.perf_counter() - debut:.2f} s")
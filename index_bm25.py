@@ -0,0 +1,320 @@
+# ============================================================================
+# RECHERCHE HYBRIDE: INDEX BM25 (MOTS-CLÉS) + RECHERCHE VECTORIELLE
+# ============================================================================
+#
+# where_document={"$contains": ...} parcourt tous les documents, et les
+# requêtes courtes ("BMW", "RAV4") ratent souvent avec la seule recherche
+# sémantique. Un index inversé BM25 tenu en mémoire donne des résultats
+# exacts sur les termes sans parcourir les documents.
+#
+# CollectionHybride garde l'index synchronisé avec la collection (add,
+# upsert, update, delete), le sauvegarde à côté des données du
+# PersistentClient à la fermeture, et fusionne les deux classements avec la
+# Reciprocal Rank Fusion (RRF) dans hybrid_query.
+# ============================================================================
+
+import heapq
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+from parcours_collection import iterer_collection, lister_ids
+from recherche_par_lots import rechercher_contextes
+
+MOTIF_TERME = re.compile(r"\w+")
+
+
+def tokeniser(texte):
+    """
+    Découpe un texte en termes : minuscules, sans accents
+    """
+    texte = unicodedata.normalize("NFKD", texte.casefold())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return MOTIF_TERME.findall(texte)
+
+
+# ============================================================================
+# INDEX INVERSÉ BM25
+# ============================================================================
+
+class IndexBM25:
+    """
+    Index inversé BM25 : terme -> {id: fréquence du terme dans le document}
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.longueurs = {}
+        # Termes de chaque document, pour le retirer sans parcourir l'index
+        self.termes = {}
+        self.total_longueurs = 0
+
+    def __len__(self):
+        return len(self.longueurs)
+
+    def supprimer(self, ids):
+        for id_document in ids:
+            if id_document not in self.longueurs:
+                continue
+            self.total_longueurs -= self.longueurs.pop(id_document)
+            for terme in self.termes.pop(id_document):
+                del self.postings[terme][id_document]
+                if not self.postings[terme]:
+                    del self.postings[terme]
+
+    def ajouter(self, ids, documents):
+        existants = [id_document for id_document in ids if id_document in self.longueurs]
+        if existants:
+            self.supprimer(existants)
+        for id_document, document in zip(ids, documents):
+            termes = tokeniser(document or "")
+            self.longueurs[id_document] = len(termes)
+            self.total_longueurs += len(termes)
+            frequences = Counter(termes)
+            self.termes[id_document] = list(frequences)
+            for terme, frequence in frequences.items():
+                self.postings.setdefault(terme, {})[id_document] = frequence
+
+    def rechercher(self, texte, k=10, candidats=None):
+        """
+        Les k documents les mieux notés : liste de (id, score)
+
+        Si `candidats` (ensemble d'ids) est fourni, seuls ces documents sont notés.
+        """
+        if not self.longueurs:
+            return []
+        nb_documents = len(self.longueurs)
+        longueur_moyenne = self.total_longueurs / nb_documents or 1.0
+        scores = {}
+        for terme in set(tokeniser(texte)):
+            documents = self.postings.get(terme)
+            if not documents:
+                continue
+            idf = math.log(1 + (nb_documents - len(documents) + 0.5) / (len(documents) + 0.5))
+            for id_document, frequence in documents.items():
+                if candidats is not None and id_document not in candidats:
+                    continue
+                normalisation = self.k1 * (
+                    1 - self.b + self.b * self.longueurs[id_document] / longueur_moyenne
+                )
+                scores[id_document] = scores.get(id_document, 0.0) + idf * (
+                    frequence * (self.k1 + 1) / (frequence + normalisation)
+                )
+        return heapq.nlargest(k, scores.items(), key=lambda paire: paire[1])
+
+    def sauvegarder(self, chemin):
+        temporaire = chemin + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            json.dump({"k1": self.k1, "b": self.b, "longueurs": self.longueurs,
+                       "postings": self.postings}, fichier, ensure_ascii=False)
+        os.replace(temporaire, chemin)
+
+    @classmethod
+    def charger(cls, chemin):
+        with open(chemin, encoding="utf-8") as fichier:
+            donnees = json.load(fichier)
+        index = cls(donnees["k1"], donnees["b"])
+        index.longueurs = donnees["longueurs"]
+        index.postings = donnees["postings"]
+        index.total_longueurs = sum(index.longueurs.values())
+        index.termes = {id_document: [] for id_document in index.longueurs}
+        for terme, documents in index.postings.items():
+            for id_document in documents:
+                index.termes[id_document].append(terme)
+        return index
+
+
+# ============================================================================
+# COLLECTION HYBRIDE
+# ============================================================================
+
+def fusion_rrf(classements, k=60):
+    """
+    Reciprocal Rank Fusion : score(id) = somme de 1 / (k + rang)
+    """
+    scores = {}
+    for classement in classements:
+        for rang, id_document in enumerate(classement, start=1):
+            scores[id_document] = scores.get(id_document, 0.0) + 1.0 / (k + rang)
+    return sorted(scores.items(), key=lambda paire: paire[1], reverse=True)
+
+
+class CollectionHybride:
+    """
+    Enveloppe une collection avec un index BM25 synchronisé
+
+    - dossier : où sauvegarder l'index (ex. le dossier du PersistentClient) ;
+      None pour un index uniquement en mémoire
+    - sauvegarde_auto : réécrire tout l'index après chaque écriture ; par
+      défaut il n'est sauvegardé que par sauvegarder() ou fermer()
+
+    L'index sauvegardé est reconstruit si ses ids ne sont plus ceux de la
+    collection (écritures faites sans passer par CollectionHybride).
+    """
+
+    def __init__(self, collection, dossier=None, sauvegarde_auto=False):
+        self.collection = collection
+        self.sauvegarde_auto = sauvegarde_auto
+        self.modifie = False
+        self.chemin = None
+        if dossier is not None:
+            self.chemin = os.path.join(dossier, f"bm25_{collection.name}.json")
+        self.index = None
+        if self.chemin and os.path.exists(self.chemin):
+            self.index = IndexBM25.charger(self.chemin)
+        if self.index is None or set(self.index.longueurs) != set(lister_ids(collection)):
+            # Index absent ou désynchronisé : reconstruction depuis la collection
+            self.reconstruire()
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def reconstruire(self):
+        self.index = IndexBM25()
+        for lot in iterer_collection(self.collection, include=["documents"]):
+            self.index.ajouter(lot["ids"], lot["documents"])
+        self.sauvegarder()
+
+    def sauvegarder(self):
+        if self.chemin:
+            self.index.sauvegarder(self.chemin)
+        self.modifie = False
+
+    def fermer(self):
+        """
+        Sauvegarde l'index s'il a changé depuis la dernière sauvegarde
+        """
+        if self.modifie:
+            self.sauvegarder()
+
+    close = fermer
+
+    def _apres_ecriture(self):
+        self.modifie = True
+        if self.sauvegarde_auto:
+            self.sauvegarder()
+
+    # ------------------------------------------------------------------------
+    # Écritures : l'index suit la collection
+    # ------------------------------------------------------------------------
+
+    def _indexer(self, ids, documents):
+        if documents is not None:
+            self.index.ajouter(ids, documents)
+        else:
+            # Sans document, seuls les nouveaux ids entrent dans l'index (vides)
+            nouveaux = [i for i in ids if i not in self.index.longueurs]
+            self.index.ajouter(nouveaux, [None] * len(nouveaux))
+        self._apres_ecriture()
+
+    def add(self, ids, documents=None, **kwargs):
+        resultat = self.collection.add(ids=ids, documents=documents, **kwargs)
+        self._indexer(ids, documents)
+        return resultat
+
+    def upsert(self, ids, documents=None, **kwargs):
+        resultat = self.collection.upsert(ids=ids, documents=documents, **kwargs)
+        self._indexer(ids, documents)
+        return resultat
+
+    def update(self, ids, documents=None, **kwargs):
+        resultat = self.collection.update(ids=ids, documents=documents, **kwargs)
+        if documents is not None:
+            # update ignore les ids absents de la collection
+            presents = [(i, d) for i, d in zip(ids, documents) if i in self.index.longueurs]
+            self.index.ajouter([i for i, _ in presents], [d for _, d in presents])
+            self._apres_ecriture()
+        return resultat
+
+    def delete(self, ids=None, where=None, where_document=None):
+        if where or where_document:
+            # Suppression par filtre : on résout d'abord les ids concernés
+            ids = self.collection.get(ids=ids, where=where, where_document=where_document,
+                                      include=[])["ids"]
+        if not ids:
+            return None
+        resultat = self.collection.delete(ids=ids)
+        self.index.supprimer(ids)
+        self._apres_ecriture()
+        return resultat
+
+    # ------------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------------
+
+    def hybrid_query(self, query_texts, n_results=10, where=None, n_candidats=None,
+                     k_rrf=60):
+        """
+        Fusionne les classements BM25 et vectoriel avec la RRF
+
+        Renvoie un résultat au format de query() (ids, documents, metadatas)
+        avec en plus les scores RRF dans "scores".
+        """
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        n_candidats = n_candidats or max(n_results * 4, 20)
+        nb_documents = self.collection.count()
+        vectoriels = rechercher_contextes(
+            self.collection, query_texts, min(n_candidats, max(nb_documents, 1)),
+            where=where, include=("documents", "metadatas"),
+        )
+
+        resultat = {"ids": [], "documents": [], "metadatas": [], "scores": []}
+        for texte, vectoriel in zip(query_texts, vectoriels):
+            candidats = None
+            if where:
+                # Les candidats BM25 doivent aussi respecter le filtre
+                ids_bm25 = [i for i, _ in self.index.rechercher(texte, n_candidats * 4)]
+                candidats = set(self.collection.get(ids=ids_bm25, where=where,
+                                                    include=[])["ids"]) if ids_bm25 else set()
+            classement_bm25 = [i for i, _ in self.index.rechercher(texte, n_candidats, candidats)]
+            classement_vectoriel = vectoriel["ids"][0]
+
+            fusion = fusion_rrf([classement_vectoriel, classement_bm25], k_rrf)[:n_results]
+            connus = {
+                id_document: (document, metadonnees)
+                for id_document, document, metadonnees in zip(
+                    vectoriel["ids"][0], vectoriel["documents"][0], vectoriel["metadatas"][0]
+                )
+            }
+            manquants = [i for i, _ in fusion if i not in connus]
+            if manquants:
+                complements = self.collection.get(ids=manquants, include=["documents", "metadatas"])
+                for id_document, document, metadonnees in zip(
+                        complements["ids"], complements["documents"], complements["metadatas"]):
+                    connus[id_document] = (document, metadonnees)
+
+            resultat["ids"].append([i for i, _ in fusion])
+            resultat["documents"].append([connus[i][0] for i, _ in fusion])
+            resultat["metadatas"].append([connus[i][1] for i, _ in fusion])
+            resultat["scores"].append([score for _, score in fusion])
+        return resultat
+
+
+# ============================================================================
+# EXEMPLE: RECHERCHE DE VOITURES PAR MOT-CLÉ
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.PersistentClient()
+    # L'index est sauvegardé dans ./chroma à la sortie du bloc
+    with CollectionHybride(client.get_or_create_collection(name="voitures"),
+                           dossier="./chroma") as collection:
+        collection.upsert(documents=["DavRos", "BMW", "VX", "RAV4"],
+                          ids=["id1", "id2", "id3", "id4"])
+
+        resultats = collection.hybrid_query("RAV4", n_results=1)
+        print(resultats["documents"][0][0])
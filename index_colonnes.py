@@ -0,0 +1,393 @@
+# ============================================================================
+# PRÉ-FILTRAGE STRUCTURÉ: INDEX COLONNAIRE NUMPY SUR LES MÉTADONNÉES
+# ============================================================================
+#
+# Pour une question comme "diamants à moins de 500 avec une taille Ideal",
+# la recherche sémantique seule parcourt toute la collection. Ici :
+# 1. les colonnes typées (carat, price, cut, color, clarity) sont gardées
+#    dans des tableaux NumPy, une case par document
+# 2. les prédicats (même syntaxe que where) sont évalués de façon vectorisée
+# 3. si peu de documents correspondent, la recherche vectorielle exacte est
+#    faite uniquement sur ces candidats ; sinon (ou si le filtre porte sur
+#    une clé non indexée), query(where=...) classique
+# CollectionColonnaire enveloppe la collection pour que ses écritures
+# tiennent l'index à jour.
+# ============================================================================
+
+import json
+import operator
+import os
+
+import numpy as np
+
+from ingestion_csv import par_lots
+from outils_vecteurs import espace_de, fonction_embedding_de, top_k
+from parcours_collection import iterer_collection
+
+# Opérateurs de comparaison de where, en version NumPy
+OPERATEURS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+# Mêmes opérateurs pour comparer les valeurs des catégories
+OPERATEURS_PYTHON = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _est_numerique(valeur):
+    return isinstance(valeur, (int, float)) and not isinstance(valeur, bool)
+
+
+class IndexColonnaire:
+    """
+    Colonnes de métadonnées en tableaux NumPy, avec évaluation des filtres
+
+    Les colonnes numériques sont des float64 (NaN si absent), les colonnes
+    catégorielles sont codées en entiers (-1 si absent).
+    """
+
+    def __init__(self, colonnes):
+        self.colonnes = list(colonnes)
+        self.ids = []
+        self.positions = {}
+        self.vivants = np.zeros(0, dtype=bool)
+        self.numeriques = {}
+        self.categories = {}
+        self.codes = {}
+        # "pre-filtre" ou "query" : plan choisi par la dernière recherche
+        self.dernier_plan = None
+
+    def __len__(self):
+        return int(self.vivants.sum())
+
+    # ------------------------------------------------------------------------
+    # Construction et mise à jour
+    # ------------------------------------------------------------------------
+
+    @classmethod
+    def construire(cls, collection, colonnes, taille_lot=1000):
+        """
+        Construit l'index à partir des métadonnées d'une collection
+        """
+        index = cls(colonnes)
+        for lot in iterer_collection(collection, taille_lot, include=["metadatas"]):
+            index.ajouter(lot["ids"], lot["metadatas"])
+        return index
+
+    def _typer(self, metadatas):
+        for colonne in self.colonnes:
+            if colonne in self.numeriques or colonne in self.codes:
+                continue
+            exemple = next((m[colonne] for m in metadatas if m and m.get(colonne) is not None), None)
+            if exemple is None:
+                continue
+            if _est_numerique(exemple):
+                self.numeriques[colonne] = np.full(len(self.ids), np.nan)
+            else:
+                self.categories[colonne] = {}
+                self.codes[colonne] = np.full(len(self.ids), -1, dtype=np.int32)
+
+    def _coder(self, colonne, valeur):
+        if valeur is None:
+            return -1
+        dictionnaire = self.categories[colonne]
+        return dictionnaire.setdefault(valeur, len(dictionnaire))
+
+    def ajouter(self, ids, metadatas):
+        """
+        Ajoute ou remplace les métadonnées de documents (après add/upsert)
+        """
+        metadatas = [m or {} for m in metadatas]
+        self._typer(metadatas)
+
+        nouveaux = [i for i, id_document in enumerate(ids) if id_document not in self.positions]
+        if nouveaux:
+            debut = len(self.ids)
+            for numero, i in enumerate(nouveaux):
+                self.positions[ids[i]] = debut + numero
+                self.ids.append(ids[i])
+            self.vivants = np.concatenate([self.vivants, np.ones(len(nouveaux), dtype=bool)])
+            for colonne, valeurs in self.numeriques.items():
+                self.numeriques[colonne] = np.concatenate(
+                    [valeurs, np.full(len(nouveaux), np.nan)])
+            for colonne, codes in self.codes.items():
+                self.codes[colonne] = np.concatenate(
+                    [codes, np.full(len(nouveaux), -1, dtype=np.int32)])
+
+        lignes = np.fromiter((self.positions[i] for i in ids), dtype=np.int64, count=len(ids))
+        self.vivants[lignes] = True
+        for colonne, valeurs in self.numeriques.items():
+            valeurs[lignes] = [
+                m[colonne] if _est_numerique(m.get(colonne)) else np.nan for m in metadatas
+            ]
+        for colonne, codes in self.codes.items():
+            codes[lignes] = [self._coder(colonne, m.get(colonne)) for m in metadatas]
+
+    def supprimer(self, ids):
+        lignes = [self.positions[i] for i in ids if i in self.positions]
+        self.vivants[lignes] = False
+
+    # ------------------------------------------------------------------------
+    # Évaluation vectorisée des filtres
+    # ------------------------------------------------------------------------
+
+    def _masque_colonne(self, colonne, condition):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        masque = np.ones(len(self.ids), dtype=bool)
+        for operateur, valeur in condition.items():
+            if colonne in self.numeriques:
+                valeurs = self.numeriques[colonne]
+                presents = ~np.isnan(valeurs)
+                if operateur == "$in":
+                    resultat = np.isin(valeurs, valeur)
+                elif operateur == "$nin":
+                    # Comme ChromaDB : les documents sans la clé sont retenus
+                    resultat = ~np.isin(valeurs, valeur)
+                elif operateur == "$ne":
+                    resultat = ~presents | np.not_equal(valeurs, valeur)
+                else:
+                    resultat = presents & OPERATEURS[operateur](valeurs, valeur)
+            elif colonne in self.codes:
+                # Le prédicat est évalué sur les quelques catégories distinctes,
+                # puis appliqué à toute la colonne par np.isin sur les codes
+                categories = self.categories[colonne]
+                if operateur == "$in":
+                    retenues = [code for cat, code in categories.items() if cat in valeur]
+                elif operateur == "$nin":
+                    retenues = [-1] + [code for cat, code in categories.items()
+                                       if cat not in valeur]
+                elif operateur == "$ne":
+                    retenues = [-1] + [code for cat, code in categories.items() if cat != valeur]
+                else:
+                    comparer = OPERATEURS_PYTHON[operateur]
+                    retenues = [code for cat, code in categories.items()
+                                if type(cat) is type(valeur) and comparer(cat, valeur)]
+                resultat = np.isin(self.codes[colonne], retenues)
+            else:
+                raise ValueError(f"Colonne non indexée: {colonne!r}")
+            masque &= resultat
+        return masque
+
+    def couvre(self, where):
+        """
+        Vrai si toutes les clés du filtre sont des colonnes indexées (et typées)
+        """
+        for cle, condition in where.items():
+            if cle in ("$and", "$or"):
+                if not all(self.couvre(w) for w in condition):
+                    return False
+            elif cle not in self.numeriques and cle not in self.codes:
+                return False
+        return True
+
+    def masque(self, where):
+        """
+        Tableau booléen des documents qui satisfont le filtre `where`
+        """
+        if "$and" in where:
+            return np.logical_and.reduce([self.masque(w) for w in where["$and"]]) & self.vivants
+        if "$or" in where:
+            return np.logical_or.reduce([self.masque(w) for w in where["$or"]]) & self.vivants
+        masque = self.vivants.copy()
+        for colonne, condition in where.items():
+            masque &= self._masque_colonne(colonne, condition)
+        return masque
+
+    def filtrer(self, where):
+        """
+        Identifiants des documents qui satisfont le filtre `where`
+        """
+        return [self.ids[i] for i in np.flatnonzero(self.masque(where))]
+
+    # ------------------------------------------------------------------------
+    # Recherche vectorielle restreinte aux candidats
+    # ------------------------------------------------------------------------
+
+    def rechercher(self, collection, query_texts=None, query_embeddings=None, where=None,
+                   n_results=10, seuil_candidats=5000):
+        """
+        Recherche vectorielle limitée aux documents qui satisfont `where`
+
+        Si le filtre garde au plus `seuil_candidats` documents, la recherche
+        exacte est faite sur eux seuls ; sinon, ou si une clé du filtre n'est
+        pas indexée, query(where=...) est utilisé.
+        Renvoie un résultat au format de query().
+        """
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        candidats = self.filtrer(where) if where and self.couvre(where) else None
+        if candidats is None or len(candidats) > seuil_candidats:
+            self.dernier_plan = "query"
+            return collection.query(query_texts=query_texts, query_embeddings=query_embeddings,
+                                    n_results=n_results, where=where)
+
+        self.dernier_plan = "pre-filtre"
+        if query_embeddings is None:
+            query_embeddings = fonction_embedding_de(collection)(query_texts)
+        ids, vecteurs = [], []
+        for lot in par_lots(candidats, 1000):
+            # where est réappliqué : un document modifié hors de l'index est écarté
+            morceau = collection.get(ids=lot, where=where, include=["embeddings"])
+            if morceau["ids"]:
+                ids.extend(morceau["ids"])
+                vecteurs.append(np.asarray(morceau["embeddings"], dtype=np.float32))
+
+        nb_requetes = len(query_embeddings)
+        resultat = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        if not ids:
+            for cle in resultat:
+                resultat[cle] = [[] for _ in range(nb_requetes)]
+            return resultat
+
+        indices, dist = top_k(query_embeddings, np.vstack(vecteurs), n_results,
+                              espace_de(collection))
+        retenus = sorted({ids[i] for i in indices.ravel()})
+        details = collection.get(ids=retenus, include=["documents", "metadatas"])
+        par_id = {
+            id_document: (document, metadonnees)
+            for id_document, document, metadonnees in zip(
+                details["ids"], details["documents"], details["metadatas"])
+        }
+        for ligne_indices, ligne_distances in zip(indices, dist):
+            selection = [ids[i] for i in ligne_indices]
+            resultat["ids"].append(selection)
+            resultat["distances"].append([float(d) for d in ligne_distances])
+            resultat["documents"].append([par_id[i][0] for i in selection])
+            resultat["metadatas"].append([par_id[i][1] for i in selection])
+        return resultat
+
+    # ------------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------------
+
+    def sauvegarder(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        np.savez(
+            os.path.join(dossier, "colonnes.npz"), vivants=self.vivants,
+            **{f"num_{c}": v for c, v in self.numeriques.items()},
+            **{f"cat_{c}": v for c, v in self.codes.items()},
+        )
+        with open(os.path.join(dossier, "colonnes.json"), "w", encoding="utf-8") as fichier:
+            json.dump({"colonnes": self.colonnes, "ids": self.ids,
+                       "categories": {c: list(d) for c, d in self.categories.items()}},
+                      fichier, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, dossier):
+        with open(os.path.join(dossier, "colonnes.json"), encoding="utf-8") as fichier:
+            donnees = json.load(fichier)
+        index = cls(donnees["colonnes"])
+        index.ids = donnees["ids"]
+        index.positions = {id_document: i for i, id_document in enumerate(index.ids)}
+        with np.load(os.path.join(dossier, "colonnes.npz")) as tableaux:
+            index.vivants = tableaux["vivants"]
+            for nom in tableaux.files:
+                if nom.startswith("num_"):
+                    index.numeriques[nom[4:]] = tableaux[nom]
+                elif nom.startswith("cat_"):
+                    index.codes[nom[4:]] = tableaux[nom]
+        for colonne, valeurs in donnees["categories"].items():
+            index.categories[colonne] = {valeur: code for code, valeur in enumerate(valeurs)}
+        return index
+
+
+# ============================================================================
+# COLLECTION DONT LES ÉCRITURES METTENT L'INDEX À JOUR
+# ============================================================================
+
+class CollectionColonnaire:
+    """
+    Enveloppe une collection : l'index suit add/upsert/update/delete et
+    query(where=...) passe par IndexColonnaire.rechercher()
+
+    Les écritures faites directement sur la collection ne sont pas vues :
+    reconstruire alors l'index (IndexColonnaire.construire).
+    """
+
+    def __init__(self, collection, index, seuil_candidats=5000):
+        self.collection = collection
+        self.index = index
+        self.seuil_candidats = seuil_candidats
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    @property
+    def dernier_plan(self):
+        return self.index.dernier_plan
+
+    def _relire(self, ids):
+        # upsert et update fusionnent les métadonnées : l'état final est relu
+        for lot in par_lots(list(ids), 1000):
+            resultat = self.collection.get(ids=lot, include=["metadatas"])
+            self.index.ajouter(resultat["ids"], resultat["metadatas"])
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings,
+                            metadatas=metadatas, **options)
+        self.index.ajouter(ids, metadatas or [None] * len(ids))
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings,
+                               metadatas=metadatas, **options)
+        self._relire(ids)
+
+    def update(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.update(ids=ids, documents=documents, embeddings=embeddings,
+                               metadatas=metadatas, **options)
+        if metadatas is not None:
+            self._relire(ids)
+
+    def delete(self, ids=None, where=None, where_document=None):
+        if where or where_document:
+            ids = self.collection.get(ids=ids, where=where, where_document=where_document,
+                                      include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=ids)
+            self.index.supprimer(ids)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None,
+              where_document=None, **options):
+        if not where or where_document or options:
+            self.index.dernier_plan = "query"
+            return self.collection.query(query_texts=query_texts,
+                                         query_embeddings=query_embeddings,
+                                         n_results=n_results, where=where,
+                                         where_document=where_document, **options)
+        return self.index.rechercher(self.collection, query_texts, query_embeddings, where,
+                                     n_results, self.seuil_candidats)
+
+
+# ============================================================================
+# EXEMPLE: "DIAMANTS À MOINS DE 500 AVEC UNE TAILLE IDEAL"
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    from ingestion_csv import COLONNES_DIAMANTS
+
+    client = chromadb.PersistentClient()
+    collection = client.get_or_create_collection(name="diamonds")
+
+    index = IndexColonnaire.construire(collection, COLONNES_DIAMANTS)
+    filtre = {"$and": [{"price": {"$lt": 500}}, {"cut": "Ideal"}]}
+    print(f"# {len(index.filtrer(filtre))} candidats sur {len(index)} documents")
+
+    resultats = index.rechercher(collection, "petit diamant pas cher", where=filtre, n_results=3)
+    print(f"# Plan: {index.dernier_plan}")
+    for document in resultats["documents"][0]:
+        print(f"  - {document}")
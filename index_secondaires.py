@@ -0,0 +1,537 @@
+# ============================================================================
+# INDEX SECONDAIRES SUR LES MÉTADONNÉES ET CHOIX DU PLAN DE FILTRAGE
+# ============================================================================
+#
+# where={"categorie": "IA"}, where={"topic": ...} ou delete(where=...) font
+# évaluer le filtre sur les métadonnées de chaque document. Ici, on déclare
+# des index sur quelques clés très utilisées :
+# - "hash" : valeur -> ids ($eq, $ne, $in, $nin)
+# - "trie" : (valeur, id) triés, recherche par bisect (valeurs numériques ;
+#   $gt, $gte, $lt, $lte en plus)
+# tenus à jour à chaque écriture. À chaque requête filtrée, le nombre de
+# documents retenus est estimé avec ces index, puis :
+# - "pre-filtre" : peu de candidats, recherche exacte sur leurs seuls
+#   embeddings
+# - "post-filtre" : filtre peu sélectif, query() sans filtre avec assez de
+#   résultats en plus pour en garder n_results après filtrage
+# - "chroma" : clé non indexée, query(where=...) classique
+# Le plan choisi est gardé dans dernier_plan (et le détail dans
+# dernier_rapport).
+# ============================================================================
+
+import bisect
+import math
+from operator import itemgetter
+
+import numpy as np
+
+from index_colonnes import OPERATEURS_PYTHON, _est_numerique
+from ingestion_csv import par_lots
+from outils_vecteurs import espace_de, fonction_embedding_de, top_k
+from parcours_collection import iterer_collection
+
+OPERATEURS_INTERVALLE = ("$gt", "$gte", "$lt", "$lte")
+
+
+def _meme_type(a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if _est_numerique(a):
+        return _est_numerique(b)
+    return type(a) is type(b)
+
+
+def satisfait(metadonnees, where):
+    """
+    Évalue un filtre where sur les métadonnées d'un document
+
+    Comme ChromaDB : $ne et $nin retiennent aussi les documents sans la clé.
+    """
+    metadonnees = metadonnees or {}
+    if "$and" in where:
+        return all(satisfait(metadonnees, w) for w in where["$and"])
+    if "$or" in where:
+        return any(satisfait(metadonnees, w) for w in where["$or"])
+    for cle, condition in where.items():
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        valeur = metadonnees.get(cle)
+        for operateur, attendu in condition.items():
+            if operateur == "$in":
+                retenu = valeur is not None and any(
+                    _meme_type(valeur, a) and valeur == a for a in attendu)
+            elif operateur == "$nin":
+                retenu = valeur is None or not any(
+                    _meme_type(valeur, a) and valeur == a for a in attendu)
+            elif operateur == "$ne":
+                retenu = valeur is None or not _meme_type(valeur, attendu) or valeur != attendu
+            else:
+                retenu = (valeur is not None and _meme_type(valeur, attendu)
+                          and OPERATEURS_PYTHON[operateur](valeur, attendu))
+            if not retenu:
+                return False
+    return True
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class IndexHash:
+    """
+    valeur -> ensemble des ids ayant cette valeur
+    """
+
+    operateurs = ("$eq", "$ne", "$in", "$nin")
+
+    def __init__(self):
+        self.ids_par_valeur = {}
+        self.valeur_de = {}
+
+    def accepte(self, valeur):
+        return True
+
+    @staticmethod
+    def _cle(valeur):
+        # True == 1 en Python : le type fait partie de la clé
+        return isinstance(valeur, bool), valeur
+
+    def ajouter(self, ids, valeurs):
+        self.supprimer(ids)
+        for id_document, valeur in zip(ids, valeurs):
+            if valeur is None:
+                continue
+            cle = self._cle(valeur)
+            self.ids_par_valeur.setdefault(cle, set()).add(id_document)
+            self.valeur_de[id_document] = cle
+
+    def supprimer(self, ids):
+        for id_document in ids:
+            cle = self.valeur_de.pop(id_document, None)
+            if cle is not None:
+                groupe = self.ids_par_valeur[cle]
+                groupe.discard(id_document)
+                if not groupe:
+                    del self.ids_par_valeur[cle]
+
+    def compter(self, operateur, valeur):
+        if operateur == "$eq":
+            return len(self.ids_par_valeur.get(self._cle(valeur), ()))
+        return sum(len(self.ids_par_valeur.get(self._cle(v), ())) for v in valeur)
+
+    def ids(self, operateur, valeur):
+        if operateur == "$eq":
+            return set(self.ids_par_valeur.get(self._cle(valeur), ()))
+        return set().union(*(self.ids_par_valeur.get(self._cle(v), ()) for v in valeur))
+
+
+class IndexTrie:
+    """
+    Couples (valeur, id) triés par valeur : intervalles par bisect
+
+    Seules les valeurs numériques sont indexées (comme les colonnes
+    numériques de IndexColonnaire).
+    """
+
+    operateurs = ("$eq", "$ne", "$in", "$nin") + OPERATEURS_INTERVALLE
+
+    def __init__(self):
+        self.entrees = []
+        self.valeur_de = {}
+
+    def accepte(self, valeur):
+        valeurs = valeur if isinstance(valeur, list) else [valeur]
+        return all(_est_numerique(v) for v in valeurs)
+
+    def ajouter(self, ids, valeurs):
+        self.supprimer(ids)
+        nouvelles = [(float(v), i) for i, v in zip(ids, valeurs) if _est_numerique(v)]
+        for valeur, id_document in nouvelles:
+            self.valeur_de[id_document] = valeur
+        if len(nouvelles) > len(self.entrees) // 16:
+            # Gros lot : un tri complet coûte moins que des insertions une à une
+            self.entrees.extend(nouvelles)
+            self.entrees.sort()
+        else:
+            for entree in nouvelles:
+                bisect.insort(self.entrees, entree)
+
+    def supprimer(self, ids):
+        retirees = [(self.valeur_de.pop(i), i) for i in ids if i in self.valeur_de]
+        if len(retirees) > len(self.entrees) // 16:
+            retirees = set(retirees)
+            self.entrees = [e for e in self.entrees if e not in retirees]
+        else:
+            for entree in retirees:
+                del self.entrees[bisect.bisect_left(self.entrees, entree)]
+
+    def _bornes(self, operateur, valeur):
+        cle = itemgetter(0)
+        if operateur == "$eq":
+            return (bisect.bisect_left(self.entrees, valeur, key=cle),
+                    bisect.bisect_right(self.entrees, valeur, key=cle))
+        if operateur == "$gt":
+            return bisect.bisect_right(self.entrees, valeur, key=cle), len(self.entrees)
+        if operateur == "$gte":
+            return bisect.bisect_left(self.entrees, valeur, key=cle), len(self.entrees)
+        if operateur == "$lt":
+            return 0, bisect.bisect_left(self.entrees, valeur, key=cle)
+        return 0, bisect.bisect_right(self.entrees, valeur, key=cle)
+
+    def compter(self, operateur, valeur):
+        if operateur == "$in":
+            return sum(self.compter("$eq", v) for v in valeur)
+        debut, fin = self._bornes(operateur, valeur)
+        return fin - debut
+
+    def ids(self, operateur, valeur):
+        if operateur == "$in":
+            return set().union(*(self.ids("$eq", v) for v in valeur))
+        debut, fin = self._bornes(operateur, valeur)
+        return {id_document for _, id_document in self.entrees[debut:fin]}
+
+
+TYPES_INDEX = {"hash": IndexHash, "trie": IndexTrie}
+
+
+# ============================================================================
+# COLLECTION AVEC INDEX SECONDAIRES
+# ============================================================================
+
+class CollectionIndexee:
+    """
+    Enveloppe une collection : index secondaires et choix du plan de filtrage
+
+    - index : {clé de métadonnées: "hash" | "trie"}
+    - seuil_prefiltre : nombre maximal de candidats pour le pré-filtrage
+    - marge : sur-extraction du post-filtrage, en plus de n_results / sélectivité
+    """
+
+    def __init__(self, collection, index, seuil_prefiltre=2000, marge=2.0, taille_lot=1000):
+        self.collection = collection
+        self.seuil_prefiltre = seuil_prefiltre
+        self.marge = marge
+        self.taille_lot = taille_lot
+        self.index = {}
+        self.tous_ids = set()
+        # "ann", "pre-filtre", "post-filtre" ou "chroma" : plan de la dernière opération
+        self.dernier_plan = None
+        self.dernier_rapport = None
+        self.declarer(index)
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    def declarer(self, index):
+        """
+        Ajoute des index et les remplit à partir de la collection
+        """
+        nouveaux = {cle: TYPES_INDEX[genre]() for cle, genre in index.items()}
+        self.tous_ids = set()
+        for lot in iterer_collection(self.collection, self.taille_lot, include=["metadatas"]):
+            self.tous_ids.update(lot["ids"])
+            metadatas = [m or {} for m in lot["metadatas"]]
+            for cle, structure in nouveaux.items():
+                structure.ajouter(lot["ids"], [m.get(cle) for m in metadatas])
+        self.index.update(nouveaux)
+
+    # ------------------------------------------------------------------------
+    # Écritures : index tenus à jour
+    # ------------------------------------------------------------------------
+
+    def _indexer(self, ids, metadatas):
+        metadatas = [m or {} for m in metadatas]
+        for cle, structure in self.index.items():
+            structure.ajouter(ids, [m.get(cle) for m in metadatas])
+
+    def _reindexer(self, ids):
+        # upsert et update fusionnent les métadonnées : l'état final est relu
+        for lot in par_lots(list(ids), self.taille_lot):
+            resultat = self.collection.get(ids=lot, include=["metadatas"])
+            self._indexer(resultat["ids"], resultat["metadatas"])
+
+    def _desindexer(self, ids):
+        for structure in self.index.values():
+            structure.supprimer(ids)
+        self.tous_ids.difference_update(ids)
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings,
+                            metadatas=metadatas, **options)
+        self.tous_ids.update(ids)
+        self._indexer(ids, metadatas or [None] * len(ids))
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings,
+                               metadatas=metadatas, **options)
+        existants = [i for i in ids if i in self.tous_ids]
+        if metadatas is not None:
+            nouveaux = [p for p, i in enumerate(ids) if i not in self.tous_ids]
+            self._indexer([ids[p] for p in nouveaux], [metadatas[p] for p in nouveaux])
+        self.tous_ids.update(ids)
+        if metadatas is not None and existants:
+            self._reindexer(existants)
+
+    def update(self, ids, documents=None, embeddings=None, metadatas=None, **options):
+        self.collection.update(ids=ids, documents=documents, embeddings=embeddings,
+                               metadatas=metadatas, **options)
+        if metadatas is not None:
+            self._reindexer([i for i in ids if i in self.tous_ids])
+
+    def delete(self, ids=None, where=None, where_document=None):
+        """
+        delete(where=...) : les ids sont trouvés par les index si possible
+        """
+        if not where and not where_document:
+            self.collection.delete(ids=ids)
+            self._desindexer(ids or [])
+            self.dernier_plan = None
+            return
+        candidats, exact = self._candidats(where) if where else (None, False)
+        if exact and not where_document:
+            self.dernier_plan = "index"
+            cibles = candidats if ids is None else candidats & set(ids)
+        else:
+            self.dernier_plan = "chroma"
+            cibles = self.collection.get(ids=ids, where=where, where_document=where_document,
+                                         include=[])["ids"]
+        cibles = list(cibles)
+        for lot in par_lots(cibles, self.taille_lot * 5):
+            self.collection.delete(ids=lot)
+        self._desindexer(cibles)
+        self.dernier_rapport = {"plan": self.dernier_plan, "supprimes": len(cibles)}
+
+    # ------------------------------------------------------------------------
+    # Estimation de la sélectivité
+    # ------------------------------------------------------------------------
+
+    def _conditions(self, where):
+        """
+        (clé, opérateur, valeur) d'un filtre sans $and/$or
+        """
+        for cle, condition in where.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operateur, valeur in condition.items():
+                yield cle, operateur, valeur
+
+    def _index_pour(self, cle, operateur, valeur):
+        structure = self.index.get(cle)
+        if (structure is None or operateur not in structure.operateurs
+                or not structure.accepte(valeur)):
+            return None
+        return structure
+
+    def estimer(self, where):
+        """
+        Nombre de documents retenus par le filtre (majorant), None si inconnu
+        """
+        total = len(self.tous_ids)
+        if "$and" in where:
+            estimations = [e for e in map(self.estimer, where["$and"]) if e is not None]
+            return min(estimations) if estimations else None
+        if "$or" in where:
+            estimations = list(map(self.estimer, where["$or"]))
+            return None if None in estimations else min(total, sum(estimations))
+        estimations = []
+        for cle, operateur, valeur in self._conditions(where):
+            structure = self._index_pour(cle, operateur, valeur)
+            if structure is None:
+                continue
+            if operateur in ("$ne", "$nin"):
+                # Les documents sans la clé sont aussi retenus
+                positif = "$eq" if operateur == "$ne" else "$in"
+                estimations.append(total - structure.compter(positif, valeur))
+            else:
+                estimations.append(structure.compter(operateur, valeur))
+        return min(estimations) if estimations else None
+
+    def _candidats(self, where):
+        """
+        (ids candidats ou None, exact) : exact si tout le filtre est indexé
+        """
+        if "$and" in where:
+            parties = [self._candidats(w) for w in where["$and"]]
+            connus = sorted((c for c, _ in parties if c is not None), key=len)
+            if not connus:
+                return None, False
+            return set.intersection(*connus), all(exact for _, exact in parties)
+        if "$or" in where:
+            parties = [self._candidats(w) for w in where["$or"]]
+            if any(c is None for c, _ in parties):
+                return None, False
+            return set().union(*(c for c, _ in parties)), all(exact for _, exact in parties)
+        ensembles, exact = [], True
+        for cle, operateur, valeur in self._conditions(where):
+            structure = self._index_pour(cle, operateur, valeur)
+            if structure is None:
+                exact = False
+            elif operateur in ("$ne", "$nin"):
+                positif = "$eq" if operateur == "$ne" else "$in"
+                ensembles.append(self.tous_ids - structure.ids(positif, valeur))
+            else:
+                ensembles.append(structure.ids(operateur, valeur))
+        if not ensembles:
+            return None, False
+        return set.intersection(*sorted(ensembles, key=len)), exact
+
+    def expliquer(self, where, n_results=10):
+        """
+        Plan choisi pour un filtre, sans exécuter la recherche
+        """
+        total = len(self.tous_ids)
+        if not where:
+            return {"plan": "ann", "estimation": total, "total": total}
+        estimation = self.estimer(where)
+        if estimation is None:
+            plan = "chroma"
+        elif estimation <= self.seuil_prefiltre:
+            plan = "pre-filtre"
+        else:
+            plan = "post-filtre"
+        rapport = {"plan": plan, "estimation": estimation, "total": total}
+        if plan == "post-filtre":
+            selectivite = max(estimation, 1) / max(total, 1)
+            rapport["n_extraits"] = min(total, math.ceil(n_results / selectivite * self.marge))
+        return rapport
+
+    # ------------------------------------------------------------------------
+    # Lectures
+    # ------------------------------------------------------------------------
+
+    def get(self, ids=None, where=None, limit=None, offset=None, where_document=None,
+            include=("documents", "metadatas")):
+        """
+        get(where=...) entièrement indexé : lecture directe par ids
+        """
+        if where and limit is None and offset is None:
+            candidats, exact = self._candidats(where)
+            if candidats is not None:
+                self.dernier_plan = "index"
+                if ids is not None:
+                    candidats &= set(ids)
+                resultat = {"ids": []}
+                for cle in include:
+                    resultat[cle] = []
+                for lot in par_lots(sorted(candidats), self.taille_lot * 5):
+                    morceau = self.collection.get(
+                        ids=lot, where=None if exact else where,
+                        where_document=where_document, include=list(include))
+                    resultat["ids"].extend(morceau["ids"])
+                    for cle in include:
+                        resultat[cle].extend(morceau[cle])
+                return resultat
+        self.dernier_plan = "chroma"
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset,
+                                   where_document=where_document, include=list(include))
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None,
+              where_document=None, include=("documents", "metadatas", "distances")):
+        rapport = self.expliquer(where, n_results)
+        self.dernier_plan = rapport["plan"]
+        self.dernier_rapport = rapport
+        if rapport["plan"] in ("ann", "chroma"):
+            return self.collection.query(query_texts=query_texts,
+                                         query_embeddings=query_embeddings,
+                                         n_results=n_results, where=where,
+                                         where_document=where_document, include=list(include))
+
+        if query_embeddings is None:
+            if isinstance(query_texts, str):
+                query_texts = [query_texts]
+            query_embeddings = fonction_embedding_de(self.collection)(query_texts)
+        if rapport["plan"] == "pre-filtre":
+            return self._pre_filtrer(query_embeddings, n_results, where, where_document, include)
+        return self._post_filtrer(query_embeddings, n_results, where, where_document, include,
+                                  rapport)
+
+    def _pre_filtrer(self, query_embeddings, n_results, where, where_document, include):
+        """
+        Recherche exacte sur les embeddings des seuls candidats
+        """
+        candidats, exact = self._candidats(where)
+        ids, vecteurs = [], []
+        for lot in par_lots(sorted(candidats), self.taille_lot):
+            morceau = self.collection.get(ids=lot, where=None if exact else where,
+                                          where_document=where_document, include=["embeddings"])
+            if morceau["ids"]:
+                ids.extend(morceau["ids"])
+                vecteurs.append(np.asarray(morceau["embeddings"], dtype=np.float32))
+        self.dernier_rapport["candidats"] = len(ids)
+
+        resultat = {cle: [] for cle in ("ids", "distances", "documents", "metadatas",
+                                        "embeddings")}
+        if ids:
+            matrice = np.vstack(vecteurs)
+            indices, dist = top_k(query_embeddings, matrice, n_results,
+                                  espace_de(self.collection))
+            retenus = sorted({ids[i] for i in indices.ravel()})
+            details = self.collection.get(ids=retenus, include=["documents", "metadatas"])
+            par_id = dict(zip(details["ids"], zip(details["documents"], details["metadatas"])))
+        else:
+            indices = dist = np.empty((len(query_embeddings), 0), dtype=np.int64)
+        for ligne_indices, ligne_distances in zip(indices, dist):
+            selection = [ids[i] for i in ligne_indices]
+            resultat["ids"].append(selection)
+            resultat["distances"].append([float(d) for d in ligne_distances])
+            resultat["documents"].append([par_id[i][0] for i in selection])
+            resultat["metadatas"].append([par_id[i][1] for i in selection])
+            resultat["embeddings"].append(matrice[ligne_indices] if selection else [])
+        for cle in ("distances", "documents", "metadatas", "embeddings"):
+            if cle not in include:
+                resultat[cle] = None
+        return resultat
+
+    def _post_filtrer(self, query_embeddings, n_results, where, where_document, include,
+                      rapport):
+        """
+        query() sans filtre avec sur-extraction, puis filtre sur les métadonnées
+        """
+        extraits = self.collection.query(
+            query_embeddings=query_embeddings, n_results=rapport["n_extraits"],
+            where_document=where_document,
+            include=list(dict.fromkeys([*include, "metadatas"])))
+        resultat = {cle: [] for cle in ["ids", *include]}
+        for numero in range(len(extraits["ids"])):
+            rangs = [r for r, m in enumerate(extraits["metadatas"][numero])
+                     if satisfait(m, where)][:n_results]
+            for cle in resultat:
+                resultat[cle].append([extraits[cle][numero][r] for r in rangs])
+
+        incomplets = [n for n, ids in enumerate(resultat["ids"]) if len(ids) < n_results]
+        if incomplets and rapport["n_extraits"] < rapport["total"]:
+            # Estimation trop optimiste : ces questions repassent par query(where=...)
+            rapport["repli"] = len(incomplets)
+            repli = self.collection.query(
+                query_embeddings=[query_embeddings[n] for n in incomplets],
+                n_results=n_results, where=where, where_document=where_document,
+                include=list(include))
+            for position, numero in enumerate(incomplets):
+                for cle in resultat:
+                    resultat[cle][numero] = repli[cle][position]
+        return resultat
+
+
+# ============================================================================
+# EXEMPLE: FILTRES SUR diamonds
+# ============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    import chromadb
+
+    client = chromadb.PersistentClient()
+    collection = CollectionIndexee(client.get_or_create_collection(name="diamonds"),
+                                   index={"cut": "hash", "color": "hash", "price": "trie"})
+
+    question = ["Petit diamant bien taillé"]
+    for filtre in ({"cut": "Ideal"}, {"price": {"$lt": 400}},
+                   {"$and": [{"cut": "Fair"}, {"price": {"$gte": 15000}}]},
+                   {"clarity": "IF"}):
+        debut = time.perf_counter()
+        resultats = collection.query(query_texts=question, n_results=3, where=filtre)
+        print(f"# {filtre}: {collection.dernier_rapport} "
+              f"({(time.perf_counter() - debut) * 1000:.1f} ms)")
+        for document in resultats["documents"][0]:
+            print(f"  - {document}")
@@ -0,0 +1,181 @@
+# ============================================================================
+# INGESTION EN FLUX D'UN FICHIER CSV DANS UNE COLLECTION CHROMADB
+# ============================================================================
+#
+# Le fichier CSV est lu ligne par ligne (générateur) et envoyé à ChromaDB par
+# lots de taille bornée : la mémoire reste constante même pour diamonds.csv
+# (~54 000 lignes), et aucun appel ne dépasse la limite de taille de lot du
+# client.
+# ============================================================================
+
+import csv
+import time
+from itertools import islice
+
+# ============================================================================
+# MODÈLES DE DOCUMENTS
+# ============================================================================
+
+# Chaque modèle est une chaîne format() dont les champs sont les noms de
+# colonnes du fichier CSV
+MODELE_POPULATION = "Country: {Country}, Population: {Population}"
+
+MODELE_DIAMANTS = (
+    "Carat: {carat}, Cut: {cut}, Color: {color}, Clarity: {clarity}, "
+    "Depth: {depth}, Table: {table}, Price: {price}, "
+    "Dimensions: ({x} x {y} x {z})"
+)
+
+# Colonnes de diamonds.csv gardées en métadonnées typées
+# (utilisables dans where et par l'index colonnaire)
+COLONNES_DIAMANTS = {
+    "carat": float,
+    "price": int,
+    "cut": str,
+    "color": str,
+    "clarity": str,
+}
+
+# Taille de lot utilisée si le client ne fournit pas sa limite
+TAILLE_LOT_DEFAUT = 1000
+
+
+# ============================================================================
+# LECTURE ET DÉCOUPAGE
+# ============================================================================
+
+def lire_csv(chemin, encodage="ISO-8859-1", delimiter=","):
+    """
+    Générateur qui renvoie chaque ligne du CSV sous forme de dictionnaire
+    """
+    with open(chemin, mode="r", encoding=encodage, newline="") as fichier:
+        for ligne in csv.DictReader(fichier, delimiter=delimiter):
+            yield ligne
+
+
+def par_lots(iterable, taille):
+    """
+    Regroupe un itérable en listes de `taille` éléments au maximum
+    """
+    iterateur = iter(iterable)
+    while True:
+        lot = list(islice(iterateur, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def taille_lot_max(client=None, taille_lot=None):
+    """
+    Taille de lot à utiliser : la valeur demandée, bornée par la limite du client
+    """
+    limite = None
+    if client is not None:
+        try:
+            limite = client.get_max_batch_size()
+        except AttributeError:
+            limite = getattr(client, "max_batch_size", None)
+    if taille_lot is None:
+        return limite or TAILLE_LOT_DEFAUT
+    if limite:
+        return min(taille_lot, limite)
+    return taille_lot
+
+
+def extraire_metadonnees(ligne, colonnes):
+    """
+    Métadonnées d'une ligne CSV
+
+    `colonnes` est une liste de noms (valeurs gardées en texte) ou un
+    dictionnaire {nom: type} pour convertir les valeurs (float, int, str...).
+    """
+    if isinstance(colonnes, dict):
+        return {colonne: type_(ligne[colonne]) for colonne, type_ in colonnes.items()}
+    return {colonne: ligne[colonne] for colonne in colonnes}
+
+
+def preparer_lots(lignes, modele, taille_lot, prefixe_id="id_",
+                  colonnes_metadonnees=None):
+    """
+    Transforme les lignes CSV en lots prêts pour upsert
+
+    Chaque lot est un dictionnaire {"ids", "documents", "metadatas"}.
+    """
+    for numero, lot in enumerate(par_lots(lignes, taille_lot)):
+        debut = numero * taille_lot
+        ids = [f"{prefixe_id}{debut + i}" for i in range(len(lot))]
+        documents = [modele.format_map(ligne) for ligne in lot]
+        metadatas = None
+        if colonnes_metadonnees:
+            metadatas = [extraire_metadonnees(ligne, colonnes_metadonnees) for ligne in lot]
+        yield {"ids": ids, "documents": documents, "metadatas": metadatas}
+
+
+# ============================================================================
+# ÉCRITURE DANS LA COLLECTION
+# ============================================================================
+
+def ingerer_lots(collection, lots, afficher=True):
+    """
+    Envoie chaque lot à collection.upsert et mesure le débit
+    """
+    nb_lignes = 0
+    debut = time.perf_counter()
+    for lot in lots:
+        collection.upsert(**{cle: valeur for cle, valeur in lot.items() if valeur is not None})
+        nb_lignes += len(lot["ids"])
+        if afficher:
+            ecoule = time.perf_counter() - debut
+            print(f"# {nb_lignes} lignes ingérées ({nb_lignes / ecoule:.0f} lignes/s)")
+    duree = time.perf_counter() - debut
+    return {
+        "lignes": nb_lignes,
+        "secondes": duree,
+        "lignes_par_seconde": nb_lignes / duree if duree > 0 else 0.0,
+    }
+
+
+def ingerer_csv(collection, chemin, modele, client=None, taille_lot=None,
+                prefixe_id="id_", colonnes_metadonnees=None,
+                encodage="ISO-8859-1", afficher=True, pipeline=None, deduplication=None):
+    """
+    Lit un CSV en flux et l'insère par lots dans la collection
+
+    Si `pipeline` (PipelineEmbeddings) est fourni, les embeddings sont calculés
+    en parallèle au lieu d'être calculés par upsert sur le thread appelant.
+    Si `deduplication` (Deduplicateur) est fourni, les documents quasi
+    identiques à un document déjà gardé ne sont pas insérés.
+    """
+    taille = taille_lot_max(client, taille_lot)
+    lots = preparer_lots(
+        lire_csv(chemin, encodage=encodage),
+        modele,
+        taille,
+        prefixe_id=prefixe_id,
+        colonnes_metadonnees=colonnes_metadonnees,
+    )
+    if deduplication is not None:
+        # Les embeddings sont calculés par l'étape de déduplication et réutilisés
+        lots = deduplication.filtrer(collection, lots, pipeline=pipeline)
+    elif pipeline is not None:
+        return pipeline.ingerer(collection, lots, afficher=afficher)
+    return ingerer_lots(collection, lots, afficher=afficher)
+
+
+# ============================================================================
+# EXEMPLE: CHARGEMENT COMPLET DE diamonds.csv
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    from pipeline_embeddings import PipelineEmbeddings
+
+    client = chromadb.PersistentClient()
+    col = client.get_or_create_collection(name="diamonds")
+
+    with PipelineEmbeddings() as pipeline:
+        stats = ingerer_csv(col, "diamonds.csv", MODELE_DIAMANTS, client=client,
+                            colonnes_metadonnees=COLONNES_DIAMANTS, pipeline=pipeline)
+    print(f"# {stats['lignes']} lignes en {stats['secondes']:.1f} s "
+          f"({stats['lignes_par_seconde']:.0f} lignes/s)")
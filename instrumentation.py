@@ -0,0 +1,257 @@
+# ============================================================================
+# INSTRUMENTATION: DURÉE DE CHAQUE ÉTAPE DES APPELS À UNE COLLECTION
+# ============================================================================
+#
+# CollectionInstrumentee enveloppe une collection et chronomètre, pour
+# add / upsert / update / delete / query / get :
+# - "embedding"       : calcul des embeddings (fait ici, hors de ChromaDB)
+# - "chroma"          : l'appel à ChromaDB (recherche dans l'index + filtre)
+# - "filtre"          : évaluation seule du where (optionnel, voir detail)
+# - "materialisation" : lecture des documents/métadonnées des résultats
+#                       (optionnel, voir detail)
+# - "total"
+#
+# ChromaDB n'expose pas la durée de ses étapes internes. Avec detail=True,
+# query() est donc décomposé en appels séparés : get(where) pour le filtre,
+# query(include=["distances"]) pour l'index, get(ids) pour les documents.
+# Cela ajoute des appels : à réserver au diagnostic.
+#
+# Les durées alimentent des histogrammes exportables au format texte de
+# Prometheus ou en JSON. Les requêtes plus lentes que seuil_lent_ms sont
+# journalisées (logging) avec leur where.
+# ============================================================================
+
+import json
+import logging
+import threading
+import time
+
+from outils_vecteurs import fonction_embedding_de
+
+# Bornes des histogrammes, en secondes (comme les histogrammes Prometheus)
+BORNES_DEFAUT = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                 2.5, 5.0, 10.0)
+
+journal = logging.getLogger("chromadb.performances")
+
+
+class Histogramme:
+    """
+    Histogramme cumulatif : nombre d'observations sous chaque borne
+    """
+
+    def __init__(self, bornes=BORNES_DEFAUT):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, secondes):
+        self.somme += secondes
+        self.nombre += 1
+        for i, borne in enumerate(self.bornes):
+            if secondes <= borne:
+                self.comptes[i] += 1
+                return
+        self.comptes[-1] += 1
+
+    def cumules(self):
+        total, resultat = 0, []
+        for compte in self.comptes:
+            total += compte
+            resultat.append(total)
+        return resultat
+
+
+class CollectionInstrumentee:
+    """
+    Enveloppe une collection et mesure la durée de chaque étape
+
+    - seuil_lent_ms : au-delà, l'appel est écrit dans le journal (None : jamais)
+    - detail : décompose query() en filtre / index / matérialisation
+    - ecouteurs : fonctions appelées après chaque opération avec
+      (operation, etapes, parametres), par exemple pour du tracing
+    """
+
+    def __init__(self, collection, seuil_lent_ms=None, detail=False, ecouteurs=(),
+                 bornes=BORNES_DEFAUT):
+        self.collection = collection
+        self.seuil_lent = None if seuil_lent_ms is None else seuil_lent_ms / 1000
+        self.detail = detail
+        self.ecouteurs = list(ecouteurs)
+        self.bornes = bornes
+        self.histogrammes = {}
+        self._verrou = threading.Lock()
+        self._fonction_embedding = None
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    def ajouter_ecouteur(self, fonction):
+        self.ecouteurs.append(fonction)
+
+    # ------------------------------------------------------------------------
+    # Mesure
+    # ------------------------------------------------------------------------
+
+    def _enregistrer(self, operation, etapes, parametres):
+        with self._verrou:
+            for etape, secondes in etapes.items():
+                cle = (operation, etape)
+                if cle not in self.histogrammes:
+                    self.histogrammes[cle] = Histogramme(self.bornes)
+                self.histogrammes[cle].observer(secondes)
+        if self.seuil_lent is not None and etapes["total"] > self.seuil_lent:
+            journal.warning(
+                "%s lent sur %s: %.1f ms (where=%s, where_document=%s, etapes=%s)",
+                operation, self.collection.name, etapes["total"] * 1000,
+                json.dumps(parametres.get("where"), ensure_ascii=False),
+                json.dumps(parametres.get("where_document"), ensure_ascii=False),
+                {etape: round(s * 1000, 2) for etape, s in etapes.items()},
+            )
+        for ecouteur in self.ecouteurs:
+            ecouteur(operation, etapes, parametres)
+
+    def _embedder(self, textes, etapes):
+        if self._fonction_embedding is None:
+            self._fonction_embedding = fonction_embedding_de(self.collection)
+        debut = time.perf_counter()
+        embeddings = self._fonction_embedding(list(textes))
+        etapes["embedding"] = time.perf_counter() - debut
+        return embeddings
+
+    def _chroma(self, methode, etapes, etape="chroma", **parametres):
+        debut = time.perf_counter()
+        resultat = getattr(self.collection, methode)(**parametres)
+        etapes[etape] = etapes.get(etape, 0.0) + time.perf_counter() - debut
+        return resultat
+
+    def _ecrire(self, operation, parametres):
+        debut = time.perf_counter()
+        etapes = {}
+        if parametres.get("documents") is not None and parametres.get("embeddings") is None:
+            parametres["embeddings"] = self._embedder(parametres["documents"], etapes)
+        resultat = self._chroma(operation, etapes, **parametres)
+        etapes["total"] = time.perf_counter() - debut
+        self._enregistrer(operation, etapes, parametres)
+        return resultat
+
+    # ------------------------------------------------------------------------
+    # Opérations de la collection
+    # ------------------------------------------------------------------------
+
+    def add(self, **parametres):
+        return self._ecrire("add", parametres)
+
+    def upsert(self, **parametres):
+        return self._ecrire("upsert", parametres)
+
+    def update(self, **parametres):
+        return self._ecrire("update", parametres)
+
+    def delete(self, **parametres):
+        return self._ecrire("delete", parametres)
+
+    def get(self, **parametres):
+        debut = time.perf_counter()
+        etapes = {}
+        resultat = self._chroma("get", etapes, **parametres)
+        etapes["total"] = time.perf_counter() - debut
+        self._enregistrer("get", etapes, parametres)
+        return resultat
+
+    def query(self, **parametres):
+        debut = time.perf_counter()
+        etapes = {}
+        textes = parametres.pop("query_texts", None)
+        if textes is not None and parametres.get("query_embeddings") is None:
+            if isinstance(textes, str):
+                textes = [textes]
+            parametres["query_embeddings"] = self._embedder(textes, etapes)
+        if self.detail:
+            resultat = self._query_detaille(parametres, etapes)
+        else:
+            resultat = self._chroma("query", etapes, **parametres)
+        etapes["total"] = time.perf_counter() - debut
+        self._enregistrer("query", etapes, parametres)
+        return resultat
+
+    def _query_detaille(self, parametres, etapes):
+        filtres = {cle: parametres[cle] for cle in ("where", "where_document")
+                   if parametres.get(cle)}
+        if filtres:
+            self._chroma("get", etapes, etape="filtre", include=[], **filtres)
+        include = list(parametres.get("include", ("documents", "metadatas", "distances")))
+        recherche = dict(parametres, include=[c for c in include if c in ("distances", "embeddings")])
+        resultat = self._chroma("query", etapes, **recherche)
+
+        a_lire = [c for c in include if c in ("documents", "metadatas")]
+        if a_lire:
+            tous = sorted({i for ids in resultat["ids"] for i in ids})
+            lus = self._chroma("get", etapes, etape="materialisation", ids=tous, include=a_lire)
+            for champ in a_lire:
+                par_id = dict(zip(lus["ids"], lus[champ]))
+                resultat[champ] = [[par_id[i] for i in ids] for ids in resultat["ids"]]
+        return resultat
+
+    # ------------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------------
+
+    def exporter_json(self):
+        """
+        Histogrammes par opération et par étape
+        """
+        with self._verrou:
+            return {
+                operation: {
+                    etape: {
+                        "nombre": h.nombre,
+                        "somme_secondes": h.somme,
+                        "moyenne_ms": h.somme / h.nombre * 1000 if h.nombre else 0.0,
+                        "buckets": dict(zip([*map(str, h.bornes), "+Inf"], h.cumules())),
+                    }
+                    for (op, etape), h in self.histogrammes.items() if op == operation
+                }
+                for operation in sorted({op for op, _ in self.histogrammes})
+            }
+
+    def exporter_prometheus(self, nom="chromadb_operation_duree_secondes"):
+        """
+        Histogrammes au format texte de Prometheus
+        """
+        lignes = [f"# HELP {nom} Durée des opérations ChromaDB par étape",
+                  f"# TYPE {nom} histogram"]
+        with self._verrou:
+            for (operation, etape), h in sorted(self.histogrammes.items()):
+                etiquettes = (f'collection="{self.collection.name}",'
+                              f'operation="{operation}",etape="{etape}"')
+                for borne, cumul in zip([*map(str, h.bornes), "+Inf"], h.cumules()):
+                    lignes.append(f'{nom}_bucket{{{etiquettes},le="{borne}"}} {cumul}')
+                lignes.append(f"{nom}_sum{{{etiquettes}}} {h.somme}")
+                lignes.append(f"{nom}_count{{{etiquettes}}} {h.nombre}")
+        return "\n".join(lignes) + "\n"
+
+
+# ============================================================================
+# EXEMPLE
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    logging.basicConfig(level=logging.INFO)
+
+    client = chromadb.Client()
+    collection = CollectionInstrumentee(
+        client.get_or_create_collection(name="voitures"), seuil_lent_ms=50, detail=True
+    )
+    collection.upsert(documents=["DavRos", "BMW", "VX", "RAV4"],
+                      ids=["id1", "id2", "id3", "id4"],
+                      metadatas=[{"pays": "FR"}, {"pays": "DE"}, {"pays": "GB"}, {"pays": "JP"}])
+    for question in ("voiture allemande", "SUV", "BMW"):
+        collection.query(query_texts=[question], n_results=1, where={"pays": {"$ne": "FR"}})
+    collection.get(ids=["id2"])
+
+    print(json.dumps(collection.exporter_json()["query"], indent=2))
+    print(collection.exporter_prometheus())
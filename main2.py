@@ -3,12 +3,19 @@
 # ============================================================================
 
 import chromadb
+from cache_embeddings import EmbeddingFunctionEnCache
+from recherche_exacte import CollectionExacte
 
 # Créer un client ChromaDB
 client_chroma = chromadb.Client()
 
 # Créer ou récupérer une collection de livres
-col = client_chroma.get_or_create_collection(name="books")
+# (les embeddings des livres sont gardés en cache dans ./cache_embeddings ;
+# avec 4 livres, la recherche exacte en mémoire remplace l'index HNSW)
+col = CollectionExacte(client_chroma.get_or_create_collection(
+    name="books",
+    embedding_function=EmbeddingFunctionEnCache()
+))
 
 # Ajouter des livres avec leurs prix
 col.upsert(
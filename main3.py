@@ -3,17 +3,28 @@
 # EXEMPLE 3: CLIENT PERSISTANT - RECHERCHE DE VOITURES
 # ============================================================================
 
-import chromadb
+from demarrage_rapide import DemarrageRapide
+from index_bm25 import CollectionHybride
+
+
+def fonction_embedding_voitures():
+    # Importée dans le thread de préchargement (chromadb n'est pas encore chargé)
+    from cache_embeddings import cache_pour_client
+    # Les embeddings sont gardés en cache à côté des données, dans ./chroma
+    return cache_pour_client("./chroma")
 
-# Créer un client persistant (données sauvegardées sur disque)
-client = chromadb.PersistentClient()
 
-# Créer ou récupérer une collection de voitures
-coll = client.get_or_create_collection(name="voitures")
+# Ouvrir le client persistant (données sauvegardées sur disque) en arrière-plan :
+# import de chromadb, modèle et index de "voitures" se chargent pendant la saisie
+demarrage = DemarrageRapide("./chroma", precharger={"voitures": fonction_embedding_voitures})
 
 # Demander à l'utilisateur ce qu'il cherche
 text_user = input("Que voulez-vous ?")
 
+# Récupérer la collection de voitures (attend la fin du préchargement)
+# (un index par mots-clés BM25 est tenu à jour à côté, pour "BMW", "RAV4"...)
+coll = CollectionHybride(demarrage.collection("voitures"), dossier="./chroma")
+
 # Ajouter des marques de voitures
 coll.upsert(
     documents=[
@@ -25,8 +36,12 @@ coll.upsert(
     ids=["id1", "id2", "id3", "id4"]
 )
 
+# Sauvegarder l'index BM25 dans ./chroma (une seule écriture après le chargement)
+coll.sauvegarder()
+
 # Rechercher la voiture correspondant à la requête
-results = coll.query(
+# (fusion de la recherche sémantique et de la recherche par mots-clés)
+results = coll.hybrid_query(
     query_texts=text_user,
     n_results=1
 )
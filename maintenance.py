@@ -0,0 +1,314 @@
+# ============================================================================
+# MAINTENANCE ET COMPACTAGE D'UN PERSISTENTCLIENT
+# ============================================================================
+#
+# Après beaucoup de delete (par filtre) et d'upsert, ./chromadb_data et
+# ./rag_database ne font que grossir :
+# - l'index HNSW garde les éléments supprimés (marqués, jamais retirés)
+# - le fichier SQLite garde ses pages libérées
+# et les requêtes ralentissent. Ce module :
+# - rapporte, par collection : taille sur disque, éléments vivants et
+#   supprimés de l'index, fragmentation de l'index et du fichier SQLite
+# - reconstruit une collection (copie avec ses embeddings dans une nouvelle
+#   collection, puis échange des noms). Ce n'est pas une reconstruction à
+#   chaud : les lectures continuent pendant la copie, mais les écritures
+#   doivent attendre la fin, et entre les deux renommages le nom n'existe
+#   pas (get_collection échoue un court instant)
+# - compacte le fichier SQLite (VACUUM) et supprime les dossiers d'index
+#   laissés sur le disque par les collections supprimées
+# - mesure la latence des requêtes avant et après
+#
+#   python maintenance.py --chemin ./rag_database --reconstruire --vacuum
+# ============================================================================
+
+import os
+import pickle
+import shutil
+import sqlite3
+import time
+import uuid
+
+import numpy as np
+
+from benchmark import percentiles
+from parcours_collection import iterer_collection
+
+FICHIER_SQLITE = "chroma.sqlite3"
+SUFFIXE_RECONSTRUCTION = "__reconstruction"
+SUFFIXE_ANCIENNE = "__ancienne"
+
+
+def taille_dossier(chemin):
+    """
+    Taille totale des fichiers d'un dossier, en octets
+    """
+    total = 0
+    for dossier, _, fichiers in os.walk(chemin):
+        for fichier in fichiers:
+            total += os.path.getsize(os.path.join(dossier, fichier))
+    return total
+
+
+def _lecture_seule(chemin):
+    return sqlite3.connect(f"file:{os.path.join(chemin, FICHIER_SQLITE)}?mode=ro", uri=True)
+
+
+# ============================================================================
+# RAPPORT
+# ============================================================================
+
+def etat_sqlite(chemin):
+    """
+    Taille du fichier SQLite et proportion de pages libres
+    """
+    with _lecture_seule(chemin) as connexion:
+        pages = connexion.execute("PRAGMA page_count").fetchone()[0]
+        libres = connexion.execute("PRAGMA freelist_count").fetchone()[0]
+        en_file = connexion.execute("SELECT COUNT(*) FROM embeddings_queue").fetchone()[0]
+    return {
+        "octets": os.path.getsize(os.path.join(chemin, FICHIER_SQLITE)),
+        "pages": pages,
+        "pages_libres": libres,
+        "fragmentation": libres / pages if pages else 0.0,
+        "ecritures_en_file": en_file,
+    }
+
+
+def etat_index(chemin, collection):
+    """
+    Éléments vivants et supprimés de l'index HNSW d'une collection
+    """
+    with _lecture_seule(chemin) as connexion:
+        ligne = connexion.execute(
+            "SELECT id FROM segments WHERE collection = ? AND scope = 'VECTOR'",
+            (str(collection.id),),
+        ).fetchone()
+    etat = {"vivants": collection.count(), "octets_index": 0, "elements_index": None,
+            "supprimes": None, "fragmentation": None}
+    if ligne is None:
+        return etat
+    dossier = os.path.join(chemin, ligne[0])
+    if os.path.isdir(dossier):
+        etat["octets_index"] = taille_dossier(dossier)
+    chemin_metadonnees = os.path.join(dossier, "index_metadata.pickle")
+    if os.path.exists(chemin_metadonnees):
+        # Écrit par ChromaDB à chaque synchronisation de l'index sur le disque
+        with open(chemin_metadonnees, "rb") as fichier:
+            metadonnees = pickle.load(fichier)
+        total = metadonnees["total_elements_added"]
+        vivants = len(metadonnees["id_to_label"])
+        etat.update(elements_index=total, supprimes=total - vivants,
+                    fragmentation=(total - vivants) / total if total else 0.0)
+    return etat
+
+
+def dossiers_orphelins(chemin):
+    """
+    Dossiers d'index qui n'appartiennent plus à aucun segment
+
+    ChromaDB ne supprime pas le dossier de l'index d'une collection supprimée.
+    """
+    with _lecture_seule(chemin) as connexion:
+        segments = {ligne[0] for ligne in connexion.execute("SELECT id FROM segments")}
+    orphelins = []
+    for nom in os.listdir(chemin):
+        if not os.path.isdir(os.path.join(chemin, nom)) or nom in segments:
+            continue
+        try:
+            uuid.UUID(nom)
+        except ValueError:
+            continue
+        orphelins.append(os.path.join(chemin, nom))
+    return orphelins
+
+
+def rapport(client, chemin):
+    """
+    État du dossier, du fichier SQLite et de l'index de chaque collection
+    """
+    orphelins = dossiers_orphelins(chemin)
+    return {
+        "octets_total": taille_dossier(chemin),
+        "sqlite": etat_sqlite(chemin),
+        "orphelins": {"dossiers": len(orphelins),
+                      "octets": sum(taille_dossier(d) for d in orphelins)},
+        "collections": {c.name: etat_index(chemin, c) for c in client.list_collections()},
+    }
+
+
+def afficher_rapport(etat):
+    sqlite = etat["sqlite"]
+    print(f"# Dossier: {etat['octets_total'] / 1e6:.1f} Mo, SQLite: {sqlite['octets'] / 1e6:.1f} Mo "
+          f"({sqlite['fragmentation']:.0%} de pages libres), "
+          f"{etat['orphelins']['dossiers']} dossiers d'index orphelins "
+          f"({etat['orphelins']['octets'] / 1e6:.1f} Mo)")
+    for nom, index in etat["collections"].items():
+        fragmentation = ("?" if index["fragmentation"] is None
+                         else f"{index['fragmentation']:.0%}")
+        print(f"  {nom:<30} {index['vivants']:>8} vivants  {index['supprimes'] or 0:>8} supprimés  "
+              f"index {index['octets_index'] / 1e6:6.1f} Mo  fragmentation {fragmentation}")
+
+
+# ============================================================================
+# LATENCE
+# ============================================================================
+
+def mesurer_latence(collection, nb_requetes=50, n_results=10, graine=0):
+    """
+    p50/p95/p99 de query() avec des embeddings pris dans la collection
+    """
+    nb_documents = collection.count()
+    if nb_documents == 0:
+        return None
+    decalages = np.random.default_rng(graine).integers(0, nb_documents, nb_requetes)
+    durees = []
+    for decalage in decalages:
+        exemple = collection.get(limit=1, offset=int(decalage), include=["embeddings"])
+        debut = time.perf_counter()
+        collection.query(query_embeddings=exemple["embeddings"], n_results=n_results,
+                         include=["distances"])
+        durees.append(time.perf_counter() - debut)
+    return percentiles(durees)
+
+
+# ============================================================================
+# RECONSTRUCTION ET COMPACTAGE
+# ============================================================================
+
+def reprendre_reconstruction(client, nom):
+    """
+    Termine ou annule une reconstruction de `nom` interrompue
+
+    - arrêt pendant la copie : la collection temporaire est supprimée
+    - arrêt entre les deux renommages : la copie, terminée, prend le nom
+    - arrêt avant la suppression de l'ancienne : elle est supprimée
+    """
+    noms = {c.name for c in client.list_collections()}
+    ancienne, temporaire = nom + SUFFIXE_ANCIENNE, nom + SUFFIXE_RECONSTRUCTION
+    if ancienne in noms:
+        if nom not in noms:
+            restauree = temporaire if temporaire in noms else ancienne
+            client.get_collection(restauree).modify(name=nom)
+            noms.discard(restauree)
+        if ancienne in noms:
+            client.delete_collection(ancienne)
+    if temporaire in noms:
+        client.delete_collection(temporaire)
+
+
+def reconstruire(client, nom, taille_lot=1000):
+    """
+    Recrée la collection sans ses éléments supprimés
+
+    Les documents sont copiés avec leurs embeddings (rien n'est recalculé)
+    dans une collection temporaire, qui prend ensuite le nom de l'originale.
+    Les écritures doivent être suspendues pendant toute la reconstruction, et
+    `nom` est absent entre les deux modify(name=...) : un lecteur qui reçoit
+    NotFoundError doit réessayer. Les objets Collection ouverts avant
+    désignent l'ancienne collection, supprimée à la fin : les rouvrir.
+    """
+    reprendre_reconstruction(client, nom)
+    ancienne = client.get_collection(nom)
+    configuration = ancienne.configuration or {}
+    # Même fonction d'embedding enregistrée (None : fonction fournie par le code)
+    parametres = {"embedding_function": configuration.get("embedding_function")}
+    if ancienne.metadata:
+        parametres["metadata"] = ancienne.metadata
+    if configuration.get("hnsw"):
+        parametres["configuration"] = {"hnsw": configuration["hnsw"]}
+
+    nouvelle = client.create_collection(name=nom + SUFFIXE_RECONSTRUCTION, **parametres)
+    for lot in iterer_collection(ancienne, taille_lot,
+                                 include=("documents", "metadatas", "embeddings")):
+        nouvelle.add(**{cle: valeur for cle, valeur in lot.items() if valeur is not None})
+
+    # Échange des noms : `nom` n'existe pas entre ces deux lignes
+    ancienne.modify(name=nom + SUFFIXE_ANCIENNE)
+    nouvelle.modify(name=nom)
+    client.delete_collection(nom + SUFFIXE_ANCIENNE)
+    return nouvelle
+
+
+def vacuum(chemin, timeout=10):
+    """
+    Compacte le fichier SQLite (rend au disque les pages libres)
+    """
+    avant = os.path.getsize(os.path.join(chemin, FICHIER_SQLITE))
+    connexion = sqlite3.connect(os.path.join(chemin, FICHIER_SQLITE), timeout=timeout)
+    try:
+        connexion.execute("VACUUM")
+        # Même trace que la commande `chroma vacuum`
+        connexion.execute(
+            "INSERT INTO maintenance_log (operation, timestamp) VALUES ('vacuum', CURRENT_TIMESTAMP)")
+        connexion.commit()
+    finally:
+        connexion.close()
+    return avant - os.path.getsize(os.path.join(chemin, FICHIER_SQLITE))
+
+
+def supprimer_orphelins(chemin):
+    """
+    Supprime les dossiers d'index orphelins, renvoie les octets libérés
+    """
+    liberes = 0
+    for dossier in dossiers_orphelins(chemin):
+        liberes += taille_dossier(dossier)
+        shutil.rmtree(dossier)
+    return liberes
+
+
+def maintenir(client, chemin, noms=None, seuil_fragmentation=0.2, reconstruction=True,
+              compactage=True):
+    """
+    Rapport, reconstruction des collections fragmentées, VACUUM, rapport
+
+    Renvoie la latence de chaque collection avant et après.
+    """
+    etat = rapport(client, chemin)
+    afficher_rapport(etat)
+    noms = noms or list(etat["collections"])
+    latences = {nom: {"avant": mesurer_latence(client.get_collection(nom))} for nom in noms}
+
+    if reconstruction:
+        for nom in noms:
+            fragmentation = etat["collections"][nom]["fragmentation"]
+            if fragmentation is not None and fragmentation >= seuil_fragmentation:
+                debut = time.perf_counter()
+                reconstruire(client, nom)
+                print(f"# {nom} reconstruite en {time.perf_counter() - debut:.1f} s")
+    if compactage:
+        print(f"# VACUUM: {vacuum(chemin) / 1e6:.1f} Mo rendus au disque")
+        print(f"# Dossiers orphelins: {supprimer_orphelins(chemin) / 1e6:.1f} Mo supprimés")
+
+    afficher_rapport(rapport(client, chemin))
+    for nom in noms:
+        latences[nom]["apres"] = mesurer_latence(client.get_collection(nom))
+        avant, apres = latences[nom]["avant"], latences[nom]["apres"]
+        if avant and apres:
+            print(f"# {nom}: p50 {avant['p50']:.2f} -> {apres['p50']:.2f} ms, "
+                  f"p95 {avant['p95']:.2f} -> {apres['p95']:.2f} ms")
+    return latences
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Maintenance d'un dossier PersistentClient")
+    parser.add_argument("--chemin", default="./chromadb_data")
+    parser.add_argument("--collections", nargs="*")
+    parser.add_argument("--reconstruire", action="store_true",
+                        help="reconstruire les collections dont l'index est fragmenté")
+    parser.add_argument("--seuil", type=float, default=0.2,
+                        help="fragmentation de l'index à partir de laquelle reconstruire")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="compacter le fichier SQLite et supprimer les dossiers orphelins")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chemin)
+    if args.reconstruire or args.vacuum:
+        maintenir(client, args.chemin, args.collections, args.seuil,
+                  reconstruction=args.reconstruire, compactage=args.vacuum)
+    else:
+        afficher_rapport(rapport(client, args.chemin))
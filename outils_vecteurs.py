@@ -0,0 +1,76 @@
+# ============================================================================
+# OUTILS VECTORIELS COMMUNS (DISTANCES, TOP-K EXACT)
+# ============================================================================
+#
+# Calcul exact des distances avec NumPy, dans les mêmes espaces que l'index
+# HNSW de ChromaDB, pour que les résultats soient comparables à query() :
+# - "l2"     : distance euclidienne au carré
+# - "cosine" : 1 - similarité cosinus
+# - "ip"     : 1 - produit scalaire
+# ============================================================================
+
+import numpy as np
+
+
+def espace_de(collection):
+    """
+    Espace de distance de la collection ("l2" par défaut)
+    """
+    configuration = getattr(collection, "configuration", None) or {}
+    espace = (configuration.get("hnsw") or {}).get("space")
+    if espace is None:
+        espace = (collection.metadata or {}).get("hnsw:space", "l2")
+    return espace
+
+
+def fonction_embedding_de(collection):
+    """
+    Fonction d'embedding associée à la collection
+    """
+    configuration = getattr(collection, "configuration", None) or {}
+    fonction = configuration.get("embedding_function")
+    if fonction is None:
+        fonction = getattr(collection, "_embedding_function", None)
+    if fonction is None:
+        from chromadb.utils import embedding_functions
+        fonction = embedding_functions.DefaultEmbeddingFunction()
+    return fonction
+
+
+def distances(requetes, matrice, espace="l2"):
+    """
+    Matrice (nb_requetes, nb_vecteurs) des distances
+    """
+    requetes = np.atleast_2d(np.asarray(requetes, dtype=np.float32))
+    matrice = np.asarray(matrice, dtype=np.float32)
+    if espace == "l2":
+        carres = (requetes ** 2).sum(axis=1)[:, None] + (matrice ** 2).sum(axis=1)[None, :]
+        return np.maximum(carres - 2.0 * requetes @ matrice.T, 0.0)
+    if espace == "cosine":
+        requetes = requetes / np.maximum(np.linalg.norm(requetes, axis=1, keepdims=True), 1e-12)
+        matrice = matrice / np.maximum(np.linalg.norm(matrice, axis=1, keepdims=True), 1e-12)
+        return 1.0 - requetes @ matrice.T
+    if espace == "ip":
+        return 1.0 - requetes @ matrice.T
+    raise ValueError(f"Espace de distance inconnu: {espace!r}")
+
+
+def top_k(requetes, matrice, k, espace="l2"):
+    """
+    Les k plus proches voisins exacts de chaque requête
+
+    Renvoie (indices, distances), triés par distance croissante. argpartition
+    sélectionne les k meilleurs en O(n) avant de ne trier que ces k-là.
+    """
+    d = distances(requetes, matrice, espace)
+    k = min(k, d.shape[1])
+    if k == 0:
+        vide = np.empty((d.shape[0], 0))
+        return vide.astype(np.int64), vide
+    if k < d.shape[1]:
+        candidats = np.argpartition(d, k - 1, axis=1)[:, :k]
+    else:
+        candidats = np.broadcast_to(np.arange(d.shape[1]), d.shape)
+    ordre = np.take_along_axis(d, candidats, axis=1).argsort(axis=1)
+    indices = np.take_along_axis(candidats, ordre, axis=1)
+    return indices, np.take_along_axis(d, indices, axis=1)
@@ -0,0 +1,157 @@
+# ============================================================================
+# PARCOURS D'UNE COLLECTION PAR CURSEUR ET EXPORT EN FLUX
+# ============================================================================
+#
+# Avec get(limit=..., offset=...), chaque page coûte plus cher que la
+# précédente : la base doit sauter `offset` éléments à chaque appel, et
+# l'export complet d'une grosse collection devient quadratique.
+#
+# Ici, la liste des identifiants est lue une seule fois (sans documents ni
+# embeddings), puis un curseur avance dans cette liste et récupère chaque lot
+# par get(ids=...) : le coût d'un lot reste constant quelle que soit sa
+# position. L'export écrit les lots au fil de l'eau (NumPy ou Parquet) sans
+# charger toute la collection en mémoire.
+# ============================================================================
+
+import json
+import os
+
+import numpy as np
+
+from ingestion_csv import par_lots
+
+INCLUDE_DEFAUT = ("documents", "metadatas")
+
+
+def lister_ids(collection, where=None, where_document=None):
+    """
+    Identifiants de la collection (filtrés), sans documents ni embeddings
+    """
+    parametres = {"include": []}
+    if where:
+        parametres["where"] = where
+    if where_document:
+        parametres["where_document"] = where_document
+    return collection.get(**parametres)["ids"]
+
+
+def iterer_collection(collection, taille_lot=1000, where=None, where_document=None,
+                      include=INCLUDE_DEFAUT, ids=None):
+    """
+    Générateur de lots {"ids", "documents", "metadatas", "embeddings"}
+
+    Les champs absents de `include` valent None. Si `ids` est fourni, la
+    liste des identifiants n'est pas relue.
+    """
+    if ids is None:
+        ids = lister_ids(collection, where, where_document)
+    for curseur in par_lots(ids, taille_lot):
+        resultat = collection.get(ids=curseur, include=list(include))
+        embeddings = resultat.get("embeddings")
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+        yield {
+            "ids": resultat["ids"],
+            "documents": resultat.get("documents"),
+            "metadatas": resultat.get("metadatas"),
+            "embeddings": embeddings,
+        }
+
+
+# ============================================================================
+# EXPORT EN FLUX
+# ============================================================================
+
+def exporter_numpy(collection, dossier, taille_lot=1000, where=None):
+    """
+    Exporte la collection en embeddings.npy + documents.jsonl
+
+    embeddings.npy est rempli lot par lot via un memmap : il peut ensuite
+    être relu avec np.load(..., mmap_mode="r").
+    """
+    os.makedirs(dossier, exist_ok=True)
+    ids = lister_ids(collection, where)
+    embeddings = None
+    position = 0
+    with open(os.path.join(dossier, "documents.jsonl"), "w", encoding="utf-8") as fichier:
+        for lot in iterer_collection(collection, taille_lot, include=(
+                "documents", "metadatas", "embeddings"), ids=ids):
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    os.path.join(dossier, "embeddings.npy"), mode="w+",
+                    dtype=np.float32, shape=(len(ids), lot["embeddings"].shape[1]),
+                )
+            embeddings[position:position + len(lot["ids"])] = lot["embeddings"]
+            position += len(lot["ids"])
+            for i, id_document in enumerate(lot["ids"]):
+                fichier.write(json.dumps({
+                    "id": id_document,
+                    "document": lot["documents"][i],
+                    "metadata": lot["metadatas"][i],
+                }, ensure_ascii=False) + "\n")
+    if embeddings is not None:
+        embeddings.flush()
+    return position
+
+
+def exporter_parquet(collection, chemin, taille_lot=1000, where=None):
+    """
+    Exporte la collection dans un fichier Parquet, un row group par lot
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as erreur:
+        raise ImportError("L'export Parquet nécessite pyarrow: pip install pyarrow") from erreur
+
+    ecrivain = None
+    total = 0
+    try:
+        for lot in iterer_collection(collection, taille_lot, where=where, include=(
+                "documents", "metadatas", "embeddings")):
+            dimension = lot["embeddings"].shape[1]
+            table = pa.table({
+                "id": pa.array(lot["ids"], pa.string()),
+                "document": pa.array(lot["documents"], pa.string()),
+                "metadata": pa.array(
+                    [json.dumps(m, ensure_ascii=False) if m else None for m in lot["metadatas"]],
+                    pa.string(),
+                ),
+                "embedding": pa.FixedSizeListArray.from_arrays(
+                    pa.array(lot["embeddings"].ravel(), pa.float32()), dimension
+                ),
+            })
+            if ecrivain is None:
+                ecrivain = pq.ParquetWriter(chemin, table.schema)
+            ecrivain.write_table(table)
+            total += len(lot["ids"])
+    finally:
+        if ecrivain is not None:
+            ecrivain.close()
+    return total
+
+
+# ============================================================================
+# EXEMPLE: EXPORT COMPLET DE LA COLLECTION "diamonds"
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Export en flux d'une collection")
+    parser.add_argument("--chemin", default="./chroma", help="dossier du PersistentClient")
+    parser.add_argument("--collection", default="diamonds")
+    parser.add_argument("--format", choices=["npy", "parquet"], default="npy")
+    parser.add_argument("--sortie", default="export_diamonds")
+    parser.add_argument("--taille-lot", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chemin)
+    collection = client.get_collection(args.collection)
+    if args.format == "npy":
+        total = exporter_numpy(collection, args.sortie, args.taille_lot)
+    else:
+        total = exporter_parquet(collection, args.sortie + ".parquet", args.taille_lot)
+    print(f"# {total} documents exportés")
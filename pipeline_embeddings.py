@@ -0,0 +1,177 @@
+# ============================================================================
+# PIPELINE D'EMBEDDINGS PARALLÈLE POUR LES INSERTIONS EN MASSE
+# ============================================================================
+#
+# Par défaut, collection.upsert() calcule les embeddings sur le thread
+# appelant, un lot après l'autre. Ici, les embeddings sont calculés dans un
+# pool de workers (threads ou processus) et passés à upsert via embeddings=.
+# Pendant que le lot N est écrit dans ChromaDB, le lot N+1 est déjà en cours
+# d'embedding.
+# ============================================================================
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from chromadb.utils import embedding_functions
+
+# Fonction d'embedding propre à chaque processus worker (mode "process")
+_fonction_worker = None
+
+
+def _initialiser_worker(fonction_embedding):
+    """
+    Charge la fonction d'embedding une seule fois par processus
+    """
+    global _fonction_worker
+    _fonction_worker = fonction_embedding
+
+
+def _embedder_worker(documents):
+    """
+    Calcule les embeddings d'une partie de lot dans un processus worker
+    """
+    return [[float(x) for x in vecteur] for vecteur in _fonction_worker(documents)]
+
+
+def decouper(sequence, nb_parties):
+    """
+    Découpe une séquence en `nb_parties` tranches contiguës de tailles proches
+    """
+    taille = -(-len(sequence) // nb_parties)
+    return [sequence[i:i + taille] for i in range(0, len(sequence), taille)]
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+class PipelineEmbeddings:
+    """
+    Calcule les embeddings dans un pool de workers et écrit les lots en parallèle
+
+    - nb_workers : nombre de workers (par défaut, nombre de cœurs)
+    - mode : "thread" (le modèle ONNX libère le GIL) ou "process"
+    - profondeur : nombre de lots en cours d'embedding avant l'écriture
+    """
+
+    def __init__(self, fonction_embedding=None, nb_workers=None, mode="thread",
+                 profondeur=2):
+        self.fonction_embedding = (
+            fonction_embedding or embedding_functions.DefaultEmbeddingFunction()
+        )
+        self.nb_workers = nb_workers or os.cpu_count() or 1
+        self.mode = mode
+        self.profondeur = max(1, profondeur)
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.nb_workers,
+                initializer=_initialiser_worker,
+                initargs=(self.fonction_embedding,),
+            )
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.nb_workers)
+        else:
+            raise ValueError(f"Mode inconnu: {mode!r} (attendu: 'thread' ou 'process')")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def fermer(self):
+        self._executor.shutdown(wait=True)
+
+    def soumettre(self, documents):
+        """
+        Répartit un lot de documents entre les workers et renvoie les futures
+        """
+        parties = decouper(documents, self.nb_workers)
+        if self.mode == "process":
+            return [self._executor.submit(_embedder_worker, partie) for partie in parties]
+        return [self._executor.submit(self.fonction_embedding, partie) for partie in parties]
+
+    def ingerer(self, collection, lots, afficher=True):
+        """
+        Embedde les lots dans le pool et les écrit avec upsert(embeddings=...)
+        """
+        en_attente = deque()
+        nb_lignes = 0
+        debut = time.perf_counter()
+
+        def ecrire_plus_ancien():
+            nonlocal nb_lignes
+            lot, futures = en_attente.popleft()
+            embeddings = [vecteur for future in futures for vecteur in future.result()]
+            champs = {cle: valeur for cle, valeur in lot.items() if valeur is not None}
+            collection.upsert(embeddings=embeddings, **champs)
+            nb_lignes += len(lot["ids"])
+            if afficher:
+                ecoule = time.perf_counter() - debut
+                print(f"# {nb_lignes} lignes ingérées ({nb_lignes / ecoule:.0f} lignes/s)")
+
+        for lot in lots:
+            # Le lot suivant part en embedding avant l'écriture du précédent
+            en_attente.append((lot, self.soumettre(lot["documents"])))
+            if len(en_attente) > self.profondeur:
+                ecrire_plus_ancien()
+        while en_attente:
+            ecrire_plus_ancien()
+
+        duree = time.perf_counter() - debut
+        return {
+            "lignes": nb_lignes,
+            "secondes": duree,
+            "lignes_par_seconde": nb_lignes / duree if duree > 0 else 0.0,
+        }
+
+
+# ============================================================================
+# BENCHMARK: PIPELINE PARALLÈLE VS CHEMIN MONO-THREAD
+# ============================================================================
+
+def comparer(chemin="diamonds.csv", nb_lignes=5000, taille_lot=500,
+             nb_workers=None, mode="thread"):
+    """
+    Ingère les mêmes lignes avec upsert classique puis avec le pipeline
+    """
+    import chromadb
+    from itertools import islice
+
+    from ingestion_csv import MODELE_DIAMANTS, ingerer_lots, lire_csv, preparer_lots
+
+    def lots():
+        lignes = islice(lire_csv(chemin), nb_lignes)
+        return preparer_lots(lignes, MODELE_DIAMANTS, taille_lot)
+
+    client = chromadb.Client()
+    fonction = embedding_functions.DefaultEmbeddingFunction()
+
+    col_seq = client.get_or_create_collection("bench_sequentiel", embedding_function=fonction)
+    sequentiel = ingerer_lots(col_seq, lots(), afficher=False)
+
+    col_par = client.get_or_create_collection("bench_parallele", embedding_function=fonction)
+    with PipelineEmbeddings(fonction, nb_workers=nb_workers, mode=mode) as pipeline:
+        parallele = pipeline.ingerer(col_par, lots(), afficher=False)
+
+    print(f"# Mono-thread : {sequentiel['lignes_par_seconde']:.0f} lignes/s")
+    print(f"# Pipeline    : {parallele['lignes_par_seconde']:.0f} lignes/s "
+          f"({pipeline.nb_workers} workers, mode {mode})")
+    print(f"# Accélération: x{sequentiel['secondes'] / parallele['secondes']:.2f}")
+    return {"sequentiel": sequentiel, "parallele": parallele}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline d'embeddings")
+    parser.add_argument("--csv", default="diamonds.csv")
+    parser.add_argument("--lignes", type=int, default=5000)
+    parser.add_argument("--taille-lot", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    comparer(args.csv, args.lignes, args.taille_lot, args.workers, args.mode)
@@ -4,8 +4,12 @@
 
 # ChromaDB pour la base de données vectorielle
 import chromadb
-# Module CSV pour lire les fichiers de données
-import csv
+# Modèles de documents pour les fichiers CSV
+from ingestion_csv import MODELE_POPULATION
+# Synchronisation incrémentale (seules les lignes modifiées sont réécrites)
+from synchronisation_csv import synchroniser_csv
+# Cache d'embeddings sur disque (les textes déjà vus ne sont plus recalculés)
+from cache_embeddings import cache_pour_client
 
 # ============================================================================
 # ÉTAPE 1: INITIALISATION DU CLIENT CHROMADB
@@ -22,7 +26,11 @@ client = chromadb.PersistentClient()
 # Créer ou récupérer une collection nommée "diamonds"
 # Si la collection existe déjà, elle sera récupérée
 # Sinon, une nouvelle collection sera créée
-col = client.get_or_create_collection(name="diamonds")
+# Le cache d'embeddings est stocké à côté des données, dans ./chroma
+col = client.get_or_create_collection(
+    name="diamonds",
+    embedding_function=cache_pour_client("./chroma")
+)
 
 # ============================================================================
 # ÉTAPE 3: DÉFINITION DU CHEMIN DU FICHIER CSV
@@ -32,56 +40,28 @@ col = client.get_or_create_collection(name="diamonds")
 csv_file_path = "population.csv"
 
 # ============================================================================
-# ÉTAPE 4: PRÉPARATION DES LISTES POUR STOCKER LES DONNÉES
-# ============================================================================
-
-# Liste pour stocker les documents textuels formatés
-documents = []
-# Liste pour stocker les identifiants uniques de chaque document
-ids = []
-
-# ============================================================================
-# ÉTAPE 5: LECTURE ET TRAITEMENT DU FICHIER CSV
-# ============================================================================
-
-# Ouvrir le fichier CSV en mode lecture avec encodage ISO-8859-1
-# (pour gérer les caractères spéciaux comme les accents)
-with open(csv_file_path, mode="r", encoding="ISO-8859-1") as file:
-    # Créer un lecteur CSV qui interprète chaque ligne comme un dictionnaire
-    # Les clés sont les noms de colonnes, les valeurs sont les données
-    csv_reader = csv.DictReader(file, delimiter=",")
-    
-    # Afficher les noms des colonnes du fichier CSV
-    print("CSV columns: ", csv_reader.fieldnames)
-
-    # Parcourir chaque ligne du fichier CSV avec son index
-    for idx, row in enumerate(csv_reader):
-        # Exemple d'ancien format pour les diamants (commenté):
-        # document = f"Carat: {row['carat']}, Cut: {row['cut']}, Color: {row['color']}, Clarity: {row['clarity']}, Depth: {row['depth']}, Table: {row['table']}, Price: {row['price']}, Dimensions: ({row['x']} x {row['y']} x {row['z']})"
-        
-        # Formater les données de la ligne en une chaîne de texte descriptive
-        # Extrait le pays et sa population depuis le CSV
-        document = f"Country: {row['Country']}, Population: {row['Population']}"
-        
-        # Ajouter le document formaté à la liste
-        documents.append(document)
-        
-        # Générer un ID unique pour chaque document (id_0, id_1, id_2, etc.)
-        ids.append(f"id_{idx}")
-
-# ============================================================================
-# ÉTAPE 6: INSERTION DES DONNÉES DANS LA COLLECTION
-# ============================================================================
-
-# Utiliser upsert pour insérer ou mettre à jour les documents
-# upsert = "update" + "insert" (ajoute si nouveau, met à jour si existant)
-col.upsert(
-    documents=documents,  # Liste des documents textuels
-    ids=ids               # Liste des identifiants correspondants
+# ÉTAPE 4: SYNCHRONISATION INCRÉMENTALE DU FICHIER CSV
+# ============================================================================
+
+# Le fichier est lu ligne par ligne (générateur) : la mémoire reste constante
+# Chaque ligne est transformée en document grâce au modèle de texte
+# Pour diamonds.csv, utiliser MODELE_DIAMANTS et la colonne clé "" (index)
+# Les identifiants sont dérivés de la colonne clé (id_China, id_India, etc.) :
+# insérer une ligne au milieu du fichier ne décale plus les autres IDs
+# Seules les lignes nouvelles ou modifiées sont envoyées à upsert, les lignes
+# disparues du fichier sont supprimées de la collection
+# Pour retirer une fois les anciens documents id_0, id_1... écrits par la
+# version précédente de ce script, ajouter supprimer_positionnels=True
+stats = synchroniser_csv(
+    col,
+    csv_file_path,
+    MODELE_POPULATION,  # "Country: {Country}, Population: {Population}"
+    colonne_cle="Country",
+    client=client,
 )
 
 # ============================================================================
-# ÉTAPE 7: EFFECTUER UNE RECHERCHE SÉMANTIQUE
+# ÉTAPE 5: EFFECTUER UNE RECHERCHE SÉMANTIQUE
 # ============================================================================
 
 # Effectuer une requête de recherche par similarité sémantique
@@ -92,7 +72,7 @@ results = col.query(
 )
 
 # ============================================================================
-# ÉTAPE 8: AFFICHAGE DU RÉSULTAT
+# ÉTAPE 6: AFFICHAGE DU RÉSULTAT
 # ============================================================================
 
 # Afficher le premier document du premier résultat
@@ -0,0 +1,209 @@
+# ============================================================================
+# RECHERCHE EXACTE (FORCE BRUTE NUMPY) POUR LES PETITES COLLECTIONS
+# ============================================================================
+#
+# Les collections "personne", "Personne", "books" ou "voitures" ne contiennent
+# que quelques documents : l'index approximatif (HNSW) n'apporte rien. Ici :
+# - sous `seuil` documents, les embeddings sont gardés en mémoire et la
+#   recherche est un produit matrice-vecteur exact (top-k par argpartition)
+# - au-dessus, query() classique sur l'index HNSW
+# - valider() lance les deux recherches et mesure le rappel@k de l'index
+#   approximatif, pour régler ses paramètres (hnsw:ef_search, ...) sur des
+#   chiffres plutôt qu'à l'intuition
+# ============================================================================
+
+import time
+
+import numpy as np
+
+from outils_vecteurs import espace_de, fonction_embedding_de, top_k
+from parcours_collection import iterer_collection
+
+
+def _vecteurs_requetes(collection, query_texts, query_embeddings):
+    if query_embeddings is not None:
+        return np.asarray(query_embeddings, dtype=np.float32)
+    if isinstance(query_texts, str):
+        query_texts = [query_texts]
+    return np.asarray(fonction_embedding_de(collection)(query_texts), dtype=np.float32)
+
+
+class CollectionExacte:
+    """
+    Enveloppe une collection : recherche exacte sous `seuil` documents,
+    index HNSW au-dessus
+    """
+
+    def __init__(self, collection, seuil=1000):
+        self.collection = collection
+        self.seuil = seuil
+        self._contenu = None
+        self._nb_documents = None
+        # "exacte" ou "ann" : mode choisi par la dernière recherche
+        self.dernier_plan = None
+
+    def __getattr__(self, nom):
+        return getattr(self.collection, nom)
+
+    # ------------------------------------------------------------------------
+    # Écritures : le contenu gardé en mémoire est rechargé à la prochaine lecture
+    # ------------------------------------------------------------------------
+
+    def _invalider(self):
+        self._contenu = None
+        self._nb_documents = None
+
+    def add(self, **kwargs):
+        self._invalider()
+        return self.collection.add(**kwargs)
+
+    def upsert(self, **kwargs):
+        self._invalider()
+        return self.collection.upsert(**kwargs)
+
+    def update(self, **kwargs):
+        self._invalider()
+        return self.collection.update(**kwargs)
+
+    def delete(self, **kwargs):
+        self._invalider()
+        return self.collection.delete(**kwargs)
+
+    def _charger(self):
+        ids, documents, metadatas, vecteurs = [], [], [], []
+        for lot in iterer_collection(self.collection,
+                                     include=["documents", "metadatas", "embeddings"]):
+            ids.extend(lot["ids"])
+            documents.extend(lot["documents"])
+            metadatas.extend(lot["metadatas"])
+            vecteurs.append(lot["embeddings"])
+        matrice = np.vstack(vecteurs) if vecteurs else np.empty((0, 0), dtype=np.float32)
+        self._contenu = {"ids": ids, "documents": documents, "metadatas": metadatas,
+                         "embeddings": matrice}
+        self._nb_documents = len(ids)
+
+    def est_petite(self):
+        if self._nb_documents is None:
+            self._nb_documents = self.collection.count()
+        return self._nb_documents <= self.seuil
+
+    # ------------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------------
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None,
+              where_document=None, include=("documents", "metadatas", "distances")):
+        if not self.est_petite():
+            self.dernier_plan = "ann"
+            return self.collection.query(query_texts=query_texts,
+                                         query_embeddings=query_embeddings,
+                                         n_results=n_results, where=where,
+                                         where_document=where_document, include=list(include))
+
+        self.dernier_plan = "exacte"
+        if self._contenu is None:
+            self._charger()
+        contenu = self._contenu
+        requetes = _vecteurs_requetes(self.collection, query_texts, query_embeddings)
+
+        lignes = np.arange(len(contenu["ids"]))
+        if where or where_document:
+            retenus = set(self.collection.get(where=where, where_document=where_document,
+                                              include=[])["ids"])
+            lignes = np.array([i for i, id_document in enumerate(contenu["ids"])
+                               if id_document in retenus], dtype=np.int64)
+
+        resultat = {"ids": [], "distances": [], "documents": [], "metadatas": [],
+                    "embeddings": []}
+        if len(lignes):
+            indices, dist = top_k(requetes, contenu["embeddings"][lignes], n_results,
+                                  espace_de(self.collection))
+        else:
+            indices = dist = np.empty((len(requetes), 0))
+        for ligne_indices, ligne_distances in zip(indices, dist):
+            selection = lignes[ligne_indices.astype(np.int64)]
+            resultat["ids"].append([contenu["ids"][i] for i in selection])
+            resultat["distances"].append([float(d) for d in ligne_distances])
+            resultat["documents"].append([contenu["documents"][i] for i in selection])
+            resultat["metadatas"].append([contenu["metadatas"][i] for i in selection])
+            resultat["embeddings"].append(contenu["embeddings"][selection])
+        for cle in ("distances", "documents", "metadatas", "embeddings"):
+            if cle not in include:
+                resultat[cle] = None
+        return resultat
+
+    def valider(self, query_texts=None, query_embeddings=None, k=10):
+        return valider(self.collection, query_texts, query_embeddings, k)
+
+
+# ============================================================================
+# VALIDATION: RAPPEL@K DE L'INDEX HNSW PAR RAPPORT À LA RECHERCHE EXACTE
+# ============================================================================
+
+def valider(collection, query_texts=None, query_embeddings=None, k=10, taille_lot=5000):
+    """
+    Compare query() (HNSW) à la recherche exacte sur toute la collection
+
+    Renvoie le rappel@k moyen et minimal, et la latence moyenne des deux modes.
+    """
+    requetes = _vecteurs_requetes(collection, query_texts, query_embeddings)
+
+    debut = time.perf_counter()
+    ann = collection.query(query_embeddings=requetes, n_results=k, include=[])["ids"]
+    secondes_ann = time.perf_counter() - debut
+
+    ids, vecteurs = [], []
+    for lot in iterer_collection(collection, taille_lot, include=["embeddings"]):
+        ids.extend(lot["ids"])
+        vecteurs.append(lot["embeddings"])
+    matrice = np.vstack(vecteurs)
+    debut = time.perf_counter()
+    indices, _ = top_k(requetes, matrice, k, espace_de(collection))
+    secondes_exacte = time.perf_counter() - debut
+
+    rappels = [
+        len({ids[i] for i in exacts} & set(approches)) / len(exacts)
+        for exacts, approches in zip(indices, ann)
+    ]
+    configuration = getattr(collection, "configuration", None) or {}
+    return {
+        "documents": len(ids),
+        "requetes": len(requetes),
+        f"rappel@{k}": float(np.mean(rappels)),
+        "rappel_min": float(np.min(rappels)),
+        "latence_ann_ms": secondes_ann / len(requetes) * 1000,
+        "latence_exacte_ms": secondes_exacte / len(requetes) * 1000,
+        "hnsw": configuration.get("hnsw"),
+    }
+
+
+# ============================================================================
+# EXEMPLE: PETITE COLLECTION, PUIS VALIDATION SUR diamonds
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Recherche exacte et rappel de HNSW")
+    parser.add_argument("--valider", action="store_true",
+                        help="mesurer le rappel@k de HNSW sur la collection diamonds")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.valider:
+        client = chromadb.PersistentClient()
+        collection = client.get_collection(name="diamonds")
+        questions = [f"Diamant de {carat} carat, taille {taille}"
+                     for carat in (0.3, 0.5, 1.0, 1.5, 2.0)
+                     for taille in ("Ideal", "Premium", "Good", "Fair")]
+        print(valider(collection, questions, k=args.k))
+    else:
+        client = chromadb.Client()
+        collection = CollectionExacte(client.get_or_create_collection(name="voitures"))
+        collection.upsert(documents=["DavRos", "BMW", "VX", "RAV4"],
+                          ids=["id1", "id2", "id3", "id4"])
+        resultats = collection.query(query_texts="RAV4", n_results=1)
+        print(f"# Plan: {collection.dernier_plan}")
+        print(resultats["documents"][0][0])
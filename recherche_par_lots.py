@@ -0,0 +1,191 @@
+# ============================================================================
+# RECHERCHE PAR LOTS: PLUSIEURS QUESTIONS EN UN SEUL APPEL À query()
+# ============================================================================
+#
+# Au lieu d'un collection.query() par question (un embedding + un parcours
+# d'index à chaque fois), toutes les questions sont envoyées ensemble :
+# - un seul appel au modèle d'embedding pour toutes les questions
+# - un seul query() avec tous les query_texts
+# Le résultat est ensuite redécoupé question par question.
+#
+# MicroBatcherRecherche regroupe en plus les requêtes asyncio concurrentes
+# qui arrivent à quelques millisecondes d'intervalle.
+# ============================================================================
+
+import asyncio
+import functools
+import json
+
+INCLUDE_DEFAUT = ("documents", "metadatas", "distances")
+
+# Champs du résultat de query() qui contiennent une liste par requête
+CHAMPS_PAR_REQUETE = (
+    "ids", "embeddings", "documents", "uris", "data", "metadatas", "distances",
+)
+
+
+def decouper_resultats(resultats, nb_requetes):
+    """
+    Découpe le résultat d'un query() multiple en un résultat par requête
+
+    Chaque résultat garde la forme renvoyée par query() pour une seule
+    question : resultat['documents'][0] contient ses documents.
+    """
+    par_requete = []
+    for i in range(nb_requetes):
+        resultat = {}
+        for cle, valeur in resultats.items():
+            if cle in CHAMPS_PAR_REQUETE and valeur is not None:
+                resultat[cle] = [valeur[i]]
+            else:
+                resultat[cle] = valeur
+        par_requete.append(resultat)
+    return par_requete
+
+
+def fusionner_resultats(par_requete):
+    """
+    Opération inverse de decouper_resultats : un seul résultat multi-requêtes
+    """
+    resultats = {}
+    for resultat in par_requete:
+        for cle, valeur in resultat.items():
+            if cle in CHAMPS_PAR_REQUETE and valeur is not None:
+                resultats.setdefault(cle, []).extend(valeur)
+            else:
+                resultats.setdefault(cle, valeur)
+    return resultats
+
+
+def rechercher_contextes(collection, questions, n_results=3, where=None,
+                         where_document=None, include=INCLUDE_DEFAUT):
+    """
+    Recherche le contexte de plusieurs questions avec un seul query()
+    """
+    if not questions:
+        return []
+    parametres = {"query_texts": list(questions), "n_results": n_results,
+                  "include": list(include)}
+    if where:
+        parametres["where"] = where
+    if where_document:
+        parametres["where_document"] = where_document
+    resultats = collection.query(**parametres)
+    return decouper_resultats(resultats, len(questions))
+
+
+# ============================================================================
+# MICRO-BATCHING ASYNCHRONE
+# ============================================================================
+
+class MicroBatcherRecherche:
+    """
+    Regroupe les recherches concurrentes en un seul query()
+
+    Les questions arrivées pendant `delai_ms` (ou jusqu'à `taille_max`
+    questions) avec les mêmes paramètres partent dans le même lot.
+    """
+
+    def __init__(self, collection, delai_ms=5, taille_max=64, include=INCLUDE_DEFAUT):
+        self.collection = collection
+        self.delai = delai_ms / 1000
+        self.taille_max = taille_max
+        self.include = include
+        self._en_attente = {}
+        self._minuteurs = {}
+        # Lots en cours : la boucle ne garde qu'une référence faible aux tâches
+        self._taches = set()
+
+    async def rechercher(self, question, n_results=3, where=None, where_document=None):
+        """
+        Renvoie le contexte d'une question (même forme que query())
+        """
+        boucle = asyncio.get_running_loop()
+        cle = (n_results, json.dumps(where, sort_keys=True),
+               json.dumps(where_document, sort_keys=True))
+        future = boucle.create_future()
+        lot = self._en_attente.setdefault(cle, [])
+        lot.append((question, future))
+
+        if len(lot) >= self.taille_max:
+            self._lancer(cle)
+        elif len(lot) == 1:
+            self._minuteurs[cle] = boucle.call_later(self.delai, self._lancer, cle)
+        return await future
+
+    def _lancer(self, cle):
+        minuteur = self._minuteurs.pop(cle, None)
+        if minuteur is not None:
+            minuteur.cancel()
+        lot = self._en_attente.pop(cle, [])
+        if lot:
+            tache = asyncio.ensure_future(self._executer(cle, lot))
+            self._taches.add(tache)
+            tache.add_done_callback(functools.partial(self._terminer, lot))
+
+    def _terminer(self, lot, tache):
+        """
+        Fin d'un lot : les questions restées sans réponse reçoivent l'erreur
+        """
+        self._taches.discard(tache)
+        for _, future in lot:
+            if future.done():
+                continue
+            if tache.cancelled():
+                future.cancel()
+            else:
+                future.set_exception(tache.exception()
+                                     or RuntimeError("query() n'a pas renvoyé de résultat"))
+
+    async def _executer(self, cle, lot):
+        n_results, where, where_document = cle
+        questions = [question for question, _ in lot]
+        # query() est bloquant : il tourne dans le pool de threads par défaut
+        resultats = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: rechercher_contextes(
+                self.collection, questions, n_results,
+                where=json.loads(where), where_document=json.loads(where_document),
+                include=self.include,
+            ),
+        )
+        for (_, future), resultat in zip(lot, resultats):
+            if not future.done():
+                future.set_result(resultat)
+
+
+# ============================================================================
+# EXEMPLE
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    collection = client.get_or_create_collection(name="base_connaissances")
+    collection.upsert(
+        documents=[
+            "RAG combine la recherche et la génération pour créer des réponses précises",
+            "ChromaDB est une base de données vectorielle open-source",
+            "Les embeddings transforment le texte en vecteurs numériques",
+        ],
+        ids=["kb_0", "kb_1", "kb_2"],
+    )
+
+    questions = [
+        "Qu'est-ce qu'une base de données vectorielle?",
+        "Comment fonctionne un système RAG?",
+        "À quoi servent les embeddings?",
+    ]
+
+    # Appel synchrone : un seul query() pour les trois questions
+    for question, contexte in zip(questions, rechercher_contextes(collection, questions, 1)):
+        print(f"# {question} -> {contexte['documents'][0][0]}")
+
+    # Appels concurrents regroupés par le micro-batcher
+    async def demo():
+        batcher = MicroBatcherRecherche(collection, delai_ms=5)
+        return await asyncio.gather(*(batcher.rechercher(q, n_results=1) for q in questions))
+
+    for question, contexte in zip(questions, asyncio.run(demo())):
+        print(f"# (async) {question} -> {contexte['documents'][0][0]}")
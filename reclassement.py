@@ -0,0 +1,165 @@
+# ============================================================================
+# RECLASSEMENT PAR CROSS-ENCODER AVEC UN BUDGET DE LATENCE
+# ============================================================================
+#
+# La distance entre embeddings classe grossièrement : pour avoir un bon
+# contexte, il faut demander plus de documents, et le prompt envoyé au LLM
+# grossit. Ici :
+# 1. query() renvoie un ensemble plus large de candidats (n * facteur)
+# 2. un petit modèle local (cross-encoder, sur CPU) note chaque paire
+#    (question, document), par lots, dans un pool de threads
+# 3. seuls les n meilleurs sont gardés
+# Le reclassement a un budget en millisecondes : à l'échéance, seuls les
+# premiers lots (dans l'ordre des distances) notés sans interruption sont
+# reclassés ; les candidats suivants gardent l'ordre des distances, derrière.
+# Dans rechercher(), le temps de la sur-extraction est décompté du budget.
+# ============================================================================
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from recherche_par_lots import rechercher_contextes
+
+MODELE_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def cross_encoder(nom=MODELE_CROSS_ENCODER):
+    """
+    Fonction de score (question, document) -> float d'un CrossEncoder
+    """
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError as erreur:
+        raise ImportError(
+            "Le reclassement nécessite sentence-transformers: pip install sentence-transformers"
+        ) from erreur
+    modele = CrossEncoder(nom, device="cpu")
+    return lambda paires: [float(score) for score in modele.predict(paires)]
+
+
+class Reclasseur:
+    """
+    Reclasse des candidats en moins de `budget_ms` millisecondes
+
+    - noter : fonction(liste de (question, document)) -> liste de scores
+      (plus grand = plus pertinent) ; par défaut, cross_encoder()
+    - taille_lot : paires notées par appel au modèle
+    - facteur : nombre de candidats demandés = n_results * facteur
+    """
+
+    def __init__(self, noter=None, budget_ms=150, taille_lot=16, nb_workers=2, facteur=4):
+        self.noter = noter or cross_encoder()
+        self.budget = budget_ms / 1000
+        self.taille_lot = taille_lot
+        self.facteur = facteur
+        self.nb_workers = nb_workers
+        self.pool = ThreadPoolExecutor(max_workers=nb_workers)
+        # Nombre de candidats notés, durée, budget respecté... du dernier appel
+        self.dernier_rapport = None
+
+    def reclasser(self, question, documents, n, budget=None):
+        """
+        Positions (dans `documents`, rangés par distance) des n meilleurs
+
+        `budget` (en secondes) remplace self.budget pour cet appel.
+        """
+        debut = time.perf_counter()
+        budget = self.budget if budget is None else max(0, budget)
+        lots = {
+            self.pool.submit(self.noter, [(question, d) for d in documents[i:i + self.taille_lot]]): i
+            for i in range(0, len(documents), self.taille_lot)
+        }
+        termines, restants = wait(lots, timeout=budget)
+        en_cours = [future for future in restants if not future.cancel()]
+        if en_cours:
+            # Les lots pas encore commencés sont abandonnés ; ceux en cours ne
+            # s'interrompent pas : le pool est remplacé pour que leurs threads
+            # ne retardent pas l'appel suivant
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = ThreadPoolExecutor(max_workers=self.nb_workers)
+
+        # Un lot n'est utilisé que si tous les lots plus proches sont notés :
+        # sinon un lot lointain fini en premier passerait devant des
+        # candidats plus proches qui n'ont pas encore de score
+        scores = {}
+        for future in sorted(lots, key=lots.get):
+            if future not in termines or future.exception() is not None:
+                break
+            for decalage, score in enumerate(future.result()):
+                scores[lots[future] + decalage] = score
+        notes = sorted(scores, key=lambda position: scores[position], reverse=True)
+        non_notes = [position for position in range(len(documents)) if position not in scores]
+        self.dernier_rapport = {
+            "candidats": len(documents),
+            "notes": len(scores),
+            "millisecondes": (time.perf_counter() - debut) * 1000,
+            "complet": not non_notes,
+        }
+        return (notes + non_notes)[:n], [scores.get(p) for p in (notes + non_notes)[:n]]
+
+    def rechercher(self, collection, questions, n_results=3, where=None):
+        """
+        rechercher_contextes() avec sur-extraction puis reclassement
+
+        Chaque résultat a la forme de query() avec en plus "scores" (None pour
+        un candidat non noté dans le budget). La durée du query() groupé est
+        retirée du budget de reclassement de chaque question.
+        """
+        debut = time.perf_counter()
+        contextes = rechercher_contextes(collection, questions, n_results * self.facteur,
+                                         where=where)
+        duree_requete = time.perf_counter() - debut
+        resultats = []
+        for question, contexte in zip(questions, contextes):
+            positions, scores = self.reclasser(question, contexte["documents"][0], n_results,
+                                               budget=self.budget - duree_requete)
+            self.dernier_rapport["requete_ms"] = duree_requete * 1000
+            self.dernier_rapport["millisecondes"] += duree_requete * 1000
+            resultat = dict(contexte, scores=[scores])
+            for cle in ("ids", "documents", "metadatas", "distances"):
+                if contexte.get(cle) is not None:
+                    resultat[cle] = [[contexte[cle][0][p] for p in positions]]
+            resultats.append(resultat)
+        return resultats
+
+    def fermer(self):
+        """
+        Arrête le pool de threads (les lots en cours finissent en arrière-plan)
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    close = fermer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+# ============================================================================
+# EXEMPLE
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    collection = client.get_or_create_collection(name="base_connaissances")
+    collection.upsert(
+        documents=[
+            "RAG combine la recherche et la génération pour créer des réponses précises",
+            "ChromaDB est une base de données vectorielle open-source",
+            "Les embeddings transforment le texte en vecteurs numériques",
+            "La recherche sémantique permet de trouver des documents similaires par le sens",
+            "L'IA générative utilise des modèles de langage pour créer du contenu",
+        ],
+        ids=[f"kb_{i}" for i in range(5)],
+    )
+
+    with Reclasseur(budget_ms=200) as reclasseur:
+        question = "Qu'est-ce qu'une base de données vectorielle?"
+        resultat = reclasseur.rechercher(collection, [question], n_results=2)[0]
+        print(f"# {reclasseur.dernier_rapport}")
+    for document, score in zip(resultat["documents"][0], resultat["scores"][0]):
+        print(f"  - {document} (score: {score})")
@@ -0,0 +1,136 @@
+# ============================================================================
+# RÉSULTATS ALLÉGÉS: TABLEAUX NUMPY ET DOCUMENTS LUS À LA DEMANDE
+# ============================================================================
+#
+# query() et get() renvoient des listes Python imbriquées avec tout ce que
+# demande include : des milliers de floats et de dictionnaires sont créés
+# (et sérialisés en JSON avec HttpClient) pour n'en lire qu'un seul avec
+# results['documents'][0][0]. Ici :
+# - query() ne demande que les distances (et les embeddings si besoin)
+# - distances et embeddings sont des tableaux NumPy contigus (float32)
+# - documents et métadonnées ne sont lus (un seul get(ids)) qu'au premier
+#   accès, et seulement ceux des résultats
+# L'accès par clé (resultats["documents"][0][0]) reste possible.
+# ============================================================================
+
+import numpy as np
+
+
+class ResultatsNumpy:
+    """
+    Résultat de query_numpy() ou get_numpy()
+
+    - ids : liste d'ids par requête (une seule liste pour get_numpy)
+    - distances : tableau (nb_requetes, k), NaN quand une requête a moins de
+      k résultats (filtre where)
+    - embeddings : tableau (nb_requetes, k, dimension) ou (n, dimension)
+    - documents, metadatas : lus à la demande
+    """
+
+    def __init__(self, collection, ids, distances=None, embeddings=None, par_requete=True):
+        self.collection = collection
+        self.ids = ids
+        self.distances = distances
+        self.embeddings = embeddings
+        self.par_requete = par_requete
+        self._lus = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, cle):
+        if cle not in ("ids", "distances", "embeddings", "documents", "metadatas"):
+            raise KeyError(cle)
+        return getattr(self, cle)
+
+    def _lire(self, champ):
+        if champ not in self._lus:
+            listes = self.ids if self.par_requete else [self.ids]
+            tous = sorted({i for ids in listes for i in ids})
+            valeurs = {}
+            if tous:
+                lus = self.collection.get(ids=tous, include=[champ])
+                valeurs = dict(zip(lus["ids"], lus[champ]))
+            resultat = [[valeurs.get(i) for i in ids] for ids in listes]
+            self._lus[champ] = resultat if self.par_requete else resultat[0]
+        return self._lus[champ]
+
+    @property
+    def documents(self):
+        return self._lire("documents")
+
+    @property
+    def metadatas(self):
+        return self._lire("metadatas")
+
+
+def _en_tableau(listes, forme_element=()):
+    """
+    Listes de longueurs variables -> tableau float32 complété par des NaN
+    """
+    largeur = max((len(liste) for liste in listes), default=0)
+    tableau = np.full((len(listes), largeur, *forme_element), np.nan, dtype=np.float32)
+    for i, liste in enumerate(listes):
+        if len(liste):
+            tableau[i, :len(liste)] = np.asarray(liste, dtype=np.float32)
+    return tableau
+
+
+def query_numpy(collection, query_texts=None, query_embeddings=None, n_results=10,
+                where=None, where_document=None, embeddings=False):
+    """
+    query() ne renvoyant que les ids et les distances (et les embeddings si demandé)
+    """
+    parametres = {"n_results": n_results, "include": ["distances"]}
+    if embeddings:
+        parametres["include"].append("embeddings")
+    if query_embeddings is not None:
+        parametres["query_embeddings"] = query_embeddings
+    else:
+        parametres["query_texts"] = [query_texts] if isinstance(query_texts, str) else query_texts
+    if where:
+        parametres["where"] = where
+    if where_document:
+        parametres["where_document"] = where_document
+    brut = collection.query(**parametres)
+
+    vecteurs = None
+    if embeddings:
+        dimension = next((len(v[0]) for v in brut["embeddings"] if len(v)), 0)
+        vecteurs = _en_tableau(brut["embeddings"], (dimension,))
+    return ResultatsNumpy(collection, brut["ids"], _en_tableau(brut["distances"]), vecteurs)
+
+
+def get_numpy(collection, ids=None, where=None, where_document=None, limit=None, offset=None,
+              embeddings=True):
+    """
+    get() renvoyant les embeddings en un seul tableau (n, dimension)
+    """
+    brut = collection.get(ids=ids, where=where, where_document=where_document, limit=limit,
+                          offset=offset, include=["embeddings"] if embeddings else [])
+    vecteurs = None
+    if embeddings:
+        vecteurs = np.asarray(brut["embeddings"], dtype=np.float32)
+        if vecteurs.size == 0:
+            vecteurs = vecteurs.reshape(0, 0)
+    return ResultatsNumpy(collection, brut["ids"], embeddings=vecteurs, par_requete=False)
+
+
+# ============================================================================
+# EXEMPLE
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    client = chromadb.Client()
+    collection = client.get_or_create_collection(name="Personne")
+    collection.upsert(documents=["Salut, les amis de la Data !", "J'aime la Data Science."],
+                      ids=["id1", "id2"])
+
+    resultats = query_numpy(collection, ["Data", "voiture"], n_results=2)
+    print(resultats.distances)            # tableau (2, 2) float32
+    print(resultats["documents"][0][0])   # un seul get(ids) au premier accès
+
+    tous = get_numpy(collection)
+    print(tous.embeddings.shape, tous.embeddings.dtype)
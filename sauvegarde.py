@@ -0,0 +1,270 @@
+# ============================================================================
+# SAUVEGARDE ET RESTAURATION RAPIDES D'UNE COLLECTION
+# ============================================================================
+#
+# Copier le dossier d'un PersistentClient en service est lent (index HNSW,
+# pages libres du fichier SQLite...) et pas cohérent : une écriture peut
+# arriver au milieu de la copie. Ici, une collection est exportée dans une
+# archive (un dossier) :
+# - manifest.json : nom, métadonnées, configuration HNSW, dimension, liste
+#   des morceaux ; écrit en dernier, une archive sans manifest est incomplète
+# - embeddings_00000.npy, ... : float32 bruts, relisibles directement avec
+#   np.load(..., mmap_mode="r")
+# - textes_00000.jsonl.gz, ... : ids, documents et métadonnées compressés
+#
+# La restauration recharge les embeddings tels quels (rien n'est recalculé)
+# par gros add(), dans une collection temporaire qui ne remplace l'existante
+# qu'une fois l'archive entièrement relue. Chaque lot est lu d'un seul get(ids=...) : pour un
+# instantané exact de toute la collection, suspendre les écritures pendant
+# la sauvegarde.
+#
+#   python sauvegarde.py sauvegarder diamonds ./sauvegardes/diamonds
+#   python sauvegarde.py restaurer ./sauvegardes/diamonds --nom diamonds_replique
+# ============================================================================
+
+import gzip
+import json
+import os
+import time
+
+import numpy as np
+
+from ingestion_csv import par_lots
+from parcours_collection import iterer_collection, lister_ids
+
+FORMAT = 1
+MANIFEST = "manifest.json"
+SUFFIXE_RESTAURATION = "__restauration"
+
+
+def _fichiers_morceau(numero):
+    return f"embeddings_{numero:05d}.npy", f"textes_{numero:05d}.jsonl.gz"
+
+
+def _nom_fonction_embedding(collection):
+    configuration = collection.configuration or {}
+    fonction = configuration.get("embedding_function")
+    if fonction is None or not hasattr(fonction, "name"):
+        return None
+    return fonction.name()
+
+
+def _nom_fonction(fonction):
+    """
+    name() d'une fonction d'embedding, None si elle n'en déclare pas
+    """
+    try:
+        nom = fonction.name()
+    except Exception:
+        return None
+    return nom if isinstance(nom, str) else None
+
+
+# ============================================================================
+# SAUVEGARDE
+# ============================================================================
+
+def sauvegarder(collection, dossier, taille_morceau=10000, taille_lot=1000, niveau_gzip=3):
+    """
+    Exporte la collection dans `dossier`, renvoie le manifest
+
+    Les embeddings ne sont pas compressés : c'est ce qui permet de les relire
+    par memmap. niveau_gzip règle la compression des textes (1 = rapide).
+    """
+    debut = time.perf_counter()
+    os.makedirs(dossier, exist_ok=True)
+    if os.path.exists(os.path.join(dossier, MANIFEST)):
+        # L'ancienne archive n'est plus valable dès le premier morceau réécrit
+        os.remove(os.path.join(dossier, MANIFEST))
+
+    configuration = collection.configuration or {}
+    manifest = {
+        "format": FORMAT,
+        "collection": collection.name,
+        "metadata": collection.metadata,
+        "hnsw": configuration.get("hnsw"),
+        "fonction_embedding": _nom_fonction_embedding(collection),
+        "dimension": None,
+        "nb_documents": 0,
+        "morceaux": [],
+    }
+    ids = lister_ids(collection)
+    for numero, ids_morceau in enumerate(par_lots(ids, taille_morceau)):
+        fichier_embeddings, fichier_textes = _fichiers_morceau(numero)
+        embeddings = None
+        lignes = 0
+        with gzip.open(os.path.join(dossier, fichier_textes), "wt", encoding="utf-8",
+                       compresslevel=niveau_gzip) as textes:
+            for lot in iterer_collection(collection, taille_lot, ids=ids_morceau, include=(
+                    "documents", "metadatas", "embeddings")):
+                if not lot["ids"]:
+                    # Tout le lot a été supprimé depuis lister_ids()
+                    continue
+                if embeddings is None:
+                    manifest["dimension"] = lot["embeddings"].shape[1]
+                    embeddings = np.lib.format.open_memmap(
+                        os.path.join(dossier, fichier_embeddings), mode="w+",
+                        dtype=np.float32, shape=(len(ids_morceau), manifest["dimension"]),
+                    )
+                # Un id supprimé depuis lister_ids() n'est plus renvoyé par get() :
+                # les lignes en trop en fin de fichier sont ignorées à la lecture
+                embeddings[lignes:lignes + len(lot["ids"])] = lot["embeddings"]
+                lignes += len(lot["ids"])
+                for i, id_document in enumerate(lot["ids"]):
+                    textes.write(json.dumps({
+                        "id": id_document,
+                        "document": lot["documents"][i],
+                        "metadata": lot["metadatas"][i],
+                    }, ensure_ascii=False) + "\n")
+        if embeddings is None:
+            # Morceau entièrement supprimé : ni .npy ni entrée dans le manifest
+            for fichier in (fichier_textes, fichier_embeddings):
+                if os.path.exists(os.path.join(dossier, fichier)):
+                    os.remove(os.path.join(dossier, fichier))
+            continue
+        embeddings.flush()
+        del embeddings
+        manifest["morceaux"].append({"embeddings": fichier_embeddings,
+                                     "textes": fichier_textes, "lignes": lignes})
+        manifest["nb_documents"] += lignes
+
+    manifest["secondes"] = time.perf_counter() - debut
+    temporaire = os.path.join(dossier, MANIFEST + ".tmp")
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        json.dump(manifest, fichier, ensure_ascii=False, indent=2)
+    os.replace(temporaire, os.path.join(dossier, MANIFEST))
+    return manifest
+
+
+# ============================================================================
+# LECTURE D'UNE ARCHIVE
+# ============================================================================
+
+def lire_manifest(dossier):
+    chemin = os.path.join(dossier, MANIFEST)
+    if not os.path.exists(chemin):
+        raise FileNotFoundError(f"Pas de {MANIFEST} dans {dossier} (sauvegarde incomplète ?)")
+    with open(chemin, encoding="utf-8") as fichier:
+        manifest = json.load(fichier)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"Format d'archive non pris en charge: {manifest.get('format')!r}")
+    return manifest
+
+
+def iterer_archive(dossier, manifest=None):
+    """
+    Générateur de morceaux {"ids", "documents", "metadatas", "embeddings"}
+
+    Les embeddings sont des memmap : ils ne sont lus du disque qu'à l'usage.
+    """
+    manifest = manifest or lire_manifest(dossier)
+    for morceau in manifest["morceaux"]:
+        ids, documents, metadatas = [], [], []
+        with gzip.open(os.path.join(dossier, morceau["textes"]), "rt", encoding="utf-8") as textes:
+            for ligne in textes:
+                element = json.loads(ligne)
+                ids.append(element["id"])
+                documents.append(element["document"])
+                metadatas.append(element["metadata"])
+        embeddings = np.load(os.path.join(dossier, morceau["embeddings"]), mmap_mode="r")
+        yield {
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+            "embeddings": embeddings[:morceau["lignes"]],
+        }
+
+
+# ============================================================================
+# RESTAURATION
+# ============================================================================
+
+def restaurer(client, dossier, nom=None, embedding_function=None, remplacer=False,
+              taille_lot=5000):
+    """
+    Recrée la collection sauvegardée (sous `nom`, par défaut son nom d'origine)
+
+    embedding_function : fonction utilisée ensuite pour les nouvelles
+    questions et écritures ; elle doit être celle de la sauvegarde
+    (manifest["fonction_embedding"]), les embeddings n'étant pas recalculés.
+    Sans embedding_function, la fonction par défaut doit être celle de la
+    sauvegarde. Une collection existante (remplacer=True) n'est supprimée
+    qu'après le chargement complet de l'archive.
+    """
+    debut = time.perf_counter()
+    manifest = lire_manifest(dossier)
+    nom = nom or manifest["collection"]
+    attendue = manifest.get("fonction_embedding")
+    fournie = "default" if embedding_function is None else _nom_fonction(embedding_function)
+    if attendue and fournie and fournie != attendue:
+        raise ValueError(f"L'archive a été calculée avec la fonction d'embedding {attendue!r}, "
+                         f"pas {fournie!r} : passer embedding_function")
+    noms = [c.name for c in client.list_collections()]
+    existe = nom in noms
+    if existe and not remplacer:
+        raise ValueError(f"La collection {nom!r} existe déjà (remplacer=True pour l'écraser)")
+    nom_temporaire = nom + SUFFIXE_RESTAURATION
+    if nom_temporaire in noms:
+        # Reste d'une restauration interrompue
+        client.delete_collection(nom_temporaire)
+
+    parametres = {}
+    if embedding_function is not None:
+        parametres["embedding_function"] = embedding_function
+    if manifest["metadata"]:
+        parametres["metadata"] = manifest["metadata"]
+    if manifest["hnsw"]:
+        parametres["configuration"] = {"hnsw": manifest["hnsw"]}
+    collection = client.create_collection(name=nom_temporaire, **parametres)
+
+    taille_lot = min(taille_lot, client.get_max_batch_size())
+    try:
+        for morceau in iterer_archive(dossier, manifest):
+            for position in range(0, len(morceau["ids"]), taille_lot):
+                fin = position + taille_lot
+                collection.add(
+                    ids=morceau["ids"][position:fin],
+                    documents=morceau["documents"][position:fin],
+                    metadatas=morceau["metadatas"][position:fin],
+                    embeddings=np.ascontiguousarray(morceau["embeddings"][position:fin]),
+                )
+    except BaseException:
+        # Archive illisible : la collection existante reste intacte
+        client.delete_collection(nom_temporaire)
+        raise
+
+    if existe:
+        client.delete_collection(nom)
+    collection.modify(name=nom)
+    return collection, time.perf_counter() - debut
+
+
+# ============================================================================
+# EXEMPLE: RÉPLIQUE DE LA COLLECTION diamonds
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    from maintenance import taille_dossier
+
+    parser = argparse.ArgumentParser(description="Sauvegarde / restauration d'une collection")
+    parser.add_argument("action", choices=["sauvegarder", "restaurer"])
+    parser.add_argument("source", help="collection à sauvegarder, ou archive à restaurer")
+    parser.add_argument("archive", nargs="?", help="dossier de l'archive (sauvegarder)")
+    parser.add_argument("--nom", help="nom de la collection restaurée")
+    parser.add_argument("--remplacer", action="store_true")
+    parser.add_argument("--chemin", default="./chroma")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chemin)
+    if args.action == "sauvegarder":
+        archive = args.archive or os.path.join("sauvegardes", args.source)
+        manifest = sauvegarder(client.get_collection(args.source), archive)
+        print(f"# {manifest['nb_documents']} documents sauvegardés en {manifest['secondes']:.1f} s "
+              f"({taille_dossier(archive) / 1e6:.1f} Mo, {len(manifest['morceaux'])} morceaux)")
+    else:
+        collection, secondes = restaurer(client, args.source, args.nom, remplacer=args.remplacer)
+        print(f"# {collection.name}: {collection.count()} documents restaurés en {secondes:.1f} s")
@@ -0,0 +1,226 @@
+# ============================================================================
+# SERVEUR DE RECHERCHE RÉSIDENT (HTTP LOCAL)
+# ============================================================================
+#
+# main2.py et main3.py posent une seule question puis s'arrêtent : chaque
+# question paie la création du client, le chargement du modèle et l'upsert
+# des documents. Ici, un processus résident :
+# - charge les collections et le modèle une seule fois (modèle préchauffé)
+# - répond en HTTP sur 127.0.0.1 (JSON), avec un pool borné de threads
+# - regroupe les questions concurrentes en un seul query() (un seul appel
+#   au modèle d'embedding) grâce à MicroBatcherRecherche
+#
+#   POST /query  {"collection": "books", "question": "...", "n_results": 1}
+#   GET  /sante  -> nombre de documents de chaque collection
+#
+# charge_serveur.py génère de la charge et mesure QPS et latences.
+# ============================================================================
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from outils_vecteurs import fonction_embedding_de
+from recherche_par_lots import MicroBatcherRecherche
+
+
+class ServeurHTTPPool(HTTPServer):
+    """
+    HTTPServer dont les requêtes sont traitées par un pool borné de threads
+    """
+
+    # File d'attente du socket : au-delà, les connexions refusées attendent 1 s
+    request_queue_size = 128
+
+    def __init__(self, adresse, gestionnaire, nb_workers):
+        super().__init__(adresse, gestionnaire)
+        self.pool = ThreadPoolExecutor(max_workers=nb_workers)
+        self.en_attente = 0
+        self._verrou = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._verrou:
+            self.en_attente += 1
+        self.pool.submit(self._traiter, request, client_address)
+
+    def _traiter(self, request, client_address):
+        with self._verrou:
+            self.en_attente -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class GestionnaireRecherche(BaseHTTPRequestHandler):
+    # HTTP/1.1 : les clients peuvent réutiliser leur connexion (keep-alive)
+    protocol_version = "HTTP/1.1"
+    # Réponses courtes : pas d'attente de Nagle entre en-têtes et corps
+    disable_nagle_algorithm = True
+
+    def _repondre(self, code, contenu):
+        corps = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        if self.server.en_attente:
+            # Des connexions attendent un thread libre : celle-ci lui laisse la place
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_GET(self):
+        if self.path == "/sante":
+            self._repondre(200, self.server.recherche.sante())
+        else:
+            self._repondre(404, {"erreur": f"Chemin inconnu: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/query":
+            self._repondre(404, {"erreur": f"Chemin inconnu: {self.path}"})
+            return
+        try:
+            longueur = int(self.headers.get("Content-Length", 0))
+            demande = json.loads(self.rfile.read(longueur) or b"{}")
+            resultat = self.server.recherche.rechercher(
+                demande["collection"], demande["question"],
+                n_results=demande.get("n_results", 3), where=demande.get("where"),
+            )
+        except KeyError as erreur:
+            self._repondre(400, {"erreur": f"Champ ou collection inconnu: {erreur}"})
+        except Exception as erreur:
+            self._repondre(500, {"erreur": str(erreur)})
+        else:
+            self._repondre(200, resultat)
+
+    def log_message(self, format, *args):
+        # Pas une ligne de journal par requête : le serveur doit rester rapide
+        pass
+
+
+class ServeurRecherche:
+    """
+    Collections chargées une fois, servies en HTTP avec micro-batching
+
+    - collections : dictionnaire {nom: collection}
+    - nb_workers : threads qui traitent les requêtes HTTP
+    - delai_ms, taille_max : regroupement des questions (MicroBatcherRecherche)
+    """
+
+    def __init__(self, collections, hote="127.0.0.1", port=8765, nb_workers=16,
+                 delai_ms=5, taille_max=64, timeout=30):
+        self.collections = collections
+        self.timeout = timeout
+        self.boucle = asyncio.new_event_loop()
+        self._thread_boucle = threading.Thread(target=self.boucle.run_forever, daemon=True)
+        self.batchers = {
+            nom: MicroBatcherRecherche(collection, delai_ms=delai_ms, taille_max=taille_max)
+            for nom, collection in collections.items()
+        }
+        self.http = ServeurHTTPPool((hote, port), GestionnaireRecherche, nb_workers)
+        self.http.recherche = self
+        self._thread_http = None
+
+    @property
+    def adresse(self):
+        hote, port = self.http.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    def prechauffer(self):
+        """
+        Charge le modèle d'embedding avant la première vraie question
+        """
+        for collection in self.collections.values():
+            fonction_embedding_de(collection)(["préchauffage"])
+
+    def rechercher(self, nom, question, n_results=3, where=None):
+        """
+        Appelé depuis les threads HTTP : la recherche passe par le micro-batcher
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.batchers[nom].rechercher(question, n_results=n_results, where=where),
+            self.boucle,
+        )
+        return future.result(self.timeout)
+
+    def sante(self):
+        return {"collections": {nom: c.count() for nom, c in self.collections.items()}}
+
+    def demarrer(self):
+        """
+        Démarre le serveur en arrière-plan (voir aussi servir())
+        """
+        self._thread_boucle.start()
+        self._thread_http = threading.Thread(target=self.http.serve_forever, daemon=True)
+        self._thread_http.start()
+        return self
+
+    def servir(self):
+        """
+        Démarre le serveur et bloque jusqu'à Ctrl+C
+        """
+        self._thread_boucle.start()
+        try:
+            self.http.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.arreter()
+
+    def arreter(self):
+        if self._thread_http is not None:
+            self.http.shutdown()
+        self.http.server_close()
+        self.boucle.call_soon_threadsafe(self.boucle.stop)
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+
+# ============================================================================
+# EXEMPLE: LIVRES (main2.py) ET VOITURES (main3.py) SERVIS EN CONTINU
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    import chromadb
+
+    from cache_embeddings import cache_pour_client
+
+    parser = argparse.ArgumentParser(description="Serveur de recherche résident")
+    parser.add_argument("--chemin", default="./chroma")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--delai-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chemin)
+    fonction = cache_pour_client(args.chemin)
+    livres = client.get_or_create_collection(name="books", embedding_function=fonction)
+    livres.upsert(
+        documents=["Livre Python à 50 €", "Livre R à 15 €", "Livre Java 49 €",
+                   "Livre JavaScript à 18 €"],
+        ids=["id1", "id2", "id3", "id4"],
+    )
+    voitures = client.get_or_create_collection(name="voitures", embedding_function=fonction)
+    voitures.upsert(documents=["DavRos", "BMW", "VX", "RAV4"],
+                    ids=["id1", "id2", "id3", "id4"])
+
+    serveur = ServeurRecherche({"books": livres, "voitures": voitures}, port=args.port,
+                               nb_workers=args.workers, delai_ms=args.delai_ms)
+    serveur.prechauffer()
+    print(f"# Serveur prêt sur {serveur.adresse} (Ctrl+C pour arrêter)")
+    serveur.servir()
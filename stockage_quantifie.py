@@ -0,0 +1,613 @@
+# ============================================================================
+# STOCKAGE QUANTIFIÉ DES EMBEDDINGS (INT8 OU PRODUCT QUANTIZATION)
+# ============================================================================
+#
+# Un embedding float32 de dimension 384 occupe 1536 octets. Ce mode de
+# collection (optionnel) garde en mémoire une version compressée :
+# - "int8" : 1 octet par dimension + une échelle par vecteur (~4x moins)
+# - "pq"   : product quantization, `nb_sous_espaces` octets par vecteur
+#            (ex. 48 octets, ~32x moins)
+# La recherche grossière se fait sur ces codes, puis les meilleurs candidats
+# sont reclassés avec les vecteurs exacts lus dans un fichier float32
+# memory-mappé (seules les lignes des candidats sont lues sur le disque).
+# Les centroïdes PQ ne sont appris qu'à partir de `taille_entrainement`
+# vecteurs (entrainer() les réapprend à la demande) ; avant, la recherche est
+# exacte. Tout est écrit en ajout seul au fil des upsert.
+#
+# ChromaDB ne sait pas stocker des vecteurs int8 : dans ce mode, la
+# collection ChromaDB ne sert qu'aux ids, documents et métadonnées (avec un
+# embedding factice de dimension 1), et les vecteurs vivent dans `dossier`.
+# Les méthodes de Collection non réécrites ici (modify, fork...) lèvent
+# NotImplementedError au lieu de s'appliquer à ces embeddings factices.
+# ============================================================================
+
+import json
+import os
+import time
+
+import numpy as np
+
+from outils_vecteurs import distances, top_k
+
+# Embedding factice stocké dans ChromaDB (les vrais vecteurs sont à côté)
+EMBEDDING_FACTICE = [0.0]
+
+# Lignes traitées à la fois pendant la recherche grossière (mémoire bornée)
+TAILLE_BLOC = 8192
+
+# Attributs de la collection ChromaDB qui ne dépendent pas des embeddings
+ATTRIBUTS_DELEGUES = ("name", "id", "metadata", "configuration", "tenant", "database")
+
+
+# ============================================================================
+# QUANTIFICATEURS
+# ============================================================================
+
+class QuantifieurInt8:
+    """
+    Quantification scalaire symétrique : x ≈ codes * echelle / 127
+    """
+
+    octets_par_vecteur_fixes = 4  # l'échelle float32
+
+    def encoder(self, vecteurs):
+        echelles = np.maximum(np.abs(vecteurs).max(axis=1), 1e-12).astype(np.float32)
+        codes = np.round(vecteurs / echelles[:, None] * 127).astype(np.int8)
+        return codes, echelles
+
+    def produits_scalaires(self, requete, codes, echelles):
+        # Produit scalaire approché entre la requête et chaque vecteur codé
+        return (codes.astype(np.float32) @ requete) * (echelles / 127)
+
+
+class QuantifieurPQ:
+    """
+    Product quantization : chaque sous-vecteur est remplacé par l'indice du
+    centroïde le plus proche (k-means appris par sous-espace)
+    """
+
+    octets_par_vecteur_fixes = 0
+
+    def __init__(self, nb_sous_espaces=48, nb_centroides=256, iterations=15, graine=0):
+        self.nb_sous_espaces = nb_sous_espaces
+        self.nb_centroides = nb_centroides
+        self.iterations = iterations
+        self.graine = graine
+        self.centroides = None
+
+    def entrainer(self, vecteurs):
+        dimension = vecteurs.shape[1]
+        if dimension % self.nb_sous_espaces:
+            raise ValueError(
+                f"La dimension {dimension} n'est pas divisible par {self.nb_sous_espaces}"
+            )
+        generateur = np.random.default_rng(self.graine)
+        echantillon = vecteurs[generateur.permutation(len(vecteurs))[:20000]]
+        k = min(self.nb_centroides, len(echantillon))
+        self.centroides = []
+        for sous_vecteurs in np.split(echantillon, self.nb_sous_espaces, axis=1):
+            centroides = sous_vecteurs[generateur.choice(len(sous_vecteurs), k, replace=False)]
+            for _ in range(self.iterations):
+                affectation = distances(sous_vecteurs, centroides).argmin(axis=1)
+                sommes = np.zeros_like(centroides)
+                np.add.at(sommes, affectation, sous_vecteurs)
+                effectifs = np.bincount(affectation, minlength=k)
+                # Un centroïde sans membre garde sa position précédente
+                non_vides = effectifs > 0
+                centroides[non_vides] = sommes[non_vides] / effectifs[non_vides, None]
+            self.centroides.append(centroides.astype(np.float32))
+        self.centroides = np.stack(self.centroides)
+
+    def encoder(self, vecteurs):
+        if self.centroides is None:
+            self.entrainer(vecteurs)
+        codes = np.stack([
+            distances(sous_vecteurs, centroides).argmin(axis=1)
+            for sous_vecteurs, centroides in zip(
+                np.split(vecteurs, self.nb_sous_espaces, axis=1), self.centroides)
+        ], axis=1).astype(np.uint8)
+        return codes, np.ones(len(vecteurs), dtype=np.float32)
+
+    def produits_scalaires(self, requete, codes, echelles):
+        # Table (sous-espace, centroïde) des produits scalaires partiels (ADC)
+        table = np.einsum(
+            "md,mkd->mk", requete.reshape(self.nb_sous_espaces, -1), self.centroides
+        )
+        return table[np.arange(self.nb_sous_espaces), codes].sum(axis=1)
+
+
+# ============================================================================
+# COLLECTION QUANTIFIÉE
+# ============================================================================
+
+class CollectionQuantifiee:
+    """
+    Collection dont les embeddings sont stockés quantifiés (int8 ou PQ)
+
+    - mode : "int8" ou "pq"
+    - facteur_reclassement : nombre de candidats reclassés = n_results * facteur
+    - espace : "l2", "cosine" ou "ip" (comme hnsw:space)
+    - taille_entrainement (pq) : nombre de vecteurs à partir duquel les
+      centroïdes sont appris ; avant, la recherche est exacte
+    """
+
+    def __init__(self, client, nom, dossier, mode="int8", facteur_reclassement=10,
+                 espace="l2", fonction_embedding=None, taille_entrainement=10000,
+                 **options_pq):
+        from outils_vecteurs import fonction_embedding_de
+
+        self.collection = client.get_or_create_collection(
+            nom, metadata={"stockage": f"quantifie_{mode}"}
+        )
+        self.fonction_embedding = fonction_embedding or fonction_embedding_de(self.collection)
+        self.mode = mode
+        self.facteur_reclassement = facteur_reclassement
+        self.espace = espace
+        self.taille_entrainement = taille_entrainement
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+        self.chemin_vecteurs = os.path.join(dossier, "vecteurs.f32")
+        if mode == "int8":
+            self.quantifieur = QuantifieurInt8()
+        elif mode == "pq":
+            self.quantifieur = QuantifieurPQ(**options_pq)
+        else:
+            raise ValueError(f"Mode inconnu: {mode!r} (attendu: 'int8' ou 'pq')")
+
+        # Lignes 0..nb_lignes des tableaux ; la capacité au-delà est libre
+        self.ids = []
+        self.positions = {}
+        self.dimension = None
+        self.nb_lignes = 0
+        self.codes = None
+        self.echelles = np.zeros(0, dtype=np.float32)
+        self.normes = np.zeros(0, dtype=np.float32)
+        self.vivants = np.zeros(0, dtype=bool)
+        self._memmap = None
+        self._charger()
+
+    def __getattr__(self, nom):
+        if nom in ATTRIBUTS_DELEGUES:
+            return getattr(self.collection, nom)
+        if nom != "collection" and hasattr(self.collection, nom):
+            # La collection ChromaDB ne contient que des embeddings factices
+            raise NotImplementedError(f"{nom}() n'est pas pris en charge par "
+                                      f"CollectionQuantifiee")
+        raise AttributeError(nom)
+
+    @property
+    def entraine(self):
+        return self.mode == "int8" or self.quantifieur.centroides is not None
+
+    # ------------------------------------------------------------------------
+    # Persistance : fichiers en ajout seul + journal des ids
+    # ------------------------------------------------------------------------
+    #
+    # vecteurs.f32, codes.bin, echelles.f32 et normes.f32 ont une ligne par
+    # vecteur écrit ; journal.jsonl contient ["+", id] pour chaque ligne et
+    # ["-", id] pour chaque suppression. Le journal est écrit en dernier :
+    # après un arrêt brutal, les lignes sans entrée de journal sont ignorées.
+    # entrainer() écrit centroides.npy.tmp et codes.bin.tmp, puis les met en
+    # place dans cet ordre : le remplacement des centroïdes valide le
+    # nouvel entraînement, et codes.bin est terminé au chargement suivant.
+
+    def _chemin(self, nom):
+        return os.path.join(self.dossier, nom)
+
+    def _largeur_codes(self):
+        return self.dimension if self.mode == "int8" else self.quantifieur.nb_sous_espaces
+
+    def _type_codes(self):
+        return np.int8 if self.mode == "int8" else np.uint8
+
+    def _ecrire_etat(self):
+        with open(self._chemin("etat.json"), "w", encoding="utf-8") as fichier:
+            json.dump({"dimension": self.dimension, "mode": self.mode}, fichier)
+
+    def _charger(self):
+        if not os.path.exists(self._chemin("etat.json")):
+            return
+        with open(self._chemin("etat.json"), encoding="utf-8") as fichier:
+            etat = json.load(fichier)
+        if etat["mode"] != self.mode:
+            raise ValueError(f"{self.dossier} contient un stockage {etat['mode']!r}, "
+                             f"pas {self.mode!r}")
+        self.dimension = etat["dimension"]
+        if os.path.exists(self._chemin("centroides.npy.tmp")):
+            # Entraînement interrompu avant sa validation : l'ancien état reste
+            for nom in ("centroides.npy.tmp", "codes.bin.tmp"):
+                if os.path.exists(self._chemin(nom)):
+                    os.remove(self._chemin(nom))
+        elif os.path.exists(self._chemin("codes.bin.tmp")):
+            # Centroïdes déjà remplacés : les codes correspondants sont complets
+            os.replace(self._chemin("codes.bin.tmp"), self._chemin("codes.bin"))
+        if self.mode == "pq" and os.path.exists(self._chemin("centroides.npy")):
+            self.quantifieur.centroides = np.load(self._chemin("centroides.npy"))
+
+        fichiers = {
+            "vecteurs.f32": 4 * self.dimension,
+            "codes.bin": self._largeur_codes(),
+            "echelles.f32": 4,
+            "normes.f32": 4,
+        }
+        nb_complets = min(
+            os.path.getsize(self._chemin(nom)) // largeur if os.path.exists(self._chemin(nom))
+            else 0
+            for nom, largeur in fichiers.items()
+        )
+        lignes_journal, supprimes = [], []
+        if os.path.exists(self._chemin("journal.jsonl")):
+            with open(self._chemin("journal.jsonl"), encoding="utf-8") as fichier:
+                for ligne in fichier:
+                    try:
+                        operation, id_document = json.loads(ligne)
+                    except ValueError:
+                        break
+                    if operation == "+" and len(self.ids) >= nb_complets:
+                        break
+                    lignes_journal.append(ligne)
+                    if operation == "+":
+                        self.ids.append(id_document)
+                    else:
+                        supprimes.append((len(self.ids), id_document))
+
+        # Lignes ou entrées de journal d'un ajout interrompu : retirées
+        self.nb_lignes = len(self.ids)
+        for nom, largeur in fichiers.items():
+            with open(self._chemin(nom), "ab"):
+                pass
+            os.truncate(self._chemin(nom), self.nb_lignes * largeur)
+        with open(self._chemin("journal.jsonl"), "w", encoding="utf-8") as fichier:
+            fichier.writelines(lignes_journal)
+
+        self.codes = np.fromfile(self._chemin("codes.bin"), dtype=self._type_codes()).reshape(
+            self.nb_lignes, self._largeur_codes())
+        self.echelles = np.fromfile(self._chemin("echelles.f32"), dtype=np.float32)
+        self.normes = np.fromfile(self._chemin("normes.f32"), dtype=np.float32)
+        self.vivants = np.zeros(self.nb_lignes, dtype=bool)
+        suppression = iter(supprimes)
+        prochaine = next(suppression, None)
+        for ligne, id_document in enumerate(self.ids):
+            # Les suppressions sont rejouées à leur place dans le journal
+            while prochaine is not None and prochaine[0] <= ligne:
+                self._marquer_supprime(prochaine[1])
+                prochaine = next(suppression, None)
+            if id_document in self.positions:
+                self.vivants[self.positions[id_document]] = False
+            self.positions[id_document] = ligne
+            self.vivants[ligne] = True
+        while prochaine is not None:
+            self._marquer_supprime(prochaine[1])
+            prochaine = next(suppression, None)
+
+    def _marquer_supprime(self, id_document):
+        ligne = self.positions.pop(id_document, None)
+        if ligne is not None:
+            self.vivants[ligne] = False
+
+    def _journaliser(self, operation, ids):
+        with open(self._chemin("journal.jsonl"), "a", encoding="utf-8") as fichier:
+            fichier.writelines(json.dumps([operation, i], ensure_ascii=False) + "\n"
+                               for i in ids)
+
+    def _vecteurs_exacts(self, lignes):
+        """
+        Vecteurs float32 exacts des lignes demandées (lues dans l'ordre du fichier)
+        """
+        if self._memmap is None or self._memmap.shape[0] < self.nb_lignes:
+            self._memmap = np.memmap(self.chemin_vecteurs, dtype=np.float32, mode="r",
+                                     shape=(self.nb_lignes, self.dimension))
+        lignes = np.sort(lignes)
+        return np.asarray(self._memmap[lignes]), lignes
+
+    # ------------------------------------------------------------------------
+    # Écritures
+    # ------------------------------------------------------------------------
+
+    def _preparer(self, vecteurs):
+        vecteurs = np.asarray(vecteurs, dtype=np.float32)
+        if self.espace == "cosine":
+            vecteurs = vecteurs / np.maximum(
+                np.linalg.norm(vecteurs, axis=1, keepdims=True), 1e-12)
+        return vecteurs
+
+    def _agrandir(self, nb_nouvelles):
+        """
+        Capacité des tableaux doublée si besoin : ajout en O(1) amorti
+        """
+        besoin = self.nb_lignes + nb_nouvelles
+        if self.codes is not None and besoin <= len(self.vivants):
+            return
+        capacite = max(1024, besoin, 2 * len(self.vivants))
+
+        def agrandi(tableau, forme, type_):
+            nouveau = np.zeros(forme, dtype=type_)
+            if tableau is not None:
+                nouveau[:self.nb_lignes] = tableau[:self.nb_lignes]
+            return nouveau
+
+        self.codes = agrandi(self.codes, (capacite, self._largeur_codes()), self._type_codes())
+        self.echelles = agrandi(self.echelles, capacite, np.float32)
+        self.normes = agrandi(self.normes, capacite, np.float32)
+        self.vivants = agrandi(self.vivants, capacite, bool)
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        # Un id répété dans le lot : seule sa dernière occurrence est gardée
+        dernieres = list({id_document: p for p, id_document in enumerate(ids)}.values())
+        if len(dernieres) < len(ids):
+            ids = [ids[p] for p in dernieres]
+            documents = None if documents is None else [documents[p] for p in dernieres]
+            embeddings = None if embeddings is None else [embeddings[p] for p in dernieres]
+            metadatas = None if metadatas is None else [metadatas[p] for p in dernieres]
+        if embeddings is None:
+            embeddings = self.fonction_embedding(documents)
+        self._ajouter_lignes(ids, embeddings)
+
+        parametres = {"ids": list(ids), "embeddings": [EMBEDDING_FACTICE] * len(ids)}
+        if documents is not None:
+            parametres["documents"] = documents
+        if metadatas is not None:
+            parametres["metadatas"] = metadatas
+        self.collection.upsert(**parametres)
+        if not self.entraine and self.count() >= self.taille_entrainement:
+            self.entrainer()
+
+    add = upsert
+
+    def update(self, ids, documents=None, embeddings=None, metadatas=None):
+        """
+        Comme Collection.update : les ids absents sont ignorés, et un nouveau
+        document (ou embedding) est recalculé puis requantifié
+        """
+        positions = [p for p, id_document in enumerate(ids) if id_document in self.positions]
+        if not positions:
+            return
+        ids = [ids[p] for p in positions]
+        documents = None if documents is None else [documents[p] for p in positions]
+        embeddings = None if embeddings is None else [embeddings[p] for p in positions]
+        metadatas = None if metadatas is None else [metadatas[p] for p in positions]
+
+        parametres = {"ids": ids}
+        if embeddings is None and documents is not None:
+            embeddings = self.fonction_embedding(documents)
+        if embeddings is not None:
+            # Sans embedding, ChromaDB recalculerait celui du document
+            parametres["embeddings"] = [EMBEDDING_FACTICE] * len(ids)
+        if documents is not None:
+            parametres["documents"] = documents
+        if metadatas is not None:
+            parametres["metadatas"] = metadatas
+        # ChromaDB d'abord : un lot refusé (id répété...) n'écrit aucun vecteur
+        self.collection.update(**parametres)
+        if embeddings is not None:
+            self._ajouter_lignes(ids, embeddings)
+
+    def _ajouter_lignes(self, ids, embeddings):
+        """
+        Ajoute les vecteurs (préparés et quantifiés) ; l'ancienne ligne d'un id est marquée morte
+        """
+        vecteurs = self._preparer(embeddings)
+        if self.dimension is None:
+            if self.mode == "pq" and vecteurs.shape[1] % self.quantifieur.nb_sous_espaces:
+                raise ValueError(f"La dimension {vecteurs.shape[1]} n'est pas divisible par "
+                                 f"{self.quantifieur.nb_sous_espaces}")
+            self.dimension = vecteurs.shape[1]
+            self._ecrire_etat()
+        if self.entraine:
+            codes, echelles = self.quantifieur.encoder(vecteurs)
+        else:
+            # Codes remplis à l'entraînement ; en attendant, recherche exacte
+            codes = np.zeros((len(ids), self._largeur_codes()), dtype=self._type_codes())
+            echelles = np.ones(len(ids), dtype=np.float32)
+        normes = (vecteurs ** 2).sum(axis=1).astype(np.float32)
+
+        # Fichiers en ajout seul : une ligne remplacée est simplement marquée morte
+        for nom, tableau in (("vecteurs.f32", vecteurs), ("codes.bin", codes),
+                             ("echelles.f32", echelles), ("normes.f32", normes)):
+            with open(self._chemin(nom), "ab") as fichier:
+                fichier.write(np.ascontiguousarray(tableau).tobytes())
+        self._journaliser("+", ids)
+
+        self._agrandir(len(ids))
+        debut, fin = self.nb_lignes, self.nb_lignes + len(ids)
+        self.codes[debut:fin] = codes
+        self.echelles[debut:fin] = echelles
+        self.normes[debut:fin] = normes
+        self.vivants[debut:fin] = True
+        for ligne, id_document in enumerate(ids, start=debut):
+            self._marquer_supprime(id_document)
+            self.positions[id_document] = ligne
+            self.ids.append(id_document)
+        self.nb_lignes = fin
+
+    def delete(self, ids=None, where=None, where_document=None):
+        if where or where_document:
+            ids = self.collection.get(ids=ids, where=where, where_document=where_document,
+                                      include=[])["ids"]
+        if not ids:
+            return
+        self._journaliser("-", ids)
+        for id_document in ids:
+            self._marquer_supprime(id_document)
+        self.collection.delete(ids=ids)
+
+    def entrainer(self, taille_echantillon=20000, graine=0):
+        """
+        (Ré)apprend les centroïdes PQ sur les vecteurs vivants, puis recode tout
+        """
+        if self.mode != "pq":
+            return
+        lignes = np.flatnonzero(self.vivants[:self.nb_lignes])
+        lignes = np.random.default_rng(graine).permutation(lignes)[:taille_echantillon]
+        echantillon, _ = self._vecteurs_exacts(lignes)
+        self.quantifieur.entrainer(echantillon)
+
+        nouveaux_codes = np.empty_like(self.codes[:self.nb_lignes])
+        with open(self._chemin("codes.bin.tmp"), "wb") as fichier:
+            for debut in range(0, self.nb_lignes, TAILLE_BLOC):
+                bloc, _ = self._vecteurs_exacts(np.arange(debut, min(debut + TAILLE_BLOC,
+                                                                      self.nb_lignes)))
+                codes, _ = self.quantifieur.encoder(bloc)
+                nouveaux_codes[debut:debut + len(bloc)] = codes
+                fichier.write(codes.tobytes())
+        with open(self._chemin("centroides.npy.tmp"), "wb") as fichier:
+            np.save(fichier, self.quantifieur.centroides)
+        os.replace(self._chemin("centroides.npy.tmp"), self._chemin("centroides.npy"))
+        os.replace(self._chemin("codes.bin.tmp"), self._chemin("codes.bin"))
+        self.codes[:self.nb_lignes] = nouveaux_codes
+
+    # ------------------------------------------------------------------------
+    # Lectures
+    # ------------------------------------------------------------------------
+
+    def get(self, ids=None, where=None, where_document=None, limit=None, offset=None,
+            include=("documents", "metadatas")):
+        """
+        Comme Collection.get ; les embeddings sont les vecteurs exacts stockés
+        (normalisés si espace="cosine")
+        """
+        include = list(include)
+        resultat = self.collection.get(ids=ids, where=where, where_document=where_document,
+                                       limit=limit, offset=offset,
+                                       include=[c for c in include if c != "embeddings"])
+        if "embeddings" in include:
+            lignes = np.array([self.positions[i] for i in resultat["ids"]], dtype=np.int64)
+            vecteurs = np.zeros((0, self.dimension or 0), dtype=np.float32)
+            if len(lignes):
+                exacts, triees = self._vecteurs_exacts(lignes)
+                vecteurs = exacts[np.searchsorted(triees, lignes)]
+            resultat["embeddings"] = vecteurs
+            resultat["included"] = include
+        return resultat
+
+    def peek(self, limit=10):
+        return self.get(limit=limit, include=["documents", "metadatas", "embeddings"])
+
+    # ------------------------------------------------------------------------
+    # Recherche : grossière sur les codes, puis reclassement exact
+    # ------------------------------------------------------------------------
+
+    def _distances_approchees(self, requete, masque):
+        lignes = np.flatnonzero(masque)
+        resultat = np.empty(len(lignes), dtype=np.float32)
+        for debut in range(0, len(lignes), TAILLE_BLOC):
+            bloc = lignes[debut:debut + TAILLE_BLOC]
+            produits = self.quantifieur.produits_scalaires(
+                requete, self.codes[bloc], self.echelles[bloc])
+            if self.espace == "l2":
+                resultat[debut:debut + len(bloc)] = (
+                    self.normes[bloc] - 2 * produits + (requete ** 2).sum())
+            else:
+                resultat[debut:debut + len(bloc)] = 1 - produits
+        return lignes, resultat
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None,
+              include=("documents", "metadatas", "distances")):
+        if query_embeddings is None:
+            if isinstance(query_texts, str):
+                query_texts = [query_texts]
+            query_embeddings = self.fonction_embedding(query_texts)
+        requetes = self._preparer(query_embeddings)
+
+        masque = self.vivants[:self.nb_lignes].copy()
+        if where:
+            # Le filtre est évalué par ChromaDB, la recherche sur les seuls candidats
+            candidats = self.collection.get(where=where, include=[])["ids"]
+            filtre = np.zeros(self.nb_lignes, dtype=bool)
+            filtre[[self.positions[i] for i in candidats if i in self.positions]] = True
+            masque &= filtre
+
+        resultat = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        nb_candidats = n_results * self.facteur_reclassement
+        for requete in requetes:
+            if not self.entraine:
+                lignes = np.flatnonzero(masque)
+            else:
+                lignes, approchees = self._distances_approchees(requete, masque)
+            if self.entraine and len(lignes) > nb_candidats:
+                lignes = lignes[np.argpartition(approchees, nb_candidats - 1)[:nb_candidats]]
+            exacts, lignes = self._vecteurs_exacts(lignes)
+            indices, dist = top_k(requete, exacts, n_results, self.espace)
+            resultat["ids"].append([self.ids[lignes[i]] for i in indices[0]])
+            resultat["distances"].append([float(d) for d in dist[0]])
+
+        if "documents" in include or "metadatas" in include:
+            tous = sorted({i for ids in resultat["ids"] for i in ids})
+            details = self.collection.get(ids=tous, include=["documents", "metadatas"])
+            par_id = dict(zip(details["ids"], zip(details["documents"], details["metadatas"])))
+            for ids in resultat["ids"]:
+                resultat["documents"].append([par_id[i][0] for i in ids])
+                resultat["metadatas"].append([par_id[i][1] for i in ids])
+        return resultat
+
+    def count(self):
+        return int(self.vivants[:self.nb_lignes].sum())
+
+    # ------------------------------------------------------------------------
+    # Compromis rappel / latence / mémoire
+    # ------------------------------------------------------------------------
+
+    def memoire(self):
+        """
+        Octets en mémoire pour les vecteurs, comparés au float32 complet
+        """
+        n = self.nb_lignes
+        quantifie = self.codes[:n].nbytes + self.echelles[:n].nbytes + self.normes[:n].nbytes
+        complet = n * self.dimension * 4
+        return {"octets_quantifies": int(quantifie), "octets_float32": int(complet),
+                "reduction": complet / quantifie if quantifie else 0.0}
+
+    def evaluer(self, requetes, k=10):
+        """
+        Rappel@k par rapport à la recherche exacte, latence et mémoire
+        """
+        requetes = self._preparer(requetes)
+        lignes_vivantes = np.flatnonzero(self.vivants[:self.nb_lignes])
+        exacts, lignes_vivantes = self._vecteurs_exacts(lignes_vivantes)
+        reference, _ = top_k(requetes, exacts, k, self.espace)
+
+        rappels, latences = [], []
+        for requete, attendus in zip(requetes, reference):
+            debut = time.perf_counter()
+            obtenus = self.query(query_embeddings=[requete], n_results=k, include=())["ids"][0]
+            latences.append(time.perf_counter() - debut)
+            attendus = {self.ids[lignes_vivantes[i]] for i in attendus}
+            rappels.append(len(attendus & set(obtenus)) / len(attendus))
+        return {
+            "mode": self.mode,
+            f"rappel@{k}": float(np.mean(rappels)),
+            "latence_ms": float(np.mean(latences) * 1000),
+            **self.memoire(),
+        }
+
+
+# ============================================================================
+# EXEMPLE: COMPROMIS RAPPEL / LATENCE / MÉMOIRE SUR diamonds.csv
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+    from itertools import islice
+
+    import chromadb
+
+    from ingestion_csv import MODELE_DIAMANTS, lire_csv, preparer_lots
+
+    parser = argparse.ArgumentParser(description="Évalue le stockage quantifié")
+    parser.add_argument("--lignes", type=int, default=10000)
+    parser.add_argument("--requetes", type=int, default=50)
+    args = parser.parse_args()
+
+    client = chromadb.Client()
+    for mode in ("int8", "pq"):
+        dossier = f"./quantifie_{mode}"
+        shutil.rmtree(dossier, ignore_errors=True)
+        collection = CollectionQuantifiee(client, f"diamonds_{mode}", dossier, mode=mode)
+        lots = preparer_lots(islice(lire_csv("diamonds.csv"), args.lignes), MODELE_DIAMANTS, 5000)
+        for lot in lots:
+            collection.upsert(**lot)
+        requetes = collection.fonction_embedding(
+            [f"Diamant de {carat} carat" for carat in np.linspace(0.2, 3, args.requetes)]
+        )
+        print(collection.evaluer(requetes))
@@ -0,0 +1,185 @@
+# ============================================================================
+# SYNCHRONISATION INCRÉMENTALE (DELTA) D'UN CSV AVEC UNE COLLECTION
+# ============================================================================
+#
+# Les identifiants sont dérivés d'une colonne clé (Country, ou la colonne
+# d'index de diamonds.csv) au lieu de la position de la ligne, et chaque
+# document garde une empreinte de son contenu dans ses métadonnées.
+# À chaque synchronisation :
+# - les lignes nouvelles ou modifiées sont envoyées à upsert
+# - les lignes inchangées ne sont ni réécrites ni ré-embeddées
+# - les lignes disparues du fichier sont supprimées de la collection
+# - sur demande (supprimer_positionnels=True), les anciens documents
+#   positionnels (id_0, id_1...) écrits avec le même modèle avant la
+#   synchronisation par clé sont supprimés eux aussi
+# ============================================================================
+
+import hashlib
+import json
+import os
+import re
+import string
+import time
+
+from ingestion_csv import (
+    extraire_metadonnees,
+    ingerer_lots,
+    lire_csv,
+    par_lots,
+    taille_lot_max,
+)
+from parcours_collection import iterer_collection, lister_ids
+
+# Clés de métadonnées réservées à la synchronisation (préfixées pour ne pas
+# entrer en conflit avec les métadonnées de l'utilisateur, ex. "source")
+CLE_EMPREINTE = "_sync_empreinte"
+CLE_SOURCE = "_sync_source"
+
+
+def empreinte(document, metadonnees=None):
+    """
+    Empreinte SHA-1 du document et de ses métadonnées
+    """
+    contenu = document
+    if metadonnees:
+        contenu += "\0" + json.dumps(metadonnees, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(contenu.encode("utf-8")).hexdigest()
+
+
+def synchroniser_csv(collection, chemin, modele, colonne_cle, client=None,
+                     taille_lot=None, prefixe_id="id_", source=None,
+                     colonnes_metadonnees=None, encodage="ISO-8859-1",
+                     pipeline=None, supprimer_positionnels=False, afficher=True):
+    """
+    Applique à la collection uniquement les différences avec le fichier CSV
+
+    Renvoie le nombre de documents ajoutés, modifiés, inchangés et supprimés.
+    supprimer_positionnels parcourt toute la collection : à n'utiliser qu'une
+    fois, pour migrer une ancienne ingestion (voir lister_positionnels).
+    """
+    source = source or os.path.basename(chemin)
+    taille = taille_lot_max(client, taille_lot)
+    stats = {"ajoutes": 0, "modifies": 0, "inchanges": 0, "supprimes": 0}
+    # Empreinte retenue pour chaque identifiant déjà rencontré dans le fichier
+    vus = {}
+    debut = time.perf_counter()
+
+    def lots_a_ecrire():
+        for lignes in par_lots(lire_csv(chemin, encodage=encodage), taille):
+            # Une clé répétée dans le fichier : la dernière ligne l'emporte
+            lot = {}
+            for ligne in lignes:
+                id_document = f"{prefixe_id}{ligne[colonne_cle]}"
+                document = modele.format_map(ligne)
+                metadonnees = extraire_metadonnees(ligne, colonnes_metadonnees or [])
+                metadonnees[CLE_EMPREINTE] = empreinte(document, metadonnees)
+                metadonnees[CLE_SOURCE] = source
+                lot[id_document] = (document, metadonnees)
+
+            # Une clé déjà vue dans un lot précédent n'est comptée qu'une fois,
+            # et n'est réécrite que si la nouvelle ligne est différente
+            repetes = {id_document for id_document in lot if id_document in vus}
+            nouveaux = [id_document for id_document in lot if id_document not in repetes]
+            existants = collection.get(ids=nouveaux, include=["metadatas"]) if nouveaux \
+                else {"ids": [], "metadatas": []}
+            empreintes = {
+                id_document: (metadonnees or {}).get(CLE_EMPREINTE)
+                for id_document, metadonnees in zip(existants["ids"], existants["metadatas"])
+                if (metadonnees or {}).get(CLE_SOURCE) == source
+            }
+            anciens = set(existants["ids"])
+
+            a_ecrire = {"ids": [], "documents": [], "metadatas": []}
+            for id_document, (document, metadonnees) in lot.items():
+                if id_document in repetes:
+                    if vus[id_document] == metadonnees[CLE_EMPREINTE]:
+                        continue
+                elif id_document not in anciens:
+                    stats["ajoutes"] += 1
+                elif empreintes.get(id_document) != metadonnees[CLE_EMPREINTE]:
+                    stats["modifies"] += 1
+                else:
+                    stats["inchanges"] += 1
+                    vus[id_document] = metadonnees[CLE_EMPREINTE]
+                    continue
+                vus[id_document] = metadonnees[CLE_EMPREINTE]
+                a_ecrire["ids"].append(id_document)
+                a_ecrire["documents"].append(document)
+                a_ecrire["metadatas"].append(metadonnees)
+            if a_ecrire["ids"]:
+                yield a_ecrire
+
+    if pipeline is not None:
+        pipeline.ingerer(collection, lots_a_ecrire(), afficher=afficher)
+    else:
+        ingerer_lots(collection, lots_a_ecrire(), afficher=afficher)
+
+    # Suppression des lignes qui ne sont plus dans le fichier
+    presents = lister_ids(collection, where={CLE_SOURCE: source})
+    disparus = [id_document for id_document in presents if id_document not in vus]
+    if supprimer_positionnels:
+        disparus += lister_positionnels(collection, source, modele, prefixe_id, vus, taille)
+    for lot in par_lots(disparus, taille):
+        collection.delete(ids=lot)
+    stats["supprimes"] = len(disparus)
+
+    stats["secondes"] = time.perf_counter() - debut
+    if afficher:
+        print(f"# Synchronisation de {source}: {stats['ajoutes']} ajoutés, "
+              f"{stats['modifies']} modifiés, {stats['inchanges']} inchangés, "
+              f"{stats['supprimes']} supprimés ({stats['secondes']:.1f} s)")
+    return stats
+
+
+def motif_modele(modele):
+    """
+    Expression régulière des documents produits par un modèle str.format
+    """
+    motif = ""
+    for texte, champ, _, _ in string.Formatter().parse(modele):
+        motif += re.escape(texte)
+        if champ is not None:
+            motif += ".*?"
+    return re.compile(motif, re.DOTALL)
+
+
+def lister_positionnels(collection, source, modele, prefixe_id, exclus=(), taille_lot=1000):
+    """
+    Identifiants positionnels (prefixe_id + numéro de ligne) sans source
+
+    Ce sont les documents écrits par l'ancienne ingestion de population.py,
+    avant que les identifiants ne soient dérivés d'une colonne clé. Seuls
+    ceux dont le texte suit `modele` sont retenus : les documents id_N
+    d'un autre fichier (ingerer_csv de diamonds.csv...) sont conservés.
+    """
+    motif_id = re.compile(re.escape(prefixe_id) + r"\d+")
+    motif_document = motif_modele(modele)
+    positionnels = []
+    # $ne retient aussi les documents qui n'ont pas la clé
+    for lot in iterer_collection(collection, taille_lot=taille_lot,
+                                 where={CLE_SOURCE: {"$ne": source}},
+                                 include=["documents", "metadatas"]):
+        for id_document, document, metadonnees in zip(lot["ids"], lot["documents"],
+                                                      lot["metadatas"]):
+            if (motif_id.fullmatch(id_document) and id_document not in exclus
+                    and CLE_SOURCE not in (metadonnees or {})
+                    and motif_document.fullmatch(document or "")):
+                positionnels.append(id_document)
+    return positionnels
+
+
+# ============================================================================
+# EXEMPLE: SYNCHRONISATION NOCTURNE DE diamonds.csv
+# ============================================================================
+
+if __name__ == "__main__":
+    import chromadb
+
+    from ingestion_csv import COLONNES_DIAMANTS, MODELE_DIAMANTS
+
+    client = chromadb.PersistentClient()
+    col = client.get_or_create_collection(name="diamonds")
+
+    # La première colonne de diamonds.csv (sans nom) est l'index de la ligne
+    synchroniser_csv(col, "diamonds.csv", MODELE_DIAMANTS, colonne_cle="", client=client,
+                     colonnes_metadonnees=COLONNES_DIAMANTS)
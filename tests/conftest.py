@@ -0,0 +1,54 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FonctionEmbeddingTest(EmbeddingFunction):
+    """
+    Sac de mots haché et normalisé : déterministe, sans téléchargement de modèle
+    """
+
+    MODEL_NAME = "test-sac-de-mots"
+
+    def __init__(self, dimension=16):
+        self.dimension = dimension
+        self.appels = 0
+        self.textes = 0
+
+    def __call__(self, input):
+        self.appels += 1
+        self.textes += len(input)
+        vecteurs = []
+        for texte in input:
+            vecteur = np.zeros(self.dimension, dtype=np.float32)
+            for mot in texte.lower().split():
+                vecteur[int(hashlib.md5(mot.encode("utf-8")).hexdigest(), 16) % self.dimension] += 1
+            vecteur /= np.linalg.norm(vecteur) or 1
+            vecteurs.append(vecteur)
+        return vecteurs
+
+
+@pytest.fixture
+def fonction_embedding():
+    return FonctionEmbeddingTest()
+
+
+@pytest.fixture
+def client():
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    yield client
+    for collection in client.list_collections():
+        client.delete_collection(collection.name)
+
+
+@pytest.fixture
+def collection(client, fonction_embedding):
+    return client.create_collection("collection_test", embedding_function=fonction_embedding)
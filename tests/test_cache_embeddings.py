@@ -0,0 +1,70 @@
+import numpy as np
+from chromadb.utils import embedding_functions
+
+from cache_embeddings import EmbeddingFunctionEnCache, StockageVecteurs
+
+
+def test_ligne_explicite_et_cles_repetees(tmp_path):
+    stockage = StockageVecteurs(tmp_path)
+    stockage.ecrire(["a", "b", "a"], [[1, 1], [2, 2], [9, 9]])
+    stockage.ecrire(["b", "c"], [[8, 8], [3, 3]])
+
+    relu = StockageVecteurs(tmp_path)
+    assert relu.lire("a").tolist() == [1, 1]
+    assert relu.lire("b").tolist() == [2, 2]
+    assert relu.lire("c").tolist() == [3, 3]
+
+
+def test_ajout_interrompu(tmp_path):
+    stockage = StockageVecteurs(tmp_path)
+    stockage.ecrire(["a"], [[1, 1]])
+    with open(stockage.chemin_vecteurs, "ab") as fichier:
+        fichier.write(b"\x00\x00")
+    # Clé dont le vecteur n'a jamais été écrit en entier
+    with open(stockage.chemin_index, "a", encoding="utf-8") as fichier:
+        fichier.write("perdue 1\n")
+
+    relu = StockageVecteurs(tmp_path)
+    assert relu.lire("perdue") is None
+    relu.ecrire(["b"], [[2, 2]])
+    relu = StockageVecteurs(tmp_path)
+    assert relu.lire("a").tolist() == [1, 1]
+    assert relu.lire("b").tolist() == [2, 2]
+
+
+def test_deux_stockages_sur_le_meme_dossier(tmp_path):
+    premier, second = StockageVecteurs(tmp_path), StockageVecteurs(tmp_path)
+    premier.ecrire(["a"], [[1, 1]])
+    second.ecrire(["b"], [[2, 2]])
+    premier.ecrire(["c"], [[3, 3]])
+
+    relu = StockageVecteurs(tmp_path)
+    assert [relu.lire(c).tolist() for c in "abc"] == [[1, 1], [2, 2], [3, 3]]
+
+
+def test_cache_evite_les_recalculs(tmp_path, fonction_embedding):
+    cache = EmbeddingFunctionEnCache(fonction_embedding, dossier=tmp_path)
+    premiers = cache(["un texte", "un autre", "un texte"])
+    assert fonction_embedding.textes == 2
+
+    relu = EmbeddingFunctionEnCache(fonction_embedding, dossier=tmp_path)
+    assert np.allclose(relu(["un autre", "un texte"]), [premiers[1], premiers[0]])
+    assert fonction_embedding.textes == 2
+    assert relu.stats()["hits_disque"] == 2
+
+
+def test_collection_existante_sans_conflit(client, tmp_path):
+    client.create_collection("existante",
+                             embedding_function=embedding_functions.DefaultEmbeddingFunction())
+    collection = client.get_or_create_collection(
+        "existante", embedding_function=EmbeddingFunctionEnCache(dossier=tmp_path))
+    assert collection.name == "existante"
+
+
+def test_collection_legacy(client, tmp_path, fonction_embedding):
+    client.create_collection("ancienne", embedding_function=fonction_embedding)
+    collection = client.get_or_create_collection(
+        "ancienne", embedding_function=EmbeddingFunctionEnCache(fonction_embedding,
+                                                                dossier=tmp_path))
+    collection.add(ids=["a"], documents=["un texte"])
+    assert collection.count() == 1
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from client_async import ClientChromaAsync, FileSaturee
+
+
+def test_contre_pression_par_defaut():
+    client = ClientChromaAsync(concurrence_max=2)
+    assert client.file_max is not None
+
+    async def scenario():
+        client.file_max = 4
+        liberation = asyncio.Event()
+
+        async def requete():
+            await liberation.wait()
+            return "ok"
+
+        en_vol = [asyncio.ensure_future(client.executer(requete())) for _ in range(4)]
+        await asyncio.sleep(0)
+        with pytest.raises(FileSaturee):
+            await client.executer(requete())
+        liberation.set()
+        return await asyncio.gather(*en_vol)
+
+    assert asyncio.run(scenario()) == ["ok"] * 4
+
+
+def test_fermeture_du_pool():
+    class Serveur:
+        ferme = False
+
+        async def __aexit__(self, *exc):
+            Serveur.ferme = True
+
+    class Client:
+        _server = Serveur()
+
+    async def scenario():
+        client = ClientChromaAsync()
+        client._client = Client()
+        async with client:
+            pass
+        return client
+
+    client = asyncio.run(scenario())
+    assert Serveur.ferme
+    assert client._client is None
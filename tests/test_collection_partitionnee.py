@@ -0,0 +1,84 @@
+import pytest
+
+from collection_partitionnee import CollectionPartitionnee
+
+DOCUMENTS = ["RAG et génération", "base vectorielle open-source", "embeddings de texte",
+             "recherche sémantique", "modèles de langage"]
+THEMES = ["RAG", "Database", "NLP", "Search", "NLP"]
+
+
+@pytest.fixture
+def partitionnee(client, fonction_embedding):
+    with CollectionPartitionnee(client, "partitionnee", nb_partitions=3, cle_partition="topic",
+                                embedding_function=fonction_embedding) as collection:
+        collection.add(ids=[f"kb_{i}" for i in range(5)], documents=DOCUMENTS,
+                       metadatas=[{"topic": t, "rang": i} for i, t in enumerate(THEMES)])
+        yield collection
+
+
+def _partition_de(collection, id_document):
+    return [n for n, p in enumerate(collection.partitions) if p.get(ids=[id_document])["ids"]]
+
+
+def test_update_sur_place(partitionnee):
+    partitionnee.update(ids=["kb_0", "absent"], metadatas=[{"rang": 10}, {"rang": 11}])
+    assert partitionnee.get(ids=["kb_0"])["metadatas"] == [{"topic": "RAG", "rang": 10}]
+    assert partitionnee.count() == 5
+
+
+def test_update_de_la_cle_deplace_le_document(partitionnee):
+    nouvelle = partitionnee.partition_de(None, {"topic": "Autre"})
+    avant = partitionnee.get(ids=["kb_1"], include=["embeddings"])["embeddings"][0]
+
+    partitionnee.update(ids=["kb_1"], metadatas=[{"topic": "Autre", "rang": None}])
+
+    assert _partition_de(partitionnee, "kb_1") == [nouvelle]
+    resultat = partitionnee.get(ids=["kb_1"], include=["documents", "metadatas", "embeddings"])
+    assert resultat["documents"] == [DOCUMENTS[1]]
+    assert resultat["metadatas"] == [{"topic": "Autre"}]
+    assert list(resultat["embeddings"][0]) == list(avant)
+    assert partitionnee.get(where={"topic": "Autre"})["ids"] == ["kb_1"]
+
+
+def test_update_du_document_et_de_la_cle(partitionnee, fonction_embedding):
+    partitionnee.update(ids=["kb_2"], documents=["nouveau texte"], metadatas=[{"topic": "X"}])
+    resultat = partitionnee.get(ids=["kb_2"], include=["documents", "embeddings"])
+    assert resultat["documents"] == ["nouveau texte"]
+    assert list(resultat["embeddings"][0]) == pytest.approx(
+        list(fonction_embedding(["nouveau texte"])[0]))
+
+
+def test_fermeture(client, fonction_embedding):
+    collection = CollectionPartitionnee(client, "fermee", nb_partitions=2,
+                                        embedding_function=fonction_embedding)
+    collection.close()
+    with pytest.raises(RuntimeError):
+        collection.count()
+
+
+def test_attributs_de_collection(partitionnee):
+    assert partitionnee.name == "partitionnee"
+    assert partitionnee.metadata is None
+
+
+def test_upsert_sans_la_cle_garde_les_metadonnees(partitionnee):
+    partitionnee.upsert(ids=["kb_0"], documents=["RAG revu"])
+    assert partitionnee.get(ids=["kb_0"])["metadatas"] == [{"topic": "RAG", "rang": 0}]
+    assert partitionnee.count() == 5
+
+
+def test_upsert_de_la_cle_deplace_le_document(partitionnee):
+    nouvelle = partitionnee.partition_de(None, {"topic": "Autre"})
+    partitionnee.upsert(ids=["kb_3"], documents=["recherche revue"],
+                        metadatas=[{"topic": "Autre"}])
+    assert _partition_de(partitionnee, "kb_3") == [nouvelle]
+    assert partitionnee.get(ids=["kb_3"])["metadatas"] == [{"topic": "Autre", "rang": 3}]
+
+
+def test_nouveau_document_sans_la_cle(partitionnee):
+    with pytest.raises(ValueError):
+        partitionnee.upsert(ids=["kb_0", "kb_9"], documents=["a", "b"])
+    with pytest.raises(ValueError):
+        partitionnee.add(ids=["kb_9"], documents=["b"], metadatas=[{"rang": 9}])
+    assert partitionnee.count() == 5
+    assert partitionnee.get(ids=["kb_0"])["documents"] == [DOCUMENTS[0]]
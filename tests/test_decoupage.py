@@ -0,0 +1,13 @@
+from decoupage import decouper_document, sources_fichiers
+
+
+def test_ids_des_fichiers_de_meme_nom(tmp_path):
+    for dossier in ("a", "b"):
+        (tmp_path / dossier).mkdir()
+        (tmp_path / dossier / "notes.txt").write_text(f"texte {dossier}", encoding="utf-8")
+    chemins = [tmp_path / "a" / "notes.txt", tmp_path / "b" / "notes.txt"]
+
+    sources = list(sources_fichiers(chemins, racine=tmp_path))
+    assert [id_parent for id_parent, _ in sources] == ["a/notes.txt", "b/notes.txt"]
+    ids = [i for id_parent, texte in sources for i, _, _ in decouper_document(id_parent, texte)]
+    assert len(set(ids)) == 2
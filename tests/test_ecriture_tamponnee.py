@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from ecriture_tamponnee import EcrivainTamponne
+
+# Chaque scénario : opérations appliquées dans l'ordre à une collection qui
+# contient déjà "a" (document "x", métadonnées {"k": 1})
+SCENARIOS = {
+    "delete_puis_upsert": [
+        ("delete", {"ids": ["a"]}),
+        ("upsert", {"ids": ["a"], "documents": ["z"]}),
+    ],
+    "upsert_puis_upsert": [
+        ("upsert", {"ids": ["a"], "documents": ["y"], "metadatas": [{"v": 2}]}),
+        ("upsert", {"ids": ["a"], "documents": ["z"]}),
+    ],
+    "upsert_puis_update": [
+        ("upsert", {"ids": ["b"], "documents": ["b"], "metadatas": [{"v": 1}]}),
+        ("update", {"ids": ["b"], "metadatas": [{"w": 2}]}),
+    ],
+    "delete_puis_update": [
+        ("delete", {"ids": ["a"]}),
+        ("update", {"ids": ["a"], "metadatas": [{"w": 2}]}),
+    ],
+    "update_puis_delete_puis_upsert": [
+        ("update", {"ids": ["a"], "documents": ["y"]}),
+        ("delete", {"ids": ["a"]}),
+        ("upsert", {"ids": ["a"], "documents": ["z"], "metadatas": [{"v": 3}]}),
+        ("update", {"ids": ["a"], "metadatas": [{"w": 4}]}),
+    ],
+    "nouveau_document_change": [
+        ("upsert", {"ids": ["c"], "documents": ["premier texte"]}),
+        ("upsert", {"ids": ["c"], "documents": ["second texte"], "metadatas": [{"v": 1}]}),
+    ],
+}
+
+
+def _etat(collection):
+    contenu = collection.get(include=["documents", "metadatas", "embeddings"])
+    return {
+        id_document: (document, metadonnees, np.round(embedding, 5).tolist())
+        for id_document, document, metadonnees, embedding in zip(
+            contenu["ids"], contenu["documents"], contenu["metadatas"], contenu["embeddings"])
+    }
+
+
+@pytest.mark.parametrize("nom", SCENARIOS)
+def test_meme_resultat_que_la_collection(client, fonction_embedding, nom):
+    directe = client.create_collection("directe", embedding_function=fonction_embedding)
+    tamponnee = client.create_collection("tamponnee", embedding_function=fonction_embedding)
+    for collection in (directe, tamponnee):
+        collection.add(ids=["a"], documents=["x"], metadatas=[{"k": 1}])
+
+    with EcrivainTamponne(tamponnee, taille_max=1000, delai_max=60) as ecrivain:
+        for operation, parametres in SCENARIOS[nom]:
+            getattr(directe, operation)(**parametres)
+            getattr(ecrivain, operation)(**parametres)
+        assert ecrivain.stats["operations_ecrites"] == 0
+
+    assert _etat(tamponnee) == _etat(directe)
+
+
+def test_regroupement(collection):
+    with EcrivainTamponne(collection, taille_max=10000, delai_max=60) as ecrivain:
+        for i in range(200):
+            ecrivain.upsert(ids=[f"d{i % 50}"], documents=[f"texte {i}"],
+                            metadatas=[{"version": i}])
+        assert ecrivain.count() == 50
+        assert ecrivain.stats["appels_chroma"] == 1
+    assert collection.get(ids=["d0"])["metadatas"] == [{"version": 150}]
+
+
+def test_erreur_levee_dans_le_thread_appelant(collection):
+    collection.add(ids=["a"], embeddings=[[0.0] * 16])
+    ecrivain = EcrivainTamponne(collection, delai_max=60)
+    ecrivain.upsert(ids=["b"], embeddings=[[0.0] * 3])
+    with pytest.raises(Exception):
+        ecrivain.vider()
+    # L'opération refusée reste en attente : fermer() la retente
+    with pytest.raises(Exception):
+        ecrivain.fermer()
+    assert list(ecrivain.abandonner()) == ["b"]
+
+
+def test_lot_refuse_reste_en_attente(collection):
+    collection.add(ids=["a"], embeddings=[[0.0] * 16])
+    ecrivain = EcrivainTamponne(collection, delai_max=60)
+    ecrivain.upsert(ids=["ok1"], documents=["premier"])
+    ecrivain.update(ids=["a"], embeddings=[[0.0] * 3])
+    ecrivain.upsert(ids=["ok2"], documents=["second"])
+    with pytest.raises(Exception):
+        ecrivain.vider()
+    assert sorted(collection.get()["ids"]) == ["a", "ok1", "ok2"]
+
+    # L'opération refusée est retentée, puis retirée par abandonner()
+    ecrivain.upsert(ids=["ok3"], documents=["troisième"])
+    with pytest.raises(Exception):
+        ecrivain.vider()
+    assert collection.count() == 4
+    assert list(ecrivain.abandonner()) == ["a"]
+    ecrivain.fermer()
+
+
+def test_ecriture_apres_fermeture(collection):
+    ecrivain = EcrivainTamponne(collection, delai_max=60)
+    ecrivain.upsert(ids=["a"], documents=["texte"])
+    ecrivain.fermer()
+    assert collection.count() == 1
+    with pytest.raises(RuntimeError):
+        ecrivain.upsert(ids=["b"], documents=["texte"])
+    with pytest.raises(RuntimeError):
+        ecrivain.delete(where={"x": 1})
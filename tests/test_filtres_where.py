@@ -0,0 +1,116 @@
+import pytest
+
+from index_colonnes import CollectionColonnaire, IndexColonnaire
+from index_secondaires import CollectionIndexee, satisfait
+
+METADONNEES = [
+    {"prix": 100, "coupe": "Ideal"},
+    {"prix": 250.5, "coupe": "Good"},
+    {"prix": 400, "coupe": "Ideal"},
+    {"coupe": "Fair"},
+    {"prix": 999},
+    {"autre": True},
+    {"prix": 250.5, "coupe": "Premium"},
+]
+
+FILTRES = [
+    {"prix": 250.5},
+    {"prix": {"$ne": 250.5}},
+    {"prix": {"$gt": 100}},
+    {"prix": {"$lte": 250.5}},
+    {"prix": {"$in": [100, 999]}},
+    {"prix": {"$nin": [100, 999]}},
+    {"coupe": "Ideal"},
+    {"coupe": {"$ne": "Ideal"}},
+    {"coupe": {"$in": ["Fair", "Good"]}},
+    {"coupe": {"$nin": ["Fair", "Good"]}},
+    {"$and": [{"coupe": "Ideal"}, {"prix": {"$gte": 200}}]},
+    {"$or": [{"coupe": "Fair"}, {"prix": {"$lt": 200}}]},
+    {"$and": [{"coupe": {"$ne": "Ideal"}}, {"prix": {"$nin": [999]}}]},
+]
+
+
+@pytest.fixture
+def remplie(collection):
+    collection.add(ids=[f"d{i}" for i in range(len(METADONNEES))],
+                   documents=[f"diamant {i}" for i in range(len(METADONNEES))],
+                   metadatas=METADONNEES)
+    return collection
+
+
+def _attendus(collection, where):
+    return set(collection.get(where=where, include=[])["ids"])
+
+
+@pytest.mark.parametrize("where", FILTRES, ids=str)
+def test_index_colonnaire(remplie, where):
+    index = IndexColonnaire.construire(remplie, ["prix", "coupe"])
+    assert set(index.filtrer(where)) == _attendus(remplie, where)
+
+
+@pytest.mark.parametrize("where", FILTRES, ids=str)
+def test_satisfait(remplie, where):
+    contenu = remplie.get(include=["metadatas"])
+    retenus = {i for i, m in zip(contenu["ids"], contenu["metadatas"]) if satisfait(m, where)}
+    assert retenus == _attendus(remplie, where)
+
+
+@pytest.mark.parametrize("where", FILTRES, ids=str)
+def test_index_secondaires(remplie, where):
+    indexee = CollectionIndexee(remplie, {"prix": "trie", "coupe": "hash"})
+    assert set(indexee.get(where=where, include=[])["ids"]) == _attendus(remplie, where)
+    assert indexee.dernier_plan == "index"
+
+
+@pytest.mark.parametrize("where", FILTRES, ids=str)
+def test_plans_de_recherche(remplie, where):
+    indexee = CollectionIndexee(remplie, {"prix": "trie", "coupe": "hash"}, seuil_prefiltre=2)
+    resultat = indexee.query(query_texts=["diamant"], n_results=3, where=where)
+    reference = remplie.query(query_texts=["diamant"], n_results=3, where=where)
+    assert len(resultat["ids"][0]) == len(reference["ids"][0])
+    assert set(resultat["ids"][0]) <= _attendus(remplie, where)
+
+
+def test_index_colonnaire_suit_les_ecritures(remplie):
+    collection = CollectionColonnaire(remplie, IndexColonnaire.construire(remplie,
+                                                                          ["prix", "coupe"]))
+    collection.upsert(ids=["d0"], documents=["diamant 0"], metadatas=[{"coupe": "Fair"}])
+    collection.update(ids=["d3"], metadatas=[{"prix": 5}])
+    collection.add(ids=["d9"], documents=["diamant 9"], metadatas=[{"coupe": "Ideal"}])
+    collection.delete(where={"prix": 999})
+    for where in FILTRES:
+        assert set(collection.index.filtrer(where)) == _attendus(remplie, where), where
+
+    resultat = collection.query(query_texts=["diamant"], n_results=5, where={"coupe": "Ideal"})
+    assert collection.dernier_plan == "pre-filtre"
+    assert set(resultat["ids"][0]) == _attendus(remplie, {"coupe": "Ideal"})
+
+
+def test_index_secondaires_suit_les_ecritures(remplie):
+    indexee = CollectionIndexee(remplie, {"prix": "trie", "coupe": "hash"})
+    indexee.upsert(ids=["d0"], documents=["diamant 0"], metadatas=[{"coupe": "Fair"}])
+    indexee.update(ids=["d3"], metadatas=[{"prix": 5}])
+    indexee.add(ids=["d9"], documents=["diamant 9"], metadatas=[{"coupe": "Ideal"}])
+    indexee.delete(where={"prix": 999})
+    assert indexee.dernier_plan == "index"
+    for where in FILTRES:
+        assert set(indexee.get(where=where, include=[])["ids"]) == _attendus(remplie, where), where
+
+
+@pytest.mark.parametrize("where", [{"autre": True}, {"$or": [{"coupe": "Fair"}, {"src": "x"}]}],
+                         ids=str)
+def test_index_colonnaire_cle_non_indexee(remplie, where):
+    collection = CollectionColonnaire(remplie, IndexColonnaire.construire(remplie,
+                                                                          ["prix", "coupe"]))
+    resultat = collection.query(query_texts=["diamant"], n_results=5, where=where)
+    assert collection.dernier_plan == "query"
+    assert set(resultat["ids"][0]) == _attendus(remplie, where)
+
+
+def test_index_colonnaire_colonne_sans_donnees(collection):
+    colonnaire = CollectionColonnaire(collection, IndexColonnaire.construire(collection,
+                                                                            ["prix"]))
+    assert colonnaire.query(query_texts=["diamant"], where={"prix": 1})["ids"] == [[]]
+    colonnaire.add(ids=["a"], documents=["diamant"], metadatas=[{"prix": 1}])
+    assert colonnaire.query(query_texts=["diamant"], where={"prix": 1})["ids"] == [["a"]]
+    assert colonnaire.dernier_plan == "pre-filtre"
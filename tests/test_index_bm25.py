@@ -0,0 +1,54 @@
+import os
+
+from index_bm25 import CollectionHybride
+
+DOCUMENTS = ["DavRos", "BMW série 3", "VX", "Toyota RAV4"]
+IDS = ["id1", "id2", "id3", "id4"]
+
+
+def test_sauvegarde_a_la_fermeture(collection, tmp_path):
+    chemin = tmp_path / f"bm25_{collection.name}.json"
+    with CollectionHybride(collection, dossier=tmp_path) as hybride:
+        date = os.stat(chemin).st_mtime_ns
+        for id_document, document in zip(IDS, DOCUMENTS):
+            hybride.upsert(ids=[id_document], documents=[document])
+        assert os.stat(chemin).st_mtime_ns == date
+    assert os.stat(chemin).st_mtime_ns != date
+
+    relue = CollectionHybride(collection, dossier=tmp_path)
+    assert relue.index.rechercher("rav4", k=1)[0][0] == "id4"
+
+
+def test_reconstruction_si_les_ids_changent(collection, tmp_path):
+    with CollectionHybride(collection, dossier=tmp_path) as hybride:
+        hybride.add(ids=IDS, documents=DOCUMENTS)
+
+    # Même nombre de documents, mais un id supprimé et un autre ajouté
+    collection.delete(ids=["id2"])
+    collection.add(ids=["id5"], documents=["Peugeot 208"])
+
+    relue = CollectionHybride(collection, dossier=tmp_path)
+    assert relue.index.rechercher("bmw") == []
+    assert relue.index.rechercher("peugeot")[0][0] == "id5"
+
+
+def test_index_complet_sans_documents(collection, tmp_path):
+    with CollectionHybride(collection, dossier=tmp_path) as hybride:
+        hybride.add(ids=IDS, documents=DOCUMENTS)
+        hybride.add(ids=["id5"], embeddings=[[0.0] * 16])
+        hybride.update(ids=["id1", "absent"], documents=["DavRos II", "fantôme"])
+        assert len(hybride.index) == collection.count() == 5
+
+    # L'index relu correspond à la collection : il n'est pas reconstruit
+    chemin = tmp_path / f"bm25_{collection.name}.json"
+    date = os.stat(chemin).st_mtime_ns
+    relue = CollectionHybride(collection, dossier=tmp_path)
+    assert os.stat(chemin).st_mtime_ns == date
+    assert relue.index.rechercher("fantome") == []
+
+
+def test_recherche_hybride(collection):
+    hybride = CollectionHybride(collection)
+    hybride.upsert(ids=IDS, documents=DOCUMENTS)
+    resultat = hybride.hybrid_query("RAV4", n_results=1)
+    assert resultat["ids"] == [["id4"]]
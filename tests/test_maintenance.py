@@ -0,0 +1,50 @@
+import numpy as np
+
+from maintenance import SUFFIXE_ANCIENNE, SUFFIXE_RECONSTRUCTION, reconstruire
+
+
+def _remplir(collection, nb=20):
+    collection.add(ids=[f"d{i}" for i in range(nb)],
+                   documents=[f"document {i}" for i in range(nb)],
+                   metadatas=[{"i": i} for i in range(nb)])
+    collection.delete(ids=[f"d{i}" for i in range(0, nb, 2)])
+
+
+def _noms(client):
+    return sorted(c.name for c in client.list_collections())
+
+
+def test_reconstruction(client, collection):
+    _remplir(collection)
+    avant = collection.get(include=["documents", "metadatas", "embeddings"])
+    nouvelle = reconstruire(client, collection.name)
+    apres = nouvelle.get(include=["documents", "metadatas", "embeddings"])
+    assert _noms(client) == [collection.name]
+    assert apres["ids"] == avant["ids"]
+    assert apres["metadatas"] == avant["metadatas"]
+    assert np.allclose(apres["embeddings"], avant["embeddings"])
+
+
+def test_ancienne_laissee_par_une_reconstruction_interrompue(client, collection,
+                                                            fonction_embedding):
+    _remplir(collection)
+    client.create_collection(collection.name + SUFFIXE_ANCIENNE,
+                             embedding_function=fonction_embedding)
+    reconstruire(client, collection.name)
+    assert _noms(client) == [collection.name]
+    assert client.get_collection(collection.name).count() == 10
+
+
+def test_arret_entre_les_deux_renommages(client, collection, fonction_embedding):
+    _remplir(collection)
+    nom = collection.name
+    copie = client.create_collection(nom + SUFFIXE_RECONSTRUCTION,
+                                     embedding_function=fonction_embedding)
+    contenu = collection.get(include=["documents", "metadatas", "embeddings"])
+    copie.add(ids=contenu["ids"], documents=contenu["documents"],
+              metadatas=contenu["metadatas"], embeddings=contenu["embeddings"])
+    collection.modify(name=nom + SUFFIXE_ANCIENNE)
+
+    reconstruire(client, nom)
+    assert _noms(client) == [nom]
+    assert client.get_collection(nom).count() == 10
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+from recherche_par_lots import MicroBatcherRecherche, rechercher_contextes
+
+DOCUMENTS = ["RAG combine recherche et génération", "ChromaDB base vectorielle",
+             "les embeddings sont des vecteurs"]
+QUESTIONS = ["base vectorielle", "RAG génération", "vecteurs embeddings"]
+
+
+class CollectionComptee:
+    def __init__(self, collection):
+        self.collection = collection
+        self.requetes = []
+
+    def query(self, **parametres):
+        self.requetes.append(parametres["query_texts"])
+        return self.collection.query(**parametres)
+
+
+@pytest.fixture
+def remplie(collection):
+    collection.add(ids=["kb_0", "kb_1", "kb_2"], documents=DOCUMENTS,
+                   metadatas=[{"i": i} for i in range(3)])
+    return collection
+
+
+def test_un_seul_query_par_lot(remplie):
+    comptee = CollectionComptee(remplie)
+    batcher = MicroBatcherRecherche(comptee, delai_ms=20)
+
+    async def rechercher():
+        return await asyncio.gather(*(batcher.rechercher(q, n_results=1) for q in QUESTIONS))
+
+    resultats = asyncio.run(rechercher())
+    assert comptee.requetes == [QUESTIONS]
+    assert resultats == rechercher_contextes(remplie, QUESTIONS, 1)
+    assert not batcher._taches
+
+
+def test_erreur_transmise_a_chaque_question(remplie):
+    batcher = MicroBatcherRecherche(remplie, delai_ms=5)
+
+    async def rechercher():
+        return await asyncio.gather(
+            *(batcher.rechercher(q, where={"i": {"$inconnu": 1}}) for q in QUESTIONS),
+            return_exceptions=True)
+
+    erreurs = asyncio.run(rechercher())
+    assert len(erreurs) == 3
+    assert all(isinstance(erreur, Exception) for erreur in erreurs)
+    assert not batcher._taches
+
+
+def test_lot_annule(remplie):
+    class Lente(CollectionComptee):
+        def query(self, **parametres):
+            time.sleep(0.2)
+            return super().query(**parametres)
+
+    batcher = MicroBatcherRecherche(Lente(remplie), delai_ms=1)
+
+    async def rechercher():
+        attentes = asyncio.gather(*(batcher.rechercher(q) for q in QUESTIONS),
+                                  return_exceptions=True)
+        await asyncio.sleep(0.05)
+        assert len(batcher._taches) == 1
+        for tache in list(batcher._taches):
+            tache.cancel()
+        return await asyncio.wait_for(attentes, timeout=5)
+
+    resultats = asyncio.run(rechercher())
+    assert all(isinstance(r, asyncio.CancelledError) for r in resultats)
+    assert not batcher._taches
@@ -0,0 +1,78 @@
+import time
+
+from reclassement import Reclasseur
+
+DOCUMENTS = [f"doc{i}" for i in range(8)]
+
+
+def _noter_par_numero(lents=(), attente=0.3):
+    """
+    Score = numéro du document (doc7 est le meilleur) ; les lots qui
+    contiennent un document de `lents` dépassent le budget
+    """
+    def noter(paires):
+        if any(document in lents for _, document in paires):
+            time.sleep(attente)
+        return [float(document[3:]) for _, document in paires]
+    return noter
+
+
+def test_reclassement_complet():
+    reclasseur = Reclasseur(_noter_par_numero(), budget_ms=1000, taille_lot=2)
+    positions, scores = reclasseur.reclasser("question", DOCUMENTS, 3)
+    assert positions == [7, 6, 5]
+    assert scores == [7.0, 6.0, 5.0]
+    assert reclasseur.dernier_rapport["complet"]
+
+
+def test_lot_lointain_fini_avant_un_lot_proche():
+    # Le premier lot (les plus proches) dépasse le budget, les suivants non
+    reclasseur = Reclasseur(_noter_par_numero(lents={"doc0"}), budget_ms=100,
+                            taille_lot=2, nb_workers=4)
+    positions, scores = reclasseur.reclasser("question", DOCUMENTS, 3)
+    assert positions == [0, 1, 2]
+    assert scores == [None, None, None]
+    assert reclasseur.dernier_rapport["notes"] == 0
+
+
+def test_prefixe_note():
+    reclasseur = Reclasseur(_noter_par_numero(lents={"doc4"}), budget_ms=100,
+                            taille_lot=2, nb_workers=4)
+    positions, scores = reclasseur.reclasser("question", DOCUMENTS, 6)
+    assert positions == [3, 2, 1, 0, 4, 5]
+    assert scores == [3.0, 2.0, 1.0, 0.0, None, None]
+    assert not reclasseur.dernier_rapport["complet"]
+
+
+def test_lot_en_cours_ne_bloque_pas_l_appel_suivant():
+    lents = {"doc0"}
+    reclasseur = Reclasseur(_noter_par_numero(lents=lents, attente=0.5), budget_ms=100,
+                            taille_lot=8, nb_workers=1)
+    reclasseur.reclasser("question", DOCUMENTS, 3)
+    assert reclasseur.dernier_rapport["notes"] == 0
+
+    # Le thread de l'appel précédent est encore occupé
+    lents.clear()
+    positions, _ = reclasseur.reclasser("question", DOCUMENTS, 3)
+    assert positions == [7, 6, 5]
+    assert reclasseur.dernier_rapport["complet"]
+    reclasseur.fermer()
+
+
+def test_sur_extraction_comptee_dans_le_budget(collection):
+    class Lente:
+        def query(self, **parametres):
+            time.sleep(0.2)
+            return collection.query(**parametres)
+
+    def noter(paires):
+        time.sleep(0.02)
+        return [0.0] * len(paires)
+
+    collection.add(ids=DOCUMENTS, documents=DOCUMENTS)
+    with Reclasseur(noter, budget_ms=150, taille_lot=2) as reclasseur:
+        resultat = reclasseur.rechercher(Lente(), ["question"], n_results=2)[0]
+    assert resultat["scores"] == [[None, None]]
+    assert reclasseur.dernier_rapport["notes"] == 0
+    assert reclasseur.dernier_rapport["millisecondes"] >= 200
+    assert reclasseur.pool._shutdown
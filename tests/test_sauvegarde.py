@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+
+import sauvegarde
+from conftest import FonctionEmbeddingTest
+from sauvegarde import iterer_archive, lire_manifest, restaurer, sauvegarder
+
+
+def _remplir(collection, nb=10):
+    collection.add(
+        ids=[f"d{i}" for i in range(nb)],
+        documents=[f"document numéro {i} mot{i % 3}" for i in range(nb)],
+        metadatas=[{"i": i, "pair": i % 2 == 0} for i in range(nb)],
+    )
+
+
+def test_aller_retour(client, collection, fonction_embedding, tmp_path):
+    _remplir(collection, 25)
+    manifest = sauvegarder(collection, tmp_path, taille_morceau=10, taille_lot=4)
+    assert manifest["nb_documents"] == 25
+    assert [m["lignes"] for m in manifest["morceaux"]] == [10, 10, 5]
+
+    appels = fonction_embedding.appels
+    copie, _ = restaurer(client, tmp_path, nom="copie_test", embedding_function=fonction_embedding)
+    # Rien n'est recalculé
+    assert fonction_embedding.appels == appels
+
+    source = collection.get(include=["documents", "metadatas", "embeddings"])
+    restaure = copie.get(ids=source["ids"], include=["documents", "metadatas", "embeddings"])
+    assert restaure["ids"] == source["ids"]
+    assert restaure["documents"] == source["documents"]
+    assert restaure["metadatas"] == source["metadatas"]
+    assert np.allclose(restaure["embeddings"], source["embeddings"])
+
+
+def test_restaurer_sans_ecraser(client, collection, tmp_path):
+    _remplir(collection)
+    sauvegarder(collection, tmp_path)
+    with pytest.raises(ValueError):
+        restaurer(client, tmp_path)
+    copie, _ = restaurer(client, tmp_path, remplacer=True)
+    assert copie.count() == 10
+
+
+def test_archive_incomplete(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        lire_manifest(tmp_path)
+
+
+def test_lot_supprime_pendant_la_sauvegarde(collection, tmp_path, monkeypatch):
+    _remplir(collection, 6)
+    lister = sauvegarde.lister_ids
+
+    def lister_puis_supprimer(c):
+        ids = lister(c)
+        c.delete(ids=ids[:3])
+        return ids
+
+    monkeypatch.setattr(sauvegarde, "lister_ids", lister_puis_supprimer)
+    manifest = sauvegarder(collection, tmp_path, taille_morceau=3, taille_lot=3)
+
+    assert manifest["nb_documents"] == 3
+    assert len(manifest["morceaux"]) == 1
+    for morceau in manifest["morceaux"]:
+        assert os.path.exists(os.path.join(tmp_path, morceau["embeddings"]))
+    assert [len(m["ids"]) for m in iterer_archive(tmp_path)] == [3]
+
+
+def test_archive_corrompue_sans_perte(client, collection, tmp_path):
+    _remplir(collection, 25)
+    manifest = sauvegarder(collection, tmp_path, taille_morceau=10)
+    with open(os.path.join(tmp_path, manifest["morceaux"][2]["textes"]), "wb") as fichier:
+        fichier.write(b"tronque")
+
+    with pytest.raises(Exception):
+        restaurer(client, tmp_path, remplacer=True)
+    assert sorted(c.name for c in client.list_collections()) == [collection.name]
+    assert client.get_collection(collection.name).count() == 25
+
+
+def test_restaurer_remplace_a_la_fin(client, collection, fonction_embedding, tmp_path):
+    _remplir(collection, 5)
+    sauvegarder(collection, tmp_path)
+    collection.delete(ids=["d0"])
+    copie, _ = restaurer(client, tmp_path, remplacer=True, embedding_function=fonction_embedding)
+    assert copie.name == collection.name
+    assert client.get_collection(collection.name).count() == 5
+    assert sorted(c.name for c in client.list_collections()) == [collection.name]
+
+
+class FonctionNommee(FonctionEmbeddingTest):
+    @staticmethod
+    def name():
+        return "autre-modele"
+
+
+def test_fonction_embedding_differente(client, tmp_path):
+    defaut = client.create_collection("par_defaut")
+    defaut.add(ids=["a"], documents=["texte"], embeddings=[[0.0] * 384])
+    assert sauvegarder(defaut, tmp_path)["fonction_embedding"] == "default"
+    with pytest.raises(ValueError):
+        restaurer(client, tmp_path, nom="copie_defaut", embedding_function=FonctionNommee())
+    copie, _ = restaurer(client, tmp_path, nom="copie_defaut")
+    assert copie.count() == 1
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from stockage_quantifie import CollectionQuantifiee
+
+
+def _vecteurs(nb, dimension=16, graine=0):
+    return np.random.default_rng(graine).standard_normal((nb, dimension)).astype(np.float32)
+
+
+def _ouvrir(client, dossier, mode="int8", **options):
+    if mode == "pq":
+        options.setdefault("nb_sous_espaces", 4)
+        options.setdefault("nb_centroides", 16)
+    return CollectionQuantifiee(client, f"quantifiee_{mode}", dossier, mode=mode,
+                                fonction_embedding=lambda textes: _vecteurs(len(textes)),
+                                **options)
+
+
+def test_ids_repetes_dans_un_lot(client, tmp_path):
+    collection = _ouvrir(client, tmp_path)
+    vecteurs = _vecteurs(3)
+    collection.upsert(ids=["a", "b", "a"], embeddings=vecteurs)
+    assert collection.count() == 2
+    resultat = collection.query(query_embeddings=vecteurs[2:], n_results=1)
+    assert resultat["ids"] == [["a"]]
+    assert resultat["distances"][0][0] == pytest.approx(0, abs=1e-4)
+
+
+def test_rechargement(client, tmp_path):
+    collection = _ouvrir(client, tmp_path)
+    vecteurs = _vecteurs(50)
+    for debut in range(0, 50, 10):
+        collection.upsert(ids=[f"d{i}" for i in range(debut, debut + 10)],
+                          embeddings=vecteurs[debut:debut + 10])
+    collection.delete(ids=["d3"])
+    collection.upsert(ids=["d4"], embeddings=vecteurs[:1])
+    collection.delete(ids=["d5"])
+    collection.upsert(ids=["d5"], embeddings=vecteurs[5:6])
+
+    relue = _ouvrir(client, tmp_path)
+    assert relue.count() == collection.count() == 49
+    assert "d3" not in relue.positions
+    assert relue.query(query_embeddings=vecteurs[:1], n_results=2)["ids"][0][0] in ("d0", "d4")
+    assert relue.query(query_embeddings=vecteurs[5:6], n_results=1)["ids"] == [["d5"]]
+
+
+def test_ajout_interrompu(client, tmp_path):
+    collection = _ouvrir(client, tmp_path)
+    collection.upsert(ids=["a", "b"], embeddings=_vecteurs(2))
+    with open(tmp_path / "vecteurs.f32", "ab") as fichier:
+        fichier.write(b"\x00" * 30)
+
+    relue = _ouvrir(client, tmp_path)
+    assert relue.count() == 2
+    relue.upsert(ids=["c"], embeddings=_vecteurs(1, graine=1))
+    assert _ouvrir(client, tmp_path).query(query_embeddings=_vecteurs(1, graine=1),
+                                           n_results=1)["ids"] == [["c"]]
+
+
+def test_pq_attend_assez_de_vecteurs(client, tmp_path):
+    collection = _ouvrir(client, tmp_path, mode="pq", taille_entrainement=200)
+    vecteurs = _vecteurs(300)
+    collection.upsert(ids=[f"d{i}" for i in range(5)], embeddings=vecteurs[:5])
+    assert not collection.entraine
+    # Recherche exacte tant que les centroïdes ne sont pas appris
+    assert collection.query(query_embeddings=vecteurs[3:4], n_results=1)["ids"] == [["d3"]]
+
+    collection.upsert(ids=[f"d{i}" for i in range(5, 300)], embeddings=vecteurs[5:])
+    assert collection.entraine
+    assert collection.quantifieur.centroides.shape == (4, 16, 4)
+    rappel = collection.evaluer(vecteurs[:20], k=5)["rappel@5"]
+    assert rappel > 0.8
+
+    relue = _ouvrir(client, tmp_path, mode="pq", taille_entrainement=200)
+    assert relue.entraine
+    assert np.array_equal(relue.codes[:relue.nb_lignes], collection.codes[:collection.nb_lignes])
+
+
+@pytest.mark.parametrize("mode", ["int8", "pq"])
+def test_update(client, tmp_path, mode):
+    collection = _ouvrir(client, tmp_path, mode=mode, taille_entrainement=50)
+    vecteurs = _vecteurs(60)
+    collection.upsert(ids=[f"d{i}" for i in range(60)], embeddings=vecteurs,
+                      documents=[f"texte {i}" for i in range(60)],
+                      metadatas=[{"i": i} for i in range(60)])
+    nouveau = _vecteurs(1, graine=7)
+    collection.update(ids=["d0", "absent"], embeddings=[nouveau[0], nouveau[0]],
+                      metadatas=[{"i": -1}, {"i": -2}])
+    collection.update(ids=["d1"], metadatas=[{"v": 1}])
+
+    assert collection.count() == 60
+    resultat = collection.get(ids=["d0", "d1"], include=["metadatas", "embeddings"])
+    assert resultat["metadatas"] == [{"i": -1}, {"i": 1, "v": 1}]
+    assert np.allclose(resultat["embeddings"][0], nouveau[0])
+    assert np.allclose(resultat["embeddings"][1], vecteurs[1])
+    assert collection.query(query_embeddings=nouveau, n_results=1)["ids"] == [["d0"]]
+
+    relue = _ouvrir(client, tmp_path, mode=mode, taille_entrainement=50)
+    assert relue.query(query_embeddings=nouveau, n_results=1)["ids"] == [["d0"]]
+    assert relue.peek(2)["embeddings"].shape == (2, 16)
+
+
+def test_pas_de_delegation_silencieuse(client, tmp_path):
+    collection = _ouvrir(client, tmp_path)
+    assert collection.name == "quantifiee_int8"
+    with pytest.raises(NotImplementedError):
+        collection.modify(name="autre")
+
+
+def test_entrainement_interrompu(client, tmp_path):
+    collection = _ouvrir(client, tmp_path, mode="pq", taille_entrainement=100)
+    vecteurs = _vecteurs(120)
+    collection.upsert(ids=[f"d{i}" for i in range(120)], embeddings=vecteurs)
+    codes = collection.codes[:120].copy()
+
+    # Arrêt entre le remplacement des centroïdes et celui des codes
+    (tmp_path / "codes.bin").write_bytes(b"")
+    (tmp_path / "codes.bin.tmp").write_bytes(codes.tobytes())
+    relue = _ouvrir(client, tmp_path, mode="pq", taille_entrainement=100)
+    assert np.array_equal(relue.codes[:relue.nb_lignes], codes)
+    assert not (tmp_path / "codes.bin.tmp").exists()
+
+    # Arrêt avant le remplacement des centroïdes : l'ancien état est gardé
+    (tmp_path / "centroides.npy.tmp").write_bytes(b"incomplet")
+    (tmp_path / "codes.bin.tmp").write_bytes(b"\0" * 7)
+    relue = _ouvrir(client, tmp_path, mode="pq", taille_entrainement=100)
+    assert np.array_equal(relue.codes[:relue.nb_lignes], codes)
+    assert not (tmp_path / "centroides.npy.tmp").exists()
@@ -0,0 +1,81 @@
+import pytest
+
+from ingestion_csv import MODELE_POPULATION
+from synchronisation_csv import CLE_SOURCE, synchroniser_csv
+
+
+def _ecrire_csv(chemin, lignes):
+    chemin.write_text("Country,Population\n"
+                      + "".join(f"{pays},{population}\n" for pays, population in lignes),
+                      encoding="ISO-8859-1")
+    return chemin
+
+
+def _synchroniser(collection, chemin, **options):
+    options.setdefault("taille_lot", 2)
+    stats = synchroniser_csv(collection, chemin, MODELE_POPULATION, colonne_cle="Country",
+                             source="population.csv", afficher=False, **options)
+    del stats["secondes"]
+    return stats
+
+
+@pytest.fixture
+def fichier(tmp_path):
+    return _ecrire_csv(tmp_path / "population.csv",
+                       [("China", 1425), ("India", 1428), ("France", 68)])
+
+
+def test_delta(collection, fichier, fonction_embedding):
+    assert _synchroniser(collection, fichier) == {
+        "ajoutes": 3, "modifies": 0, "inchanges": 0, "supprimes": 0}
+    appels = fonction_embedding.textes
+
+    assert _synchroniser(collection, fichier) == {
+        "ajoutes": 0, "modifies": 0, "inchanges": 3, "supprimes": 0}
+    assert fonction_embedding.textes == appels
+
+    _ecrire_csv(fichier, [("China", 1426), ("Brazil", 216), ("France", 68)])
+    assert _synchroniser(collection, fichier) == {
+        "ajoutes": 1, "modifies": 1, "inchanges": 1, "supprimes": 1}
+    assert fonction_embedding.textes == appels + 2
+    assert sorted(collection.get()["ids"]) == ["id_Brazil", "id_China", "id_France"]
+    assert collection.get(ids=["id_China"])["documents"] == ["Country: China, Population: 1426"]
+
+
+def test_metadonnee_source_de_l_utilisateur(collection, fichier):
+    collection.add(ids=["article1"], documents=["texte"], metadatas=[{"source": "population.csv"}])
+    _synchroniser(collection, fichier)
+    _ecrire_csv(fichier, [("China", 1425)])
+    assert _synchroniser(collection, fichier)["supprimes"] == 2
+    assert sorted(collection.get()["ids"]) == ["article1", "id_China"]
+
+
+def test_cle_repetee_entre_les_lots(collection, tmp_path):
+    fichier = _ecrire_csv(tmp_path / "population.csv",
+                          [("China", 1), ("India", 2), ("China", 1), ("Chile", 3), ("India", 4)])
+    assert _synchroniser(collection, fichier) == {
+        "ajoutes": 3, "modifies": 0, "inchanges": 0, "supprimes": 0}
+    assert collection.get(ids=["id_India"])["documents"] == ["Country: India, Population: 4"]
+    # Chaque clé n'est comptée qu'une fois, même si ses lignes diffèrent
+    stats = _synchroniser(collection, fichier)
+    assert stats["ajoutes"] + stats["modifies"] + stats["inchanges"] == 3
+    assert collection.count() == 3
+
+
+def test_anciens_ids_positionnels(collection, fichier):
+    # Ingestion d'avant la synchronisation par clé : id_0, id_1... sans métadonnées
+    collection.upsert(ids=["id_0", "id_1", "id_2"],
+                      documents=["Country: China, Population: 1425",
+                                 "Country: India, Population: 1400",
+                                 "Country: France, Population: 68"])
+    # Documents id_N d'un autre fichier (ingerer_csv), dans la même collection
+    collection.add(ids=["id_3", "id_autre"], documents=["Carat: 0.23, Cut: Ideal", "texte"])
+
+    assert _synchroniser(collection, fichier)["supprimes"] == 0
+    assert collection.count() == 8
+
+    assert _synchroniser(collection, fichier, supprimer_positionnels=True)["supprimes"] == 3
+    assert sorted(collection.get()["ids"]) == ["id_3", "id_China", "id_France", "id_India",
+                                               "id_autre"]
+    sources = collection.get(where={CLE_SOURCE: "population.csv"})["ids"]
+    assert len(sources) == 3